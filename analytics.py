@@ -0,0 +1,196 @@
+import heapq
+import operator
+from money import money_dot
+from settings import TOP_COUNT
+from store import ProductStore
+
+try:
+    import numpy
+except ImportError:  # NumPy is optional; fall back to array-backed aggregation
+    numpy = None
+
+def as_numpy(column):
+    """
+    Wraps an array column as a NumPy array without copying it.
+
+    Args:
+        column (array): The column.
+
+    Returns:
+        numpy.ndarray: The same values.
+    """
+    return numpy.asarray(column)
+
+def as_integers(totals):
+    """
+    Converts totals that bincount added up in float64 back to ints.
+
+    Sums of whole numbers stay exact in float64 below 2 ** 53, which is
+    about 9e13 rupees in paisa per key.
+
+    Args:
+        totals (numpy.ndarray): Whole-number totals as floats.
+
+    Returns:
+        list: The totals as ints.
+    """
+    return numpy.rint(totals).astype(numpy.int64).tolist()
+
+def column_dot(left, right):
+    """
+    Adds up the element-wise products of two integer columns, exactly.
+
+    Args:
+        left (array): The first column.
+        right (array): The second column.
+
+    Returns:
+        int: The sum of left[i] * right[i].
+    """
+    if numpy is not None:
+        # int64 arithmetic is exact up to about 9.2e18 paisa
+        return int(numpy.dot(as_numpy(left), as_numpy(right)))
+    return money_dot(left, right)
+
+def group_dot(keys, left, right, size):
+    """
+    Adds up the element-wise products of two columns per integer key.
+
+    Args:
+        keys (array): Integer keys in range(size).
+        left (array): The first column.
+        right (array): The second column.
+        size (int): One more than the largest key.
+
+    Returns:
+        list: The integer total of each key.
+    """
+    if numpy is not None:
+        weights = as_numpy(left) * as_numpy(right)
+        return as_integers(numpy.bincount(as_numpy(keys), weights=weights, minlength=size))
+    totals = [0] * size
+    for key, quantity, price in zip(keys, left, right):
+        totals[key] += quantity * price
+    return totals
+
+def group_sum(keys, values, size):
+    """
+    Adds up values per integer key, like a group-by.
+
+    Args:
+        keys (array): Integer keys in range(size).
+        values (list): Values lined up with the keys.
+        size (int): One more than the largest key.
+
+    Returns:
+        list: The integer total of each key.
+    """
+    if numpy is not None:
+        return as_integers(numpy.bincount(as_numpy(keys), weights=values[:len(keys)], minlength=size))
+    totals = [0] * size
+    for key, value in zip(keys, values):
+        totals[key] += value
+    return totals
+
+def rollup(products, product_revenue, field):
+    """
+    Totals revenue per brand or country from revenue per product.
+
+    A ProductStore is grouped by its code column; other stores are
+    looked up product by product, for the products that sold only.
+
+    Args:
+        products (ProductStore): The current products.
+        product_revenue (list): Revenue of each product id, in paisa.
+        field (str): 'brand' or 'country'.
+
+    Returns:
+        dict: Revenue per brand or country, in paisa.
+    """
+    if isinstance(products, ProductStore):
+        table = getattr(products, f"{field}_table")
+        totals = group_sum(getattr(products, f"{field}_codes"), product_revenue, len(table))
+        totals = dict(zip(table, totals))
+    else:
+        totals = {}
+        for product_id, amount in enumerate(product_revenue[:len(products)]):
+            if amount:
+                name = products[product_id][field]
+                totals[name] = totals.get(name, 0) + amount
+
+    # Sales of products no longer in the catalog
+    unknown = sum(product_revenue[len(products):])
+    if unknown:
+        totals["Unknown"] = totals.get("Unknown", 0) + unknown
+    return {name: amount for name, amount in totals.items() if amount}
+
+def top_entries(totals, count):
+    """
+    Picks the largest totals.
+
+    Args:
+        totals (dict): Totals by name.
+        count (int): The number of entries to keep.
+
+    Returns:
+        list: (name, total) pairs, largest first.
+    """
+    return heapq.nlargest(count, totals.items(), key=operator.itemgetter(1))
+
+def sales_summary(columns, products, top=TOP_COUNT):
+    """
+    Aggregates the sales log into revenue, margin and top sellers.
+
+    Revenue is what customers paid. The margin is revenue less the cost
+    of the items paid for, and the giveaway cost is the cost of the free
+    items given under the promotion; the net margin subtracts both. Top
+    lists rank products, brands and countries by revenue.
+
+    Totals are dot products of whole columns, and revenue is grouped by
+    product in one pass; brand and country totals are rolled up from the
+    product totals, so their cost depends on the catalog, not the log.
+
+    Args:
+        columns (dict): Columns of the sales log, as SalesLog.read returns.
+        products (ProductStore): The current products, for names, brands
+            and countries.
+        top (int): The number of entries in each top list.
+
+    Returns:
+        dict: Totals and top lists, with amounts in paisa.
+    """
+    quantity = columns["quantity"]
+    free_items = columns["free_items"]
+    unit_price = columns["unit_price"]
+    cost_price = columns["cost_price"]
+    total_revenue = column_dot(quantity, unit_price)
+    cost_of_sales = column_dot(quantity, cost_price)
+    giveaway_cost = column_dot(free_items, cost_price)
+
+    # Group revenue by product, then roll products up by brand and country
+    product_ids = columns["product_id"]
+    size = max(len(products), max(product_ids, default=-1) + 1)
+    product_revenue = group_dot(product_ids, quantity, unit_price, size)
+    top_products = []
+    for product_id, amount in heapq.nlargest(top, enumerate(product_revenue), key=operator.itemgetter(1)):
+        if not amount:
+            break
+        if product_id < len(products):
+            product = products[product_id]
+            top_products.append((f"{product['name']} ({product['brand']})", amount))
+        else:
+            top_products.append((f"Unknown product {product_id}", amount))
+
+    return {
+        "lines": len(quantity),
+        "items_sold": sum(quantity),
+        "free_items": sum(free_items),
+        "revenue": total_revenue,
+        "cost_of_sales": cost_of_sales,
+        "margin": total_revenue - cost_of_sales,
+        "giveaway_cost": giveaway_cost,
+        "net_margin": total_revenue - cost_of_sales - giveaway_cost,
+        "top_products": top_products,
+        "top_brands": top_entries(rollup(products, product_revenue, "brand"), top),
+        "top_countries": top_entries(rollup(products, product_revenue, "country"), top),
+    }
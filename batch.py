@@ -0,0 +1,255 @@
+import time
+from instrumentation import timed
+from operations import purchase_item, sale_item
+from pricing import price_table
+from search import ProductIndex
+from sales import open_sales_log
+from write import generate_invoices, generate_purchase_invoice
+
+def print_reject(line_number, line, reason):
+    """
+    Default reject callback for the batch processors; prints the problem.
+
+    Args:
+        line_number (int): The line number in the input file.
+        line (str): The rejected line.
+        reason (str): Why the line was rejected.
+    """
+    print(f"Rejected line {line_number}: {line}. Reason: {reason}")
+
+class ProductResolver:
+    """
+    Resolves the product column of batch files to product ids.
+
+    A numeric value is taken as the product ID; anything else must be the
+    exact name of a single product. The name index is only built the
+    first time a name is used, so files that use IDs never pay for it.
+    """
+
+    def __init__(self, products, index=None, build_index=ProductIndex):
+        self.products = products
+        self.index = index
+        self.build_index = build_index
+
+    def resolve(self, text):
+        """
+        Finds the product named in a batch line.
+
+        Args:
+            text (str): A product ID or exact product name.
+
+        Returns:
+            int: The product id, or None if it is unknown or ambiguous.
+        """
+        if text.isnumeric():
+            product_id = int(text)
+            return product_id if product_id < len(self.products) else None
+
+        if self.index is None:
+            self.index = self.build_index(self.products)
+        matches = self.index.with_name(text)
+        return matches[0] if len(matches) == 1 else None
+
+@timed("sell.batch")
+def process_order_file(products, repository, orders_file, index=None, on_reject=print_reject):
+    """
+    Sells every order in a file without interactive input.
+
+    Each line reads 'customer,phone,product,quantity', where product is a
+    product ID or exact name. Consecutive lines for the same customer and
+    phone form one order and one invoice. Lines are applied in order, so
+    a line is rejected if earlier lines already used up the stock. All
+    stock changes are committed as a single journal transaction at the
+    end, and the invoices are only written once that commit succeeds. An
+    unexpected error part way through the file sells nothing: the stock
+    already reserved is put back and nothing is committed.
+
+    Args:
+        products (ProductStore): The current products.
+        repository (Repository): Where the products are kept.
+        orders_file (str): The name of the file of orders.
+        index (ProductIndex): The lookup index, if already built.
+        on_reject (callable): Called as on_reject(line_number, line, reason)
+            for every line that is not sold.
+
+    Returns:
+        dict: Counts of orders, lines sold and lines rejected, the grand
+            total, the elapsed seconds and the orders per second.
+    """
+    start = time.perf_counter()
+    resolver = ProductResolver(products, index, repository.index)
+    summary = {"orders": 0, "lines": 0, "rejected": 0, "grand_total": 0}
+    stock_changes = {}
+    orders = []  # [customer_name, phone_number, item_selling, order_total]
+    prices = price_table(products)
+    failed = False
+
+    try:
+        with open(orders_file, "r") as file:
+            for line_number, line in enumerate(file, 1):
+                line = line.strip()
+                if not line or line.startswith("#"):
+                    continue  # Skip blank lines and comments
+
+                # Validate the line
+                fields = [field.strip() for field in line.split(",")]
+                if len(fields) != 4:
+                    on_reject(line_number, line, "expected customer,phone,product,quantity")
+                    summary["rejected"] += 1
+                    continue
+                customer_name, phone_number, product_text, quantity = fields
+                if not phone_number.isnumeric():
+                    on_reject(line_number, line, "invalid phone number")
+                    summary["rejected"] += 1
+                    continue
+                if not quantity.isnumeric() or int(quantity) <= 0:
+                    on_reject(line_number, line, "invalid quantity")
+                    summary["rejected"] += 1
+                    continue
+                product_id = resolver.resolve(product_text)
+                if product_id is None:
+                    on_reject(line_number, line, "unknown or ambiguous product")
+                    summary["rejected"] += 1
+                    continue
+
+                # Price the item and take it out of stock, free items included
+                item = sale_item(products[product_id], int(quantity), prices)
+                if not products.reserve(product_id, item["total_quantity"]):
+                    on_reject(line_number, line, "insufficient stock")
+                    summary["rejected"] += 1
+                    continue
+                stock_changes[product_id] = stock_changes.get(product_id, 0) - item["total_quantity"]
+
+                # A new customer starts a new order
+                if not orders or orders[-1][0] != customer_name or orders[-1][1] != phone_number:
+                    orders.append([customer_name, phone_number, [], 0])
+                orders[-1][2].append(item)
+                orders[-1][3] += item["total_item_price"]
+                summary["lines"] += 1
+    except FileNotFoundError:
+        # Handle case where the orders file does not exist
+        print(f"Error: Orders file '{orders_file}' not found.")
+    except Exception as e:
+        # Catch all other exceptions and sell nothing
+        print(f"An error occurred while processing orders: {e}")
+        failed = True
+
+    if failed:
+        # Put back the stock the lines read so far reserved
+        products.settle(list(stock_changes.items()), committed=False)
+        committed = False
+    else:
+        # Commit the whole batch at once
+        committed = repository.commit(products, list(stock_changes.items()), "sale")
+
+    # Then log the sales and write the invoices
+    if committed:
+        open_sales_log(repository.database_name).append([item for order in orders for item in order[2]])
+        generate_invoices(orders)
+        summary["orders"] = len(orders)
+        summary["grand_total"] = sum(order[3] for order in orders)
+    else:
+        print("The batch was not committed; no orders were sold.")
+        summary["rejected"] += summary["lines"]
+        summary["lines"] = 0
+
+    summary["seconds"] = time.perf_counter() - start
+    summary["orders_per_second"] = summary["orders"] / summary["seconds"] if summary["seconds"] else 0
+    return summary
+
+@timed("restock.batch")
+def process_purchase_order_file(products, repository, orders_file, index=None, on_reject=print_reject):
+    """
+    Restocks every line of a vendor purchase-order file in one pass.
+
+    Each line reads 'vendor,product,quantity', where product is a product
+    ID or exact name. Lines are streamed and grouped by vendor; repeated
+    lines for the same vendor and product are merged. One purchase
+    invoice is written per vendor, and all stock increments are committed
+    as a single journal transaction.
+
+    Args:
+        products (ProductStore): The current products.
+        repository (Repository): Where the products are kept.
+        orders_file (str): The name of the purchase-order file.
+        index (ProductIndex): The lookup index, if already built.
+        on_reject (callable): Called as on_reject(line_number, line, reason)
+            for every line that is not restocked.
+
+    Returns:
+        dict: Counts of vendors, lines restocked and lines rejected, the
+            grand total cost, the elapsed seconds and the lines per second.
+    """
+    start = time.perf_counter()
+    resolver = ProductResolver(products, index, repository.index)
+    summary = {"vendors": 0, "lines": 0, "rejected": 0, "grand_total_cost": 0}
+    vendors = {}  # {vendor_name: {product_id: quantity}}
+
+    try:
+        with open(orders_file, "r") as file:
+            for line_number, line in enumerate(file, 1):
+                line = line.strip()
+                if not line or line.startswith("#"):
+                    continue  # Skip blank lines and comments
+
+                # Validate the line
+                fields = [field.strip() for field in line.split(",")]
+                if len(fields) != 3:
+                    on_reject(line_number, line, "expected vendor,product,quantity")
+                    summary["rejected"] += 1
+                    continue
+                vendor_name, product_text, quantity = fields
+                if not vendor_name:
+                    on_reject(line_number, line, "missing vendor name")
+                    summary["rejected"] += 1
+                    continue
+                if not quantity.isnumeric() or int(quantity) <= 0:
+                    on_reject(line_number, line, "invalid quantity")
+                    summary["rejected"] += 1
+                    continue
+                product_id = resolver.resolve(product_text)
+                if product_id is None:
+                    on_reject(line_number, line, "unknown or ambiguous product")
+                    summary["rejected"] += 1
+                    continue
+
+                ordered = vendors.setdefault(vendor_name, {})
+                ordered[product_id] = ordered.get(product_id, 0) + int(quantity)
+                summary["lines"] += 1
+    except FileNotFoundError:
+        # Handle case where the purchase-order file does not exist
+        print(f"Error: Purchase order file '{orders_file}' not found.")
+        vendors = {}
+    except Exception as e:
+        # Catch all other exceptions and restock nothing
+        print(f"An error occurred while reading purchase orders: {e}")
+        vendors = {}
+
+    # Apply all increments and prepare one invoice per vendor
+    stock_changes = {}
+    invoices = []
+    for vendor_name, ordered in vendors.items():
+        restock_items = []
+        grand_total_cost = 0
+        for product_id, quantity in ordered.items():
+            products.adjust(product_id, quantity)
+            stock_changes[product_id] = stock_changes.get(product_id, 0) + quantity
+            item = purchase_item(products[product_id], quantity)
+            restock_items.append(item)
+            grand_total_cost += item["total_item_cost"]
+        invoices.append((vendor_name, restock_items, grand_total_cost))
+
+    # Commit the whole purchase order at once, then write the invoices
+    if repository.commit(products, list(stock_changes.items()), "restock"):
+        for vendor_name, restock_items, grand_total_cost in invoices:
+            generate_purchase_invoice(vendor_name, restock_items, grand_total_cost, display=False)
+            summary["vendors"] += 1
+            summary["grand_total_cost"] += grand_total_cost
+    else:
+        print("The purchase order was not committed; nothing was restocked.")
+        summary["rejected"] += summary["lines"]
+        summary["lines"] = 0
+
+    summary["seconds"] = time.perf_counter() - start
+    summary["lines_per_second"] = summary["lines"] / summary["seconds"] if summary["seconds"] else 0
+    return summary
@@ -0,0 +1,75 @@
+import os
+import random
+import sys
+import tempfile
+import time
+from benchmarks.catalog import generate_catalog
+from read import load_data
+from store import LOW_STOCK_THRESHOLD
+
+CATALOG_SIZE = 1000000
+MUTATIONS = 200000
+
+def check(products):
+    """
+    Compares the running totals with a full scan of the store.
+
+    Args:
+        products (ProductStore): The store to check.
+
+    Returns:
+        bool: True if the totals match the scan.
+    """
+    value = sum(stock * cost for stock, cost in zip(products.stock, products.cost_price))
+    low = sorted(products.low_stock_ids(LOW_STOCK_THRESHOLD))
+    return (
+        products.total_stock() == sum(products.stock)
+        and products.inventory_value() == value
+        and sorted(product_id for product_id, stock in products.low_stock()) == low
+    )
+
+def run(size):
+    """
+    Times building the running totals, stock changes with and without
+    them, and reading reorder alerts.
+
+    Args:
+        size (int): The number of products in the catalog.
+    """
+    with tempfile.TemporaryDirectory() as directory:
+        database_name = os.path.join(directory, "catalog.txt")
+        generate_catalog(database_name, size)
+        products = load_data(database_name)
+
+    rng = random.Random(0)
+    changes = [(rng.randrange(size), rng.randint(1, 20)) for _ in range(MUTATIONS)]
+
+    def mutate():
+        began = time.perf_counter()
+        for product_id, quantity in changes:
+            if products.reserve(product_id, quantity):
+                products.settle([(product_id, -quantity)], committed=True)
+            products.adjust(product_id, quantity // 2)
+        return (time.perf_counter() - began) / (2 * MUTATIONS) * 1e6
+
+    untracked = mutate()
+    began = time.perf_counter()
+    products.inventory()
+    build = time.perf_counter() - began
+    tracked = mutate()
+
+    began = time.perf_counter()
+    for _ in range(1000):
+        products.inventory_value()
+        products.value_by_brand()
+        products.low_stock(5)
+    alert = (time.perf_counter() - began) / 1000 * 1e6
+
+    print(f"{size} products")
+    print(f"Build totals once: {build:.3f} s")
+    print(f"Stock change: {untracked:.2f} us without totals, {tracked:.2f} us with totals")
+    print(f"Value, brand values and 5 lowest: {alert:.1f} us")
+    print("Totals match a full scan" if check(products) else "TOTALS MISMATCH")
+
+if __name__ == "__main__":
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else CATALOG_SIZE)
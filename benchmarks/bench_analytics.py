@@ -0,0 +1,42 @@
+import datetime
+import os
+import sys
+import tempfile
+import time
+import analytics
+from analytics import sales_summary
+from benchmarks.catalog import generate_catalog, generate_sales_log
+from money import format_money
+from read import load_data
+from sales import SalesLog
+
+CATALOG_SIZE = 100000
+LINE_COUNT = 1000000
+
+def run(line_count):
+    """
+    Times reading and aggregating a year of sales, then one quarter.
+
+    Args:
+        line_count (int): The number of invoice lines in the log.
+    """
+    with tempfile.TemporaryDirectory() as directory:
+        database_name = os.path.join(directory, "catalog.txt")
+        generate_catalog(database_name, CATALOG_SIZE)
+        products = load_data(database_name)
+        log = SalesLog(os.path.join(directory, "catalog.txt.sales"))
+        generate_sales_log(log, line_count, CATALOG_SIZE)
+
+        print(f"Aggregating with {'NumPy' if analytics.numpy is not None else 'arrays'}")
+        today = datetime.date.today()
+        for label, start in (("year", None), ("quarter", today - datetime.timedelta(days=91))):
+            began = time.perf_counter()
+            columns = log.read(start, today)
+            read_time = time.perf_counter() - began
+            summary = sales_summary(columns, products)
+            total_time = time.perf_counter() - began
+            print(f"{label}: {summary['lines']} lines  read: {read_time:.3f} s  "
+                  f"read and aggregate: {total_time:.3f} s  revenue: {format_money(summary['revenue'])}")
+
+if __name__ == "__main__":
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else LINE_COUNT)
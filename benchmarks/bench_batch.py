@@ -0,0 +1,45 @@
+import os
+import sys
+import tempfile
+from benchmarks.catalog import generate_catalog, generate_orders, generate_purchase_orders
+from batch import process_order_file, process_purchase_order_file
+from repository import open_repository
+from write import flush_invoices
+
+CATALOG_SIZE = 100000
+ORDER_COUNT = 20000
+
+def run(order_count):
+    """
+    Times batch selling of a generated order file, then bulk restocking
+    of a purchase-order file with ten lines per order.
+
+    Args:
+        order_count (int): The number of orders to sell.
+    """
+    working_directory = os.getcwd()
+    with tempfile.TemporaryDirectory() as directory:
+        # Invoices are written to the working directory
+        os.chdir(directory)
+        try:
+            generate_catalog("catalog.txt", CATALOG_SIZE)
+            generate_orders("orders.txt", order_count, CATALOG_SIZE)
+            repository = open_repository("catalog.txt")
+            products = repository.load()
+            summary = process_order_file(products, repository, "orders.txt", on_reject=lambda *reject: None)
+            generate_purchase_orders("purchase-orders.txt", order_count * 10, CATALOG_SIZE)
+            restock = process_purchase_order_file(products, repository, "purchase-orders.txt")
+            invoices = flush_invoices()
+        finally:
+            os.chdir(working_directory)
+
+    print(f"Orders: {summary['orders']}  lines sold: {summary['lines']}  rejected: {summary['rejected']}")
+    print(f"Time: {summary['seconds']:.3f} s  ({summary['orders_per_second']:.0f} orders per second)")
+    print(f"Restock lines: {restock['lines']}  vendors: {restock['vendors']}  rejected: {restock['rejected']}")
+    print(f"Time: {restock['seconds']:.3f} s  ({restock['lines_per_second']:.0f} lines per second)")
+    print(f"Invoices written: {invoices['written']} in {invoices['batches']} batches  "
+          f"mean lag: {invoices['mean_lag'] * 1000:.1f} ms  max lag: {invoices['max_lag'] * 1000:.1f} ms  "
+          f"producer waits: {invoices['producer_waits']}")
+
+if __name__ == "__main__":
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else ORDER_COUNT)
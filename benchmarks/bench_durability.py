@@ -0,0 +1,90 @@
+import os
+import sys
+import tempfile
+import time
+from unittest import mock
+from benchmarks.catalog import generate_catalog
+from money import format_money
+from read import is_binary_database, load_data, load_snapshot
+from write import export_database
+
+SIZES = [10000, 100000, 1000000]
+REPEAT = 3
+
+def write_in_place(products, database_name):
+    """
+    Rewrites a CSV database the way update_database used to: truncated in
+    place, without a temporary file, checksum or fsync.
+
+    Args:
+        products (ProductStore): The products to write.
+        database_name (str): The name of the file to overwrite.
+    """
+    stock = products.committed_stock()
+    with open(database_name, "w") as file:
+        for product in products:
+            file.write(
+                product["name"] + "," + product["brand"] + "," + str(stock[product["id"]]) + ","
+                + format_money(product["cost_price"]) + "," + product["country"]
+            )
+            file.write("\n")
+
+def best_time(function, repeat=REPEAT):
+    """
+    Times a function several times.
+
+    Args:
+        function (callable): The function to time; called without arguments.
+        repeat (int): The number of runs.
+
+    Returns:
+        float: The fastest run in seconds.
+    """
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+def run(sizes):
+    """
+    Measures what crash safety costs a snapshot, per catalog size.
+
+    Each snapshot is written in place as before, then atomically with
+    os.fsync turned into a no-op, then with the full temporary file,
+    checksum, fsync, rename, directory fsync and snapshot retention.
+    Loading is timed with and without checking the checksum. The files
+    are written under the current directory, because fsync costs nothing
+    on a RAM-backed /tmp.
+
+    Args:
+        sizes (list): Catalog sizes to benchmark.
+    """
+    print("{:<10} {:<8} {:>12} {:>12} {:>12} {:>12} {:>12} {:>12}".format(
+        "PRODUCTS", "FORMAT", "IN PLACE s", "NO FSYNC s", "DURABLE s", "FSYNC s", "LOAD s", "VERIFY s"
+    ))
+    with tempfile.TemporaryDirectory(dir=".") as directory:
+        for size in sizes:
+            csv_name = os.path.join(directory, f"catalog-{size}.txt")
+            generate_catalog(csv_name, size)
+            products = load_data(csv_name)
+            binary_name = os.path.join(directory, f"catalog-{size}.bin")
+            export_database(products, binary_name)
+
+            for database_name in (csv_name, binary_name):
+                binary = is_binary_database(database_name)
+                in_place = None if binary else best_time(lambda: write_in_place(products, database_name + ".old"))
+                with mock.patch("os.fsync"):
+                    no_fsync = best_time(lambda: export_database(products, database_name))
+                durable = best_time(lambda: export_database(products, database_name))
+
+                unchecked = best_time(lambda: load_snapshot(database_name, binary, verify=False))
+                checked = best_time(lambda: load_snapshot(database_name, binary))
+                print("{:<10} {:<8} {:>12} {:>12.4f} {:>12.4f} {:>12.4f} {:>12.4f} {:>12.4f}".format(
+                    size, "binary" if binary else "csv", "-" if in_place is None else f"{in_place:.4f}",
+                    no_fsync, durable, durable - no_fsync, unchecked, checked - unchecked,
+                ))
+
+if __name__ == "__main__":
+    run([int(size) for size in sys.argv[1:]] or SIZES)
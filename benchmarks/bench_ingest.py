@@ -0,0 +1,64 @@
+import os
+import sys
+import tempfile
+import time
+from benchmarks.catalog import generate_catalog
+from read import load_data, load_data_parallel
+
+SIZE = 1000000
+
+def snapshot_rows(products):
+    """
+    Copies a store into plain tuples for comparison.
+
+    Args:
+        products (ProductStore): The store to copy.
+
+    Returns:
+        list: One (name, brand, stock, cost_price, country) tuple per product.
+    """
+    return list(zip(
+        products.names,
+        (products.brand_table[code] for code in products.brand_codes),
+        products.stock,
+        products.cost_price,
+        (products.country_table[code] for code in products.country_codes),
+    ))
+
+def run(size):
+    """
+    Times the serial loader against the parallel loader at increasing
+    worker counts, and checks that every run gives the same products.
+
+    Args:
+        size (int): Catalog size to benchmark.
+    """
+    cores = os.cpu_count() or 1
+    worker_counts = [1]
+    while worker_counts[-1] * 2 <= cores:
+        worker_counts.append(worker_counts[-1] * 2)
+    if worker_counts[-1] != cores:
+        worker_counts.append(cores)
+
+    with tempfile.TemporaryDirectory() as directory:
+        database_name = os.path.join(directory, "catalog.txt")
+        generate_catalog(database_name, size)
+        # Add a malformed line so diagnostics are exercised as well
+        with open(database_name, "a") as file:
+            file.write("Broken line,without,numbers\n")
+
+        start = time.perf_counter()
+        expected = snapshot_rows(load_data(database_name))
+        serial_time = time.perf_counter() - start
+
+        print("{:<10} {:<12} {:<10}".format("WORKERS", "TIME (s)", "SPEEDUP"))
+        print("{:<10} {:<12.3f} {:<10.2f}".format("serial", serial_time, 1.0))
+        for workers in worker_counts:
+            start = time.perf_counter()
+            products = load_data_parallel(database_name, workers, on_error=lambda *error: None)
+            elapsed = time.perf_counter() - start
+            assert snapshot_rows(products) == expected
+            print("{:<10} {:<12.3f} {:<10.2f}".format(workers, elapsed, serial_time / elapsed))
+
+if __name__ == "__main__":
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else SIZE)
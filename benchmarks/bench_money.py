@@ -0,0 +1,80 @@
+import random
+import sys
+import time
+from array import array
+from decimal import Decimal
+from money import PAISA_PER_RUPEE, format_money, money_dot
+
+try:
+    import numpy
+except ImportError:  # NumPy is optional; its row is skipped without it
+    numpy = None
+
+LINES = 1000000
+
+def timed(function):
+    """
+    Runs a function once and times it.
+
+    Args:
+        function (callable): The function to run.
+
+    Returns:
+        tuple: (result, seconds).
+    """
+    began = time.perf_counter()
+    result = function()
+    return result, time.perf_counter() - began
+
+def run(lines):
+    """
+    Totals the same invoice lines with floats, Decimal and integer paisa.
+
+    Args:
+        lines (int): The number of invoice lines.
+    """
+    rng = random.Random(0)
+    quantities = array("q", (rng.randint(1, 12) for _ in range(lines)))
+    paisa = array("q", (rng.randint(1000, 500000) for _ in range(lines)))  # 10.00 to 5000.00
+    rupees = array("d", (price / PAISA_PER_RUPEE for price in paisa))
+    decimals = [Decimal(price).scaleb(-2) for price in paisa]
+
+    def float_loop():
+        total = 0
+        for quantity, price in zip(quantities, rupees):
+            total += quantity * price
+        return total
+
+    def decimal_loop():
+        total = Decimal(0)
+        for quantity, price in zip(quantities, decimals):
+            total += quantity * price
+        return total
+
+    def paisa_loop():
+        total = 0
+        for quantity, price in zip(quantities, paisa):
+            total += quantity * price
+        return total
+
+    exact, _ = timed(lambda: money_dot(quantities, paisa))
+    rows = [
+        ("float, per item", float_loop),
+        ("Decimal, per item", decimal_loop),
+        ("paisa, per item", paisa_loop),
+        ("paisa, money_dot", lambda: money_dot(quantities, paisa)),
+    ]
+    if numpy is not None:
+        rows.append(("paisa, numpy int64 dot", lambda: int(numpy.dot(numpy.asarray(quantities), numpy.asarray(paisa)))))
+
+    print(f"{lines} invoice lines, exact total {format_money(exact)}")
+    for label, function in rows:
+        total, seconds = timed(function)
+        if isinstance(total, int):
+            error = (total - exact) / PAISA_PER_RUPEE
+        else:
+            error = float(Decimal(total) - Decimal(exact).scaleb(-2))
+        print(f"{label:<24} {seconds * 1000:8.1f} ms  error {error:+.6f} rupees")
+
+if __name__ == "__main__":
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else LINES)
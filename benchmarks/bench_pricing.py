@@ -0,0 +1,85 @@
+import datetime
+import os
+import random
+import sys
+import tempfile
+import time
+from benchmarks.catalog import BRANDS, COUNTRIES, generate_catalog
+from money import format_money
+from operations import sale_item
+from pricing import DEFAULT_RULES, PriceTable, parse_config
+from read import load_data
+
+CATALOG_SIZE = 100000
+CART_LINES = 500
+CARTS = 200
+RULE_COUNTS = (0, 10, 100, 1000, 10000)
+
+def generate_rules(count, size, seed=0):
+    """
+    Builds a deterministic rules file of mixed rules.
+
+    Args:
+        count (int): The number of rules.
+        size (int): The number of products in the catalog.
+        seed (int): Seed for the random number generator.
+
+    Returns:
+        dict: The decoded rules file.
+    """
+    rng = random.Random(seed)
+    today = datetime.date.today()
+    rules = []
+    for _ in range(count):
+        kind = rng.randrange(3)
+        selector = rng.choice(("product_id", "brand", "country"))
+        if selector == "product_id":
+            rule = {"product_id": rng.randrange(size)}
+        else:
+            rule = {selector: rng.choice(BRANDS if selector == "brand" else COUNTRIES)}
+        if kind == 0:
+            rule["markup"] = rng.choice((1.5, 1.8, 2.2, 2.5))
+        elif kind == 1:
+            rule["discounts"] = [{"min_quantity": 5, "percent": 5}, {"min_quantity": 20, "percent": 10}]
+        else:
+            rule["promotion"] = {"buy": rng.randint(2, 5), "free": 1}
+            # Half of the promotions run this week only
+            if rng.random() < 0.5:
+                rule["from"] = (today - datetime.timedelta(days=3)).strftime("%d-%m-%Y")
+                rule["to"] = (today + datetime.timedelta(days=3)).strftime("%d-%m-%Y")
+        rules.append(rule)
+    return {**DEFAULT_RULES, "rules": rules}
+
+def run(size):
+    """
+    Times compiling rule sets of growing size and pricing carts with them.
+
+    Args:
+        size (int): The number of products in the catalog.
+    """
+    with tempfile.TemporaryDirectory() as directory:
+        database_name = os.path.join(directory, "catalog.txt")
+        generate_catalog(database_name, size)
+        products = load_data(database_name)
+
+    rng = random.Random(0)
+    carts = [
+        [(products[rng.randrange(size)], rng.randint(1, 30)) for _ in range(CART_LINES)]
+        for _ in range(CARTS)
+    ]
+    print(f"{size} products, carts of {CART_LINES} lines")
+    for count in RULE_COUNTS:
+        defaults, rules = parse_config(generate_rules(count, size))
+        began = time.perf_counter()
+        prices = PriceTable(products, defaults, rules)
+        compile_time = time.perf_counter() - began
+
+        began = time.perf_counter()
+        for cart in carts:
+            total = sum(sale_item(product, quantity, prices)["total_item_price"] for product, quantity in cart)
+        per_cart = (time.perf_counter() - began) / CARTS * 1000
+        print(f"{count:>6} rules: compile {compile_time * 1000:.1f} ms, {len(prices.profiles)} profiles, "
+              f"price a cart {per_cart:.3f} ms (last total {format_money(total)})")
+
+if __name__ == "__main__":
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else CATALOG_SIZE)
@@ -0,0 +1,57 @@
+import os
+import random
+import sys
+import tempfile
+import time
+from benchmarks.catalog import generate_catalog, generate_sales_log
+from operations import sale_item
+from pricing import price_table
+from read import load_data
+from reorder import SalesVelocity
+from sales import SalesLog
+
+CATALOG_SIZE = 100000
+HISTORY_LINES = 500000
+SALES = 2000
+
+def run(size):
+    """
+    Times building sales velocities from a history, then refreshing them
+    and projecting the products sold after every single sale.
+
+    Args:
+        size (int): The number of products in the catalog.
+    """
+    with tempfile.TemporaryDirectory() as directory:
+        database_name = os.path.join(directory, "catalog.txt")
+        generate_catalog(database_name, size)
+        products = load_data(database_name)
+        log = SalesLog(os.path.join(directory, "catalog.txt.sales"))
+        generate_sales_log(log, HISTORY_LINES, size, days=60)
+
+        began = time.perf_counter()
+        velocity = SalesVelocity(log)
+        velocity.refresh(products)
+        build = time.perf_counter() - began
+
+        rng = random.Random(0)
+        prices = price_table(products)
+        began = time.perf_counter()
+        for _ in range(SALES):
+            item = sale_item(products[rng.randrange(size)], rng.randint(1, 4), prices)
+            log.append([item])
+            for product_id in velocity.refresh(products):
+                velocity.suggestion(products, product_id)
+        per_sale = (time.perf_counter() - began) / SALES * 1000
+
+        began = time.perf_counter()
+        suggestions = velocity.suggestions(products)
+        listing = time.perf_counter() - began
+
+    print(f"{size} products, {HISTORY_LINES} lines of history")
+    print(f"Build from history: {build:.3f} s")
+    print(f"Log, refresh and project after each sale: {per_sale:.3f} ms")
+    print(f"List {len(suggestions)} suggestions: {listing * 1000:.1f} ms")
+
+if __name__ == "__main__":
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else CATALOG_SIZE)
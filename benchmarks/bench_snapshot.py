@@ -0,0 +1,49 @@
+import os
+import sys
+import tempfile
+import time
+from benchmarks.catalog import generate_catalog
+from read import load_data
+from write import export_database
+
+SIZES = [10000, 100000, 1000000]
+
+def time_load(database_name):
+    """
+    Times one load_data call.
+
+    Args:
+        database_name (str): The database to load.
+
+    Returns:
+        tuple: (seconds, number of products loaded).
+    """
+    start = time.perf_counter()
+    products = load_data(database_name)
+    return time.perf_counter() - start, len(products)
+
+def run(sizes):
+    """
+    Compares CSV and binary snapshot load times for each catalog size.
+
+    Args:
+        sizes (list): Catalog sizes to benchmark.
+    """
+    print("{:<10} {:<12} {:<12} {:<10}".format("PRODUCTS", "CSV (s)", "BINARY (s)", "SPEEDUP"))
+    with tempfile.TemporaryDirectory() as directory:
+        for size in sizes:
+            csv_name = os.path.join(directory, f"catalog-{size}.txt")
+            binary_name = os.path.join(directory, f"catalog-{size}.bin")
+            generate_catalog(csv_name, size)
+
+            # Convert the CSV catalog into a binary snapshot
+            export_database(load_data(csv_name), binary_name)
+
+            csv_time, csv_count = time_load(csv_name)
+            binary_time, binary_count = time_load(binary_name)
+            assert csv_count == binary_count == size
+
+            print("{:<10} {:<12.4f} {:<12.4f} {:<10.1f}".format(size, csv_time, binary_time, csv_time / binary_time))
+
+if __name__ == "__main__":
+    run([int(size) for size in sys.argv[1:]] or SIZES)
@@ -0,0 +1,168 @@
+import argparse
+import os
+import random
+import sys
+import time
+from array import array
+from money import PAISA_PER_RUPEE, apply_rate, parse_rate
+from pricing import DEFAULT_RULES
+from sales import SALES_COLUMNS
+
+PRODUCT_TYPES = [
+    "Vitamin C Serum", "Skin Cleanser", "Sunscreen", "Moisturizing Cream", "Face Wash",
+    "Lip Balm", "Shampoo", "Face Mask", "Toner", "Night Cream", "Eye Cream", "Body Lotion",
+]
+BRANDS = [
+    "Garnier", "Cetaphil", "Aqualogica", "Neutrogena", "Himalaya", "Nivea", "Dove",
+    "L'Oreal", "Olay", "Lakme", "Biotique", "Mamaearth", "Plum", "Minimalist",
+]
+COUNTRIES = ["France", "Switzerland", "India", "USA", "Germany", "UK", "Japan", "Korea"]
+# Catalog lines generated per write
+GENERATE_CHUNK = 100000
+
+def parse_size(text):
+    """
+    Parses a catalog size such as 1000, 10k or 10M.
+
+    Args:
+        text (str): The size.
+
+    Returns:
+        int: The number of products.
+
+    Raises:
+        argparse.ArgumentTypeError: If the size is not a positive count.
+    """
+    multipliers = {"k": 1000, "m": 1000000}
+    text = text.strip().lower()
+    multiplier = multipliers.get(text[-1:], 1)
+    digits = text[:-1] if text[-1:] in multipliers else text
+    if not digits.isdigit() or int(digits) <= 0:
+        raise argparse.ArgumentTypeError(f"invalid catalog size: {text}")
+    return int(digits) * multiplier
+
+def generate_catalog(database_name, count, seed=0):
+    """
+    Writes a deterministic synthetic catalog in the product database format.
+
+    The same count and seed always produce the same file.
+
+    Args:
+        database_name (str): The name of the file to write.
+        count (int): The number of products to generate.
+        seed (int): Seed for the random number generator.
+    """
+    rng = random.Random(seed)
+    choice, randint = rng.choice, rng.randint
+    with open(database_name, "w") as file:
+        for start in range(0, count, GENERATE_CHUNK):
+            # Lines are built a chunk at a time to keep 10M-product catalogs quick
+            file.writelines([
+                f"{choice(PRODUCT_TYPES)} {i},{choice(BRANDS)},{randint(0, 500)},"
+                f"{float(randint(50, 2000))},{choice(COUNTRIES)}\n"
+                for i in range(start, min(start + GENERATE_CHUNK, count))
+            ])
+
+def generate_orders(orders_file, count, product_count, seed=0, lines_per_order=3):
+    """
+    Writes a deterministic file of sales orders for the batch seller.
+
+    Args:
+        orders_file (str): The name of the file to write.
+        count (int): The number of orders to generate.
+        product_count (int): The number of products in the catalog.
+        seed (int): Seed for the random number generator.
+        lines_per_order (int): The number of lines in each order.
+    """
+    rng = random.Random(seed)
+    with open(orders_file, "w") as file:
+        for order in range(count):
+            phone_number = 9800000000 + order
+            for _ in range(lines_per_order):
+                product_id = rng.randrange(product_count)
+                quantity = rng.randint(1, 4)
+                file.write(f"Customer {order},{phone_number},{product_id},{quantity}\n")
+
+def generate_purchase_orders(orders_file, count, product_count, seed=0, vendor_count=20):
+    """
+    Writes a deterministic vendor purchase-order file for bulk restocking.
+
+    Args:
+        orders_file (str): The name of the file to write.
+        count (int): The number of lines to generate.
+        product_count (int): The number of products in the catalog.
+        seed (int): Seed for the random number generator.
+        vendor_count (int): The number of distinct vendors.
+    """
+    rng = random.Random(seed)
+    with open(orders_file, "w") as file:
+        for _ in range(count):
+            vendor = f"Vendor {rng.randrange(vendor_count)}"
+            product_id = rng.randrange(product_count)
+            quantity = rng.randint(1, 200)
+            file.write(f"{vendor},{product_id},{quantity}\n")
+
+def generate_sales_log(log, count, product_count, seed=0, days=365):
+    """
+    Fills a sales log with deterministic synthetic invoice lines.
+
+    Lines are spread evenly over the given number of days up to now, in
+    time order, and priced with the default markup and promotion.
+
+    Args:
+        log (SalesLog): The empty sales log to fill.
+        count (int): The number of invoice lines to generate.
+        product_count (int): The number of products in the catalog.
+        seed (int): Seed for the random number generator.
+        days (int): The number of days the lines span.
+    """
+    rng = random.Random(seed)
+    start = int(time.time()) - days * 86400
+    markup = parse_rate(DEFAULT_RULES["markup"])
+    promotion = DEFAULT_RULES["promotion"]
+    columns = {column: array(typecode) for column, typecode in SALES_COLUMNS}
+    for line in range(count):
+        quantity = rng.randint(1, 6)
+        cost_price = rng.randint(50, 2000) * PAISA_PER_RUPEE
+        columns["timestamp"].append(start + line * days * 86400 // count)
+        columns["product_id"].append(rng.randrange(product_count))
+        columns["quantity"].append(quantity)
+        columns["free_items"].append(quantity // promotion["buy"] * promotion["free"])
+        columns["unit_price"].append(apply_rate(cost_price, markup))
+        columns["cost_price"].append(cost_price)
+    for column, data in columns.items():
+        with open(log.column_name(column), "wb") as file:
+            data.tofile(file)
+
+def main(argv=None):
+    """
+    Writes a catalog with matching order and purchase-order workloads.
+
+    Args:
+        argv (list): Command line arguments; sys.argv if None.
+    """
+    parser = argparse.ArgumentParser(description="Generate a deterministic catalog and scripted workloads.")
+    parser.add_argument("size", type=parse_size, help="number of products, such as 1000, 10k or 10M")
+    parser.add_argument("--orders", type=parse_size, default=0, help="sales orders to write to orders.txt")
+    parser.add_argument("--restock", type=parse_size, default=0,
+                        help="purchase-order lines to write to purchase-orders.txt")
+    parser.add_argument("--seed", type=int, default=0, help="seed for the random number generator (default: 0)")
+    parser.add_argument("--directory", default=".", help="directory to write to (default: current)")
+    arguments = parser.parse_args(argv)
+
+    os.makedirs(arguments.directory, exist_ok=True)
+    catalog_name = os.path.join(arguments.directory, "catalog.txt")
+    began = time.perf_counter()
+    generate_catalog(catalog_name, arguments.size, arguments.seed)
+    print(f"Wrote {arguments.size} products to {catalog_name} in {time.perf_counter() - began:.1f} s")
+    if arguments.orders:
+        orders_name = os.path.join(arguments.directory, "orders.txt")
+        generate_orders(orders_name, arguments.orders, arguments.size, arguments.seed)
+        print(f"Wrote {arguments.orders} orders to {orders_name}")
+    if arguments.restock:
+        restock_name = os.path.join(arguments.directory, "purchase-orders.txt")
+        generate_purchase_orders(restock_name, arguments.restock, arguments.size, arguments.seed)
+        print(f"Wrote {arguments.restock} purchase-order lines to {restock_name}")
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,80 @@
+import argparse
+import json
+import sys
+
+# Slowdowns above this fraction of the baseline count as regressions
+THRESHOLD = 0.10
+
+def timings(results):
+    """
+    Flattens suite results into the fastest run of each measurement,
+    which is the least disturbed by other load on the machine.
+
+    Args:
+        results (dict): Results as written by benchmarks.suite.
+
+    Returns:
+        dict: Seconds by (benchmark, size, measurement).
+    """
+    fastest = {}
+    for result in results["results"]:
+        for label, metrics in result["metrics"].items():
+            fastest[(result["benchmark"], result["size"], label)] = metrics["min"]
+    return fastest
+
+def compare(baseline, candidate, threshold=THRESHOLD):
+    """
+    Prints each measurement of two suite runs side by side.
+
+    Args:
+        baseline (dict): Results of the reference run.
+        candidate (dict): Results of the run to check.
+        threshold (float): Slowdown, as a fraction, counted as a regression.
+
+    Returns:
+        list: Keys of the measurements that regressed.
+    """
+    before, after = timings(baseline), timings(candidate)
+    regressions = []
+    print(f"Baseline:  {baseline['environment'].get('commit')}  ({baseline['environment'].get('date')})")
+    print(f"Candidate: {candidate['environment'].get('commit')}  ({candidate['environment'].get('date')})")
+    print("{:<12} {:>10} {:<20} {:>12} {:>12} {:>8}".format(
+        "BENCHMARK", "SIZE", "MEASUREMENT", "BEFORE ms", "AFTER ms", "RATIO"
+    ))
+    for key in sorted(before.keys() & after.keys()):
+        ratio = after[key] / before[key] if before[key] else float("inf")
+        flag = ""
+        if ratio > 1 + threshold:
+            regressions.append(key)
+            flag = "  REGRESSION"
+        print("{:<12} {:>10} {:<20} {:>12.2f} {:>12.2f} {:>7.2f}x{}".format(
+            *key, before[key] * 1000, after[key] * 1000, ratio, flag
+        ))
+    for key in sorted(before.keys() ^ after.keys()):
+        print(f"Only in {'baseline' if key in before else 'candidate'}: {' '.join(map(str, key))}")
+    return regressions
+
+def main(argv=None):
+    """
+    Compares two benchmark result files; exits with status 1 on a regression.
+
+    Args:
+        argv (list): Command line arguments; sys.argv if None.
+    """
+    parser = argparse.ArgumentParser(description="Compare two benchmark result files.")
+    parser.add_argument("baseline", help="results of the reference version")
+    parser.add_argument("candidate", help="results of the version to check")
+    parser.add_argument("--threshold", type=float, default=THRESHOLD * 100,
+                        help=f"slowdown in percent counted as a regression (default: {THRESHOLD * 100:.0f})")
+    arguments = parser.parse_args(argv)
+    with open(arguments.baseline) as file:
+        baseline = json.load(file)
+    with open(arguments.candidate) as file:
+        candidate = json.load(file)
+    regressions = compare(baseline, candidate, arguments.threshold / 100)
+    if regressions:
+        print(f"{len(regressions)} measurement(s) regressed by more than {arguments.threshold:g}%")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,158 @@
+import asyncio
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from benchmarks.catalog import generate_catalog
+
+CATALOG_SIZE = 10000
+CLIENTS = 32
+REQUESTS = 5000
+
+def free_port():
+    """
+    Asks the operating system for an unused TCP port.
+
+    Returns:
+        int: The port number.
+    """
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+async def request(reader, writer, method, target, payload=None):
+    """
+    Sends one request on a keep-alive connection and reads the response.
+
+    Args:
+        reader (asyncio.StreamReader): The connection's reader.
+        writer (asyncio.StreamWriter): The connection's writer.
+        method (str): The HTTP method.
+        target (str): The request target.
+        payload (dict): The JSON body, if any.
+
+    Returns:
+        int: The response status.
+    """
+    body = json.dumps(payload).encode() if payload is not None else b""
+    writer.write(
+        f"{method} {target} HTTP/1.1\r\nHost: localhost\r\n"
+        f"Content-Type: application/json\r\nContent-Length: {len(body)}\r\n\r\n".encode() + body
+    )
+    await writer.drain()
+    status = int((await reader.readline()).split()[1])
+    length = 0
+    while True:
+        header = await reader.readline()
+        if header in (b"\r\n", b""):
+            break
+        name, _, value = header.decode().partition(":")
+        if name.lower() == "content-length":
+            length = int(value)
+    await reader.readexactly(length)
+    return status
+
+async def client(port, seed, count, latencies, statuses):
+    """
+    Issues a mix of list, search and sell requests over one connection.
+
+    Args:
+        port (int): The server port.
+        seed (int): Seed for the random number generator.
+        count (int): The number of requests to send.
+        latencies (list): Request latencies in seconds, appended to.
+        statuses (dict): Response counts per status, updated in place.
+    """
+    rng = random.Random(seed)
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    for i in range(count):
+        kind = rng.random()
+        start = time.perf_counter()
+        if kind < 0.4:
+            status = await request(reader, writer, "GET", f"/products?page={rng.randrange(100)}")
+        elif kind < 0.7:
+            status = await request(reader, writer, "GET", f"/search?q=Toner%20{rng.randrange(CATALOG_SIZE)}")
+        else:
+            payload = {
+                "customer_name": f"Client {seed}-{i}",
+                "phone_number": "9800000000",
+                "items": [{"product": rng.randrange(CATALOG_SIZE), "quantity": rng.randint(1, 3)}],
+            }
+            status = await request(reader, writer, "POST", "/sell", payload)
+        latencies.append(time.perf_counter() - start)
+        statuses[status] = statuses.get(status, 0) + 1
+    writer.close()
+
+async def load(port, clients, requests):
+    """
+    Runs the clients concurrently and reports latency and throughput.
+
+    Args:
+        port (int): The server port.
+        clients (int): The number of concurrent connections.
+        requests (int): The total number of requests.
+    """
+    latencies = []
+    statuses = {}
+    start = time.perf_counter()
+    await asyncio.gather(*(client(port, seed, requests // clients, latencies, statuses) for seed in range(clients)))
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    p50 = latencies[len(latencies) // 2] * 1000
+    p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] * 1000
+    print(f"Requests: {len(latencies)} over {clients} connections, statuses: {statuses}")
+    print(f"p50: {p50:.2f} ms  p99: {p99:.2f} ms  throughput: {len(latencies) / elapsed:.0f} requests per second")
+
+async def wait_for_server(port, timeout=60):
+    """
+    Waits until the server accepts connections.
+
+    Args:
+        port (int): The server port.
+        timeout (float): Seconds to wait before giving up.
+    """
+    deadline = time.perf_counter() + timeout
+    while True:
+        try:
+            reader, writer = await asyncio.open_connection("127.0.0.1", port)
+            writer.close()
+            return
+        except OSError:
+            if time.perf_counter() > deadline:
+                raise
+            await asyncio.sleep(0.1)
+
+def run(clients, requests):
+    """
+    Starts a local server on a generated catalog and load-tests it.
+
+    Args:
+        clients (int): The number of concurrent connections.
+        requests (int): The total number of requests.
+    """
+    repository = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    with tempfile.TemporaryDirectory() as directory:
+        generate_catalog(os.path.join(directory, "catalog.txt"), CATALOG_SIZE)
+        port = free_port()
+        # Run from the temporary directory so invoices land there
+        server = subprocess.Popen(
+            [sys.executable, os.path.join(repository, "main.py"), "--database", "catalog.txt",
+             "--serve", "--port", str(port)],
+            cwd=directory,
+            stdout=subprocess.DEVNULL,
+        )
+        try:
+            asyncio.run(wait_for_server(port))
+            asyncio.run(load(port, clients, requests))
+        finally:
+            server.terminate()
+            server.wait()
+
+if __name__ == "__main__":
+    arguments = [int(argument) for argument in sys.argv[1:]]
+    run(*(arguments + [CLIENTS, REQUESTS][len(arguments):]))
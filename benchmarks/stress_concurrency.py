@@ -0,0 +1,129 @@
+import contextlib
+import io
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+import write
+from migrate import migrate
+from repository import open_repository
+
+PRODUCT_COUNT = 20
+INITIAL_STOCK = 200
+PROCESSES = 4
+THREADS = 4
+OPERATIONS = 300
+
+def session(products, repository, seed, operations, totals):
+    """
+    Runs one selling session: random sales with the odd restock.
+
+    Args:
+        products (ProductStore): The store shared by the process's threads.
+        repository (Repository): Where the products are kept.
+        seed (int): Seed for the random number generator.
+        operations (int): The number of transactions to attempt.
+        totals (dict): Committed stock deltas per product, updated in place.
+    """
+    rng = random.Random(seed)
+    for _ in range(operations):
+        product_id = rng.randrange(len(products))
+        quantity = rng.randint(1, 5)
+        if rng.random() < 0.1:
+            products.adjust(product_id, quantity)
+            delta = quantity
+        elif products.reserve(product_id, quantity):
+            delta = -quantity
+        else:
+            continue
+        if repository.commit(products, [(product_id, delta)], "stress"):
+            totals[product_id] = totals.get(product_id, 0) + delta
+
+def run_process(database_name, seed, threads, operations):
+    """
+    Runs several sessions as threads sharing one store in one process.
+
+    Args:
+        database_name (str): The name of the product database file.
+        seed (int): Seed for the random number generators.
+        threads (int): The number of threads.
+        operations (int): The number of transactions per thread.
+
+    Returns:
+        dict: Committed stock deltas per product across the threads.
+    """
+    # Compact often so sessions also have to follow new snapshots
+    write.JOURNAL_COMPACT_BYTES = 2048
+    repository = open_repository(database_name)
+    products = repository.load()
+    thread_totals = [{} for _ in range(threads)]
+    workers = [
+        threading.Thread(target=session, args=(products, repository, seed * 100 + i, operations, thread_totals[i]))
+        for i in range(threads)
+    ]
+    # Cancelled transactions are expected here; keep their messages quiet
+    with contextlib.redirect_stdout(io.StringIO()):
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+
+    totals = {}
+    for thread_total in thread_totals:
+        for product_id, delta in thread_total.items():
+            totals[product_id] = totals.get(product_id, 0) + delta
+    return totals
+
+def run(processes, threads, operations, sqlite=False):
+    """
+    Hammers one database from many processes and threads, then checks
+    that every committed change is in the final stock and none went
+    below zero.
+
+    Args:
+        processes (int): The number of processes.
+        threads (int): The number of threads per process.
+        operations (int): The number of transactions per thread.
+        sqlite (bool): Whether to use a SQLite database instead of a file.
+
+    Returns:
+        bool: True if stock was conserved.
+    """
+    with tempfile.TemporaryDirectory() as directory:
+        database_name = os.path.join(directory, "products.txt")
+        with open(database_name, "w") as file:
+            for product_id in range(PRODUCT_COUNT):
+                file.write(f"Product {product_id},Brand,{INITIAL_STOCK},100.0,India\n")
+        if sqlite:
+            with contextlib.redirect_stdout(io.StringIO()):
+                migrate(database_name, os.path.join(directory, "products.db"))
+            database_name = os.path.join(directory, "products.db")
+
+        start = time.perf_counter()
+        with ProcessPoolExecutor(max_workers=processes) as executor:
+            futures = [executor.submit(run_process, database_name, seed, threads, operations) for seed in range(processes)]
+            results = [future.result() for future in futures]
+        elapsed = time.perf_counter() - start
+
+        final = [product["stock"] for product in open_repository(database_name).load()]
+
+    expected = [INITIAL_STOCK] * PRODUCT_COUNT
+    commits = 0
+    for totals in results:
+        for product_id, delta in totals.items():
+            expected[product_id] += delta
+            commits += 1
+
+    conserved = final == expected and min(final) >= 0
+    print(f"{processes} processes x {threads} threads x {operations} operations in {elapsed:.2f} s")
+    print(f"Final stock: {final}")
+    print("Stock conserved" if conserved else f"STOCK MISMATCH, expected: {expected}")
+    return conserved
+
+if __name__ == "__main__":
+    arguments = [int(argument) for argument in sys.argv[1:] if argument != "--sqlite"]
+    counts = arguments + [PROCESSES, THREADS, OPERATIONS][len(arguments):]
+    sys.exit(0 if run(*counts, sqlite="--sqlite" in sys.argv) else 1)
@@ -0,0 +1,337 @@
+import argparse
+import builtins
+import contextlib
+import datetime
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from benchmarks.catalog import generate_catalog, generate_orders, generate_purchase_orders, parse_size
+from batch import process_order_file, process_purchase_order_file
+from operations import display_products, option_1, option_2, row_cache
+from read import load_data
+from repository import open_repository
+from write import export_database, flush_invoices, update_database
+
+# Catalog sizes run when none are given; up to 10M can be asked for
+DEFAULT_SIZES = ("1k", "10k", "100k")
+BENCHMARKS = ("load", "update", "display", "sell", "restock")
+# Orders and purchase lines in the scripted batch workloads
+ORDER_COUNT = 2000
+PURCHASE_LINES = 5000
+# Carts and lines per cart in the scripted interactive workloads
+CARTS = 20
+CART_LINES = 5
+REPEAT = 3
+
+def measure(function, repeat):
+    """
+    Runs a function several times and summarizes the timings.
+
+    Args:
+        function (callable): The function to time; called without arguments.
+        repeat (int): The number of runs.
+
+    Returns:
+        dict: Minimum, median and every run, in seconds.
+    """
+    runs = []
+    for _ in range(repeat):
+        began = time.perf_counter()
+        function()
+        runs.append(time.perf_counter() - began)
+    return {"min": min(runs), "median": statistics.median(runs), "runs": runs}
+
+class ScriptExhausted(BaseException):
+    """Raised when a scripted session asks for more input than was scripted."""
+
+@contextlib.contextmanager
+def scripted_input(answers):
+    """
+    Answers input() prompts from a list for the duration of a with block.
+
+    Running out of answers raises ScriptExhausted, which the menus'
+    exception handlers do not catch, so a script that goes wrong stops
+    the benchmark instead of looping.
+
+    Args:
+        answers (list): The answers, in the order they are asked for.
+    """
+    answers = iter(answers)
+
+    def answer(prompt=""):
+        try:
+            return next(answers)
+        except StopIteration:
+            raise ScriptExhausted(f"no scripted answer for {prompt!r}") from None
+
+    original = builtins.input
+    builtins.input = answer
+    try:
+        yield
+    finally:
+        builtins.input = original
+
+def sale_script(products, rng, carts, lines):
+    """
+    Scripts option_1 sessions that sell one item of products in stock.
+
+    Args:
+        products (ProductStore): The current products.
+        rng (random.Random): The random number generator.
+        carts (int): The number of sales.
+        lines (int): The number of lines per sale.
+
+    Returns:
+        list: The answers to give, cart after cart.
+    """
+    answers = []
+    for cart in range(carts):
+        answers += [f"Customer {cart}", str(9800000000 + cart)]
+        for line in range(lines):
+            product_id = rng.randrange(len(products))
+            while products[product_id]["stock"] < 2:
+                product_id = rng.randrange(len(products))
+            answers += [str(product_id), "1", "y" if line < lines - 1 else "n"]
+    return answers
+
+def restock_script(products, rng, carts, lines):
+    """
+    Scripts option_2 sessions that restock ten items of random products.
+
+    Args:
+        products (ProductStore): The current products.
+        rng (random.Random): The random number generator.
+        carts (int): The number of purchases.
+        lines (int): The number of lines per purchase.
+
+    Returns:
+        list: The answers to give, purchase after purchase.
+    """
+    answers = []
+    for cart in range(carts):
+        answers.append(f"Vendor {cart}")
+        for line in range(lines):
+            answers += [str(rng.randrange(len(products))), "10", "y" if line < lines - 1 else "n"]
+    return answers
+
+def bench_load(directory, size, repeat):
+    """
+    Times read.load_data on the CSV catalog and on a binary snapshot.
+
+    Returns:
+        dict: Timings and products loaded per second.
+    """
+    csv_name = os.path.join(directory, "catalog.txt")
+    binary_name = os.path.join(directory, "catalog.bin")
+    export_database(load_data(csv_name), binary_name)
+    results = {}
+    for label, name in (("csv", csv_name), ("binary", binary_name)):
+        timing = measure(lambda: load_data(name), repeat)
+        timing["products_per_second"] = size / timing["median"]
+        results[label] = timing
+    return results
+
+def bench_update(directory, size, repeat):
+    """
+    Times write.update_database, the full rewrite of the snapshot.
+
+    Returns:
+        dict: Timings for CSV and binary snapshots.
+    """
+    results = {}
+    for label, name in (("csv", "catalog.txt"), ("binary", "catalog.bin")):
+        name = os.path.join(directory, name)
+        products = load_data(name)
+        timing = measure(lambda: update_database(products, name), repeat)
+        timing["products_per_second"] = size / timing["median"]
+        results[label] = timing
+    return results
+
+def bench_display(directory, size, repeat):
+    """
+    Times operations.display_products for the first page, both with an
+    empty row cache and redrawn, and for the last page.
+
+    Returns:
+        dict: Timings per page drawn.
+    """
+    products = load_data(os.path.join(directory, "catalog.txt"))
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        def cold():
+            row_cache.pop(products, None)
+            display_products(products)
+        return {
+            "first_page_cold": measure(cold, repeat),
+            "first_page_cached": measure(lambda: display_products(products), repeat),
+            "last_page": measure(lambda: display_products(products, page=size), repeat),
+        }
+
+def bench_sell(directory, size, repeat):
+    """
+    Times scripted selling end to end: a batch order file through
+    batch.process_order_file, and interactive carts through option_1,
+    each including the commit, sales log and invoices.
+
+    Returns:
+        dict: Timings and throughput of both flows.
+    """
+    repository = open_repository(os.path.join(directory, "catalog.txt"))
+    products = repository.load()
+    index = repository.index(products)
+    orders_name = os.path.join(directory, "orders.txt")
+    generate_orders(orders_name, ORDER_COUNT, size)
+
+    def batch():
+        process_order_file(products, repository, orders_name, index, on_reject=lambda *reject: None)
+        flush_invoices()
+
+    rng = random.Random(0)
+
+    def interactive():
+        with scripted_input(sale_script(products, rng, CARTS, CART_LINES)):
+            for _ in range(CARTS):
+                option_1(products, repository, index)
+        flush_invoices()
+
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        batch_timing = measure(batch, repeat)
+        interactive_timing = measure(interactive, repeat)
+    batch_timing["orders_per_second"] = ORDER_COUNT / batch_timing["median"]
+    interactive_timing["carts_per_second"] = CARTS / interactive_timing["median"]
+    return {"batch": batch_timing, "interactive": interactive_timing}
+
+def bench_restock(directory, size, repeat):
+    """
+    Times scripted restocking end to end: a purchase-order file through
+    batch.process_purchase_order_file, and interactive purchases through
+    option_2.
+
+    Returns:
+        dict: Timings and throughput of both flows.
+    """
+    repository = open_repository(os.path.join(directory, "catalog.txt"))
+    products = repository.load()
+    index = repository.index(products)
+    orders_name = os.path.join(directory, "purchase-orders.txt")
+    generate_purchase_orders(orders_name, PURCHASE_LINES, size)
+
+    def batch():
+        process_purchase_order_file(products, repository, orders_name, index, on_reject=lambda *reject: None)
+        flush_invoices()
+
+    rng = random.Random(0)
+
+    def interactive():
+        with scripted_input(restock_script(products, rng, CARTS, CART_LINES)):
+            for _ in range(CARTS):
+                option_2(products, repository, index)
+        flush_invoices()
+
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        batch_timing = measure(batch, repeat)
+        interactive_timing = measure(interactive, repeat)
+    batch_timing["lines_per_second"] = PURCHASE_LINES / batch_timing["median"]
+    interactive_timing["purchases_per_second"] = CARTS / interactive_timing["median"]
+    return {"batch": batch_timing, "interactive": interactive_timing}
+
+BENCHMARK_FUNCTIONS = {
+    "load": bench_load,
+    "update": bench_update,
+    "display": bench_display,
+    "sell": bench_sell,
+    "restock": bench_restock,
+}
+
+def environment():
+    """
+    Describes the machine and code version the results come from.
+
+    Returns:
+        dict: Python version, platform, CPU count, git commit and time.
+    """
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True,
+            cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "python": platform.python_version(),
+        "implementation": platform.python_implementation(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "commit": commit,
+        "date": datetime.datetime.now().isoformat(timespec="seconds"),
+    }
+
+def run(sizes, benchmarks, repeat, output):
+    """
+    Runs the benchmarks on generated catalogs and writes the results.
+
+    Every size gets a fresh catalog from the same seed, so runs on
+    different versions of the code measure the same data. The sell
+    benchmark runs before restock, so restocks refill what was sold.
+
+    Args:
+        sizes (list): Catalog sizes.
+        benchmarks (list): Names from BENCHMARKS.
+        repeat (int): Runs per measurement.
+        output (str): The JSON file to write.
+
+    Returns:
+        dict: The results as written.
+    """
+    results = {"environment": environment(), "repeat": repeat, "results": []}
+    working_directory = os.getcwd()
+    for size in sizes:
+        with tempfile.TemporaryDirectory() as directory:
+            # Invoices and pricing rules are looked up in the working directory
+            os.chdir(directory)
+            try:
+                began = time.perf_counter()
+                generate_catalog(os.path.join(directory, "catalog.txt"), size)
+                print(f"{size} products: catalog generated in {time.perf_counter() - began:.1f} s")
+                for name in BENCHMARKS:
+                    if name not in benchmarks:
+                        continue
+                    metrics = BENCHMARK_FUNCTIONS[name](directory, size, repeat)
+                    results["results"].append({"benchmark": name, "size": size, "metrics": metrics})
+                    print(f"  {name}: " + ", ".join(
+                        f"{label} {timing['median'] * 1000:.1f} ms" for label, timing in metrics.items()
+                    ))
+            finally:
+                os.chdir(working_directory)
+
+    with open(output, "w") as file:
+        json.dump(results, file, indent=2)
+        file.write("\n")
+    print(f"Results written to {output}")
+    return results
+
+def main(argv=None):
+    """
+    Entry point of the benchmark suite.
+
+    Args:
+        argv (list): Command line arguments; sys.argv if None.
+    """
+    parser = argparse.ArgumentParser(description="Run the benchmark suite and write the results as JSON.")
+    parser.add_argument("--sizes", nargs="+", type=parse_size, default=[parse_size(size) for size in DEFAULT_SIZES],
+                        metavar="SIZE", help="catalog sizes such as 1k 10k 1M 10M (default: 1k 10k 100k)")
+    parser.add_argument("--only", nargs="+", choices=BENCHMARKS, default=list(BENCHMARKS),
+                        metavar="BENCHMARK", help=f"benchmarks to run: {', '.join(BENCHMARKS)} (default: all)")
+    parser.add_argument("--repeat", type=int, default=REPEAT, help=f"runs per measurement (default: {REPEAT})")
+    parser.add_argument("--output", default="benchmark-results.json",
+                        help="JSON file to write (default: benchmark-results.json)")
+    arguments = parser.parse_args(argv)
+    run(arguments.sizes, arguments.only, max(arguments.repeat, 1), os.path.abspath(arguments.output))
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
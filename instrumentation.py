@@ -0,0 +1,315 @@
+import atexit
+import collections
+import contextlib
+import functools
+import os
+import sys
+import threading
+import time
+
+# Set to 1 to time every stage and count hot-path events
+INSTRUMENT_VARIABLE = "WECARE_INSTRUMENT"
+# Set to a file name to record a cProfile of the session there
+PROFILE_VARIABLE = "WECARE_PROFILE"
+# Set to a file name to record a sampling profile, as collapsed stacks
+SAMPLE_VARIABLE = "WECARE_SAMPLE"
+# Milliseconds between samples of the sampling profiler
+SAMPLE_INTERVAL_VARIABLE = "WECARE_SAMPLE_INTERVAL"
+SAMPLE_INTERVAL_MS = 5
+
+# Histogram buckets are powers of two of microseconds, up to about 17 minutes
+HISTOGRAM_BUCKETS = 31
+
+enabled = os.environ.get(INSTRUMENT_VARIABLE, "") not in ("", "0")
+
+class Histogram:
+    """
+    Latency histogram of one stage with power-of-two buckets.
+
+    Bucket i counts the calls that took less than 2 ** i microseconds
+    (and at least half that), so recording is a bit_length and an
+    increment, and percentiles are read back to within a factor of two.
+    """
+
+    def __init__(self):
+        self.buckets = [0] * HISTOGRAM_BUCKETS
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def record(self, seconds):
+        """
+        Adds one call.
+
+        Args:
+            seconds (float): How long the call took.
+        """
+        bucket = min(int(seconds * 1e6).bit_length(), HISTOGRAM_BUCKETS - 1)
+        self.buckets[bucket] += 1
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    def percentile(self, fraction):
+        """
+        Estimates a latency percentile from the buckets.
+
+        Args:
+            fraction (float): The percentile as a fraction, such as 0.99.
+
+        Returns:
+            float: The upper bound of the bucket holding it, in seconds,
+                capped at the slowest call.
+        """
+        rank = fraction * self.count
+        seen = 0
+        for bucket, count in enumerate(self.buckets):
+            seen += count
+            if count and seen >= rank:
+                return min((1 << bucket) / 1e6, self.max)
+        return self.max
+
+    def summary(self):
+        """
+        Summarizes the histogram.
+
+        Returns:
+            dict: Call count, total, mean, p50, p90, p99 and max in seconds.
+        """
+        return {
+            "count": self.count,
+            "total": self.total,
+            "mean": self.total / self.count if self.count else 0.0,
+            "p50": self.percentile(0.5),
+            "p90": self.percentile(0.9),
+            "p99": self.percentile(0.99),
+            "max": self.max,
+        }
+
+class Instruments:
+    """Stage histograms and event counters shared by every thread."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.histograms = collections.defaultdict(Histogram)
+        self.counters = collections.Counter()
+        self.started = time.perf_counter()
+        self.reported = False  # Whether the summary was shown since the last event
+
+    def record(self, stage, seconds):
+        """
+        Records one call of a stage.
+
+        Args:
+            stage (str): The stage name, such as 'sell' or 'persist.commit'.
+            seconds (float): How long the call took.
+        """
+        with self.lock:
+            self.histograms[stage].record(seconds)
+            self.reported = False
+
+    def count(self, counter, amount=1):
+        """
+        Adds to a counter.
+
+        Args:
+            counter (str): The counter name.
+            amount (int): How much to add.
+        """
+        with self.lock:
+            self.counters[counter] += amount
+            self.reported = False
+
+    def summary(self):
+        """
+        Summarizes every stage and counter.
+
+        Returns:
+            dict: Seconds since start, stage summaries and counters.
+        """
+        with self.lock:
+            return {
+                "seconds": time.perf_counter() - self.started,
+                "stages": {stage: histogram.summary() for stage, histogram in sorted(self.histograms.items())},
+                "counters": dict(sorted(self.counters.items())),
+            }
+
+instruments = Instruments()
+
+def timed(stage):
+    """
+    Decorates a function so each call is timed as a stage.
+
+    With instrumentation off the function is returned unchanged, so
+    there is no cost at all.
+
+    Args:
+        stage (str): The stage name.
+
+    Returns:
+        callable: The decorator.
+    """
+    def decorate(function):
+        if not enabled:
+            return function
+
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            began = time.perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                instruments.record(stage, time.perf_counter() - began)
+        return wrapper
+    return decorate
+
+class StageTimer:
+    """Times the body of a with block as a stage."""
+
+    __slots__ = ("stage", "began")
+
+    def __init__(self, stage):
+        self.stage = stage
+
+    def __enter__(self):
+        self.began = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        instruments.record(self.stage, time.perf_counter() - self.began)
+        return False
+
+# Shared stand-in for StageTimer while instrumentation is off
+NO_TIMER = contextlib.nullcontext()
+
+def timing(stage):
+    """
+    Times a with block as a stage.
+
+    With instrumentation off this returns a shared do-nothing context,
+    so the block pays for one call and an empty enter and exit.
+
+    Args:
+        stage (str): The stage name.
+
+    Returns:
+        StageTimer: The context manager to use in the with statement.
+    """
+    return StageTimer(stage) if enabled else NO_TIMER
+
+def count(counter, amount=1):
+    """
+    Adds to a counter when instrumentation is on.
+
+    Args:
+        counter (str): The counter name.
+        amount (int): How much to add.
+    """
+    if enabled:
+        instruments.count(counter, amount)
+
+class SamplingProfiler:
+    """
+    Samples the stack of every thread at a fixed interval.
+
+    A background thread reads sys._current_frames, so the profiled code
+    runs unmodified; the cost is one stack walk per thread per sample.
+    Stacks are counted in collapsed form ('outer;inner;leaf count'),
+    which flame graph tools read directly.
+    """
+
+    def __init__(self, interval=SAMPLE_INTERVAL_MS / 1000):
+        self.interval = interval
+        self.stacks = collections.Counter()
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self.run, name="sampling-profiler", daemon=True)
+
+    def start(self):
+        """Starts sampling."""
+        self.thread.start()
+
+    def run(self):
+        """Takes samples until stopped."""
+        own = threading.get_ident()
+        while not self.stopped.wait(self.interval):
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                    frame = frame.f_back
+                self.stacks[";".join(reversed(stack))] += 1
+
+    def stop(self, file_name):
+        """
+        Stops sampling and writes the collapsed stacks.
+
+        Args:
+            file_name (str): The file to write.
+        """
+        self.stopped.set()
+        self.thread.join()
+        with open(file_name, "w") as file:
+            for stack, samples in self.stacks.most_common():
+                file.write(f"{stack} {samples}\n")
+
+# Profilers running for this session, with the files they go to
+profilers = []
+
+def start_profiling():
+    """Starts the profilers asked for by environment variable, once."""
+    if profilers:
+        return
+    profile_name = os.environ.get(PROFILE_VARIABLE)
+    if profile_name:
+        import cProfile
+        profiler = cProfile.Profile()
+        profiler.enable()
+        profilers.append((profiler, profile_name))
+    sample_name = os.environ.get(SAMPLE_VARIABLE)
+    if sample_name:
+        interval = float(os.environ.get(SAMPLE_INTERVAL_VARIABLE, SAMPLE_INTERVAL_MS)) / 1000
+        sampler = SamplingProfiler(interval)
+        sampler.start()
+        profilers.append((sampler, sample_name))
+
+def stop_profiling():
+    """Stops the session's profilers and writes their files."""
+    while profilers:
+        profiler, file_name = profilers.pop()
+        if isinstance(profiler, SamplingProfiler):
+            profiler.stop(file_name)
+        else:
+            profiler.disable()
+            profiler.dump_stats(file_name)
+        print(f"Profile written to {file_name}")
+
+def print_summary():
+    """Prints the stage latencies and counters collected so far, if any."""
+    if not enabled or instruments.reported:
+        return
+    summary = instruments.summary()
+    instruments.reported = True
+    print("-" * 100)
+    print(f"Instrumentation summary after {summary['seconds']:.1f} s")
+    print("{:<24} {:>8} {:>12} {:>12} {:>12} {:>12} {:>12}".format(
+        "STAGE", "CALLS", "TOTAL ms", "MEAN ms", "P50 ms", "P99 ms", "MAX ms"
+    ))
+    for stage, stats in summary["stages"].items():
+        print("{:<24} {:>8} {:>12.2f} {:>12.3f} {:>12.3f} {:>12.3f} {:>12.3f}".format(
+            stage, stats["count"], stats["total"] * 1000, stats["mean"] * 1000,
+            stats["p50"] * 1000, stats["p99"] * 1000, stats["max"] * 1000,
+        ))
+    for counter, value in summary["counters"].items():
+        print(f"{counter}: {value}")
+    print("-" * 100)
+
+def finish():
+    """Prints the summary and writes any profiles; safe to call twice."""
+    print_summary()
+    stop_profiling()
+
+atexit.register(finish)
@@ -0,0 +1,252 @@
+import datetime
+import json
+import os
+import threading
+from bisect import bisect_left, insort
+from locking import file_lock, lock_name
+
+# Directory the invoices are kept in, relative to the working directory
+INVOICE_DIRECTORY = "invoices"
+# Size after which a new segment file is started
+SEGMENT_BYTES = 4 * 1024 * 1024
+
+class InvoiceStore:
+    """
+    Invoices kept in rolling, append-only segment files.
+
+    Every invoice gets the next id in sequence and its text is appended to
+    the current segment file (segment-000001.txt, ...); a new segment is
+    started once the current one passes SEGMENT_BYTES. An append-only
+    index file holds one JSON line per invoice with its id, kind, date,
+    customer or vendor name, phone, total and place in its segment.
+
+    The index is kept in memory with maps by customer, vendor and phone
+    and a date-ordered list, so lookups never scan the directory. Appends
+    hold the index lock and first catch up on lines written by other
+    processes, so ids stay unique when several sessions share a directory.
+    The index lock is a file lock of its own, so writing invoices never
+    holds up stock commits.
+    """
+
+    def __init__(self, directory=INVOICE_DIRECTORY):
+        self.directory = os.path.abspath(directory)
+        self.index_name = os.path.join(self.directory, "index")
+        self.records = []  # Index records, indexed by id - 1
+        self.by_customer = {}
+        self.by_vendor = {}
+        self.by_phone = {}
+        self.by_date = []  # Sorted (date, id) pairs
+        self.index_offset = 0  # Bytes of the index file already read
+        self.lock = threading.RLock()  # Guards the in-memory index between threads
+        os.makedirs(self.directory, exist_ok=True)
+        self.refresh()
+
+    def segment_name(self, segment):
+        """
+        Builds the file name of a segment.
+
+        Args:
+            segment (int): The segment number.
+
+        Returns:
+            str: The path of the segment file.
+        """
+        return os.path.join(self.directory, f"segment-{segment:06d}.txt")
+
+    def add_to_index(self, record):
+        """
+        Adds one index record to the in-memory maps.
+
+        Args:
+            record (dict): The index record of an invoice.
+        """
+        self.records.append(record)
+        names = self.by_customer if record["kind"] == "sale" else self.by_vendor
+        names.setdefault(record["name"].lower(), []).append(record["id"])
+        if record["phone"]:
+            self.by_phone.setdefault(record["phone"], []).append(record["id"])
+        insort(self.by_date, (record["date"], record["id"]))
+
+    def refresh(self):
+        """Reads index lines appended since the last refresh."""
+        with self.lock:
+            try:
+                with open(self.index_name, "rb") as file:
+                    file.seek(self.index_offset)
+                    data = file.read()
+            except FileNotFoundError:
+                return
+
+            # A trailing line without a newline is still being written
+            end = data.rfind(b"\n") + 1
+            for line in data[:end].splitlines():
+                self.add_to_index(json.loads(line))
+            self.index_offset += end
+
+    def append(self, invoices):
+        """
+        Stores a batch of invoices.
+
+        The segment is flushed to disk before the index lines are written,
+        so the index never names text that is not there; the index lines
+        are then flushed to disk as well.
+
+        Args:
+            invoices (list): Dictionaries with kind ('sale' or 'purchase'),
+                date, name, phone, total in paisa and text.
+
+        Returns:
+            list: The ids given to the invoices.
+        """
+        with self.lock, file_lock(lock_name(self.index_name)):
+            self.refresh()
+            segment = self.records[-1]["segment"] if self.records else 1
+            first_id = next_id = len(self.records) + 1
+
+            records = []
+            data = bytearray()
+            file = open(self.segment_name(segment), "ab")
+            try:
+                size = file.tell()
+                for invoice in invoices:
+                    # Roll over to a new segment when the current one is full
+                    if size + len(data) >= SEGMENT_BYTES:
+                        file.write(data)
+                        file.flush()
+                        os.fsync(file.fileno())
+                        file.close()
+                        segment += 1
+                        file = open(self.segment_name(segment), "ab")
+                        size = file.tell()
+                        data = bytearray()
+
+                    text = invoice["text"].encode("utf-8")
+                    data += f"#invoice {next_id}\n".encode()
+                    record = {
+                        "id": next_id,
+                        "kind": invoice["kind"],
+                        "date": invoice["date"],
+                        "name": invoice["name"],
+                        "phone": invoice["phone"],
+                        "total": invoice["total"],
+                        "segment": segment,
+                        "offset": size + len(data),
+                        "length": len(text),
+                    }
+                    data += text
+                    records.append(record)
+                    next_id += 1
+                file.write(data)
+                file.flush()
+                os.fsync(file.fileno())
+            finally:
+                file.close()
+
+            lines = "".join(json.dumps(record) + "\n" for record in records).encode("utf-8")
+            with open(self.index_name, "ab") as index_file:
+                # Drop a torn line left by a writer that crashed
+                index_file.truncate(self.index_offset)
+                index_file.write(lines)
+                index_file.flush()
+                os.fsync(index_file.fileno())
+
+            # The lines just written follow the ones already read, so index them without reading them back
+            for record in records:
+                self.add_to_index(record)
+            self.index_offset += len(lines)
+        return list(range(first_id, next_id))
+
+    def get(self, invoice_id):
+        """
+        Looks up the index record of an invoice.
+
+        Args:
+            invoice_id (int): The id of the invoice.
+
+        Returns:
+            dict: The index record, or None if there is no such invoice.
+        """
+        self.refresh()
+        if not 0 < invoice_id <= len(self.records):
+            return None
+        return self.records[invoice_id - 1]
+
+    def read(self, invoice_id):
+        """
+        Reads the text of an invoice.
+
+        Args:
+            invoice_id (int): The id of the invoice.
+
+        Returns:
+            str: The invoice text, or None if there is no such invoice.
+        """
+        record = self.get(invoice_id)
+        if record is None:
+            return None
+        with open(self.segment_name(record["segment"]), "rb") as file:
+            file.seek(record["offset"])
+            return file.read(record["length"]).decode("utf-8")
+
+    def find(self, customer=None, vendor=None, phone=None, start=None, end=None):
+        """
+        Finds invoices matching every given filter.
+
+        Args:
+            customer (str): The customer name, any case.
+            vendor (str): The vendor name, any case.
+            phone (str): The customer's phone number.
+            start (datetime.date): The first day to include.
+            end (datetime.date): The last day to include.
+
+        Returns:
+            list: Ids of the matching invoices in ascending order.
+        """
+        self.refresh()
+        candidates = None
+        for postings in (
+            None if customer is None else self.by_customer.get(customer.strip().lower(), []),
+            None if vendor is None else self.by_vendor.get(vendor.strip().lower(), []),
+            None if phone is None else self.by_phone.get(phone.strip(), []),
+        ):
+            if postings is not None:
+                candidates = set(postings) if candidates is None else candidates.intersection(postings)
+
+        if start is not None or end is not None:
+            # Dates are ISO strings, so a day's entries all sort after the bare day
+            low = 0 if start is None else bisect_left(self.by_date, (str(start),))
+            high = len(self.by_date) if end is None else bisect_left(self.by_date, (str(end) + "\uffff",))
+            in_range = (invoice_id for _, invoice_id in self.by_date[low:high])
+            candidates = set(in_range) if candidates is None else candidates.intersection(in_range)
+
+        if candidates is None:
+            return list(range(1, len(self.records) + 1))
+        return sorted(candidates)
+
+def parse_filters(pairs):
+    """
+    Converts (key, value) filter pairs into InvoiceStore.find arguments.
+
+    Keys are customer, vendor, phone, from and to; dates are written
+    dd-mm-YYYY like the invoices themselves.
+
+    Args:
+        pairs (iterable): (key, value) pairs, e.g. from 'customer:Ram'.
+
+    Returns:
+        dict: Keyword arguments for InvoiceStore.find.
+
+    Raises:
+        ValueError: If a key is unknown or a date is malformed.
+    """
+    arguments = {}
+    for key, value in pairs:
+        key = key.strip().lower()
+        if key in ("customer", "vendor", "phone"):
+            arguments[key] = value
+        elif key in ("from", "to"):
+            date = datetime.datetime.strptime(value.strip(), "%d-%m-%Y").date()
+            arguments["start" if key == "from" else "end"] = date
+        else:
+            raise ValueError(f"unknown invoice filter '{key}'")
+    return arguments
@@ -0,0 +1,81 @@
+import contextlib
+import threading
+
+try:
+    import fcntl
+except ImportError:  # Windows has no fcntl; fall back to msvcrt byte locks
+    fcntl = None
+    import msvcrt
+
+# Serializes commits between threads of one process
+commit_lock = threading.RLock()
+
+def lock_name(database_name):
+    """
+    Builds the name of the lock file guarding a database.
+
+    Args:
+        database_name (str): The name of the product database file.
+
+    Returns:
+        str: The lock file name.
+    """
+    return f"{database_name}.lock"
+
+@contextlib.contextmanager
+def database_lock(database_name, shared=False):
+    """
+    Holds the database lock for the duration of a with block.
+
+    Exclusive holders (commits and compaction) exclude everyone else,
+    across threads and processes. Shared holders (loaders) only exclude
+    exclusive holders; on Windows every lock is exclusive.
+
+    Args:
+        database_name (str): The name of the product database file.
+        shared (bool): Whether a shared lock is enough.
+    """
+    with contextlib.ExitStack() as stack:
+        if not shared:
+            stack.enter_context(commit_lock)
+        stack.enter_context(file_lock(lock_name(database_name), shared))
+        yield
+
+@contextlib.contextmanager
+def file_lock(file_name, shared=False):
+    """
+    Holds a lock on a file between processes for the duration of a with
+    block.
+
+    Unlike database_lock it does not take commit_lock, so files other
+    than the product database can be locked without holding up commits.
+    Callers serialize their own threads.
+
+    Args:
+        file_name (str): The name of the lock file; created if missing.
+        shared (bool): Whether a shared lock is enough.
+    """
+    with open(file_name, "a+b") as file:
+        if fcntl is not None:
+            fcntl.flock(file.fileno(), fcntl.LOCK_SH if shared else fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(file.fileno(), fcntl.LOCK_UN)
+        else:
+            file.seek(0)
+            msvcrt.locking(file.fileno(), msvcrt.LK_LOCK, 1)
+            try:
+                yield
+            finally:
+                unlock_msvcrt(file)
+
+def unlock_msvcrt(file):
+    """
+    Releases a byte lock taken with msvcrt on Windows.
+
+    Args:
+        file (file): The locked lock file.
+    """
+    file.seek(0)
+    msvcrt.locking(file.fileno(), msvcrt.LK_UNLCK, 1)
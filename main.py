@@ -1,76 +1,432 @@
-from read import load_data
-from write import update_database
-from operations import display_products, option_1, option_2, option_3
-
-def display_intro():
-    """Displays a welcome message to the system administrator."""
-    print("WeCare Wholesale.")
-    print("Welcome system admin")
-
-def admin_options(products, database_name):
-    """
-    Displays the main admin menu and handles user selection.
-
-    Args:
-        products (list): The current product list.
-        database_name (str): The name of the product database file.
-    """
-    main_loop = True
-    while main_loop:
-        try:
-            # Display menu options
-            print("-" * 50)
-            print("Given below are options for carrying out operations")
-            print("-" * 50)
-            print("\n")
-            print("Press 1 to sell product to customer")
-            print("Press 2 to purchase from manufacturer")
-            print("Press 3 to exit from system")
-            print("\n")
-            print("-" * 50)
-            print("\n")
-
-            # Get user choice
-            option = input("Enter option: ")
-            print("\n")
-            while not option.isnumeric():
-                print("Input should be a number")
-                option = input("Enter option: ")
-                print("\n")
-
-            # Process user choice
-            if option == "1":
-                option_1(products, database_name)  # Sell products
-            elif option == "2":
-                option_2(products, database_name)  # Restock products
-            elif option == "3":
-                option_3()  # Exit system
-                main_loop = False
-            else:
-                print("Please enter option 1,2 or 3")
-                print("\n")
-        except Exception as e:
-            # Handle errors in menu navigation
-            print(f"An error occurred in menu navigation: {e}")
-            print("Returning to main menu...\n")
-
-def main():
-    """Main function, entry point of the program."""
-    try:
-        # Initialize system
-        display_intro()
-        database_name = "product_database.txt"
-        
-        # Load product data
-        products = load_data(database_name)
-        
-        # Display products and show menu
-        display_products(products)
-        admin_options(products, database_name)
-    except Exception as e:
-        # Handle critical errors
-        print(f"A critical error occurred: {e}")
-        print("The program will now exit.")
-
-if __name__ == "__main__":
-    main()
+import argparse
+from instrumentation import INSTRUMENT_VARIABLE, PROFILE_VARIABLE, SAMPLE_VARIABLE, start_profiling
+from settings import PRICING_RULES_FILE, TOP_COUNT
+# Everything else is imported by the function running a command, so short
+# invocations such as --invoice or --snapshots only load what they use
+
+# Seconds to wait for the catalog before starting the menu while it loads
+LOAD_WAIT = 0.5
+
+def display_intro():
+    """Displays a welcome message to the system administrator."""
+    print("WeCare Wholesale.")
+    print("Welcome system admin")
+
+def admin_options(loading, repository):
+    """
+    Displays the main admin menu and handles user selection.
+
+    The menu is usable while the catalog is still loading; stock alerts
+    are shown once it has loaded, and selling or restocking waits for it.
+
+    Args:
+        loading (BackgroundLoad): The load of the products and their index.
+        repository (Repository): Where the products are kept.
+    """
+    from operations import display_stock_alerts, option_1, option_2, option_3
+
+    main_loop = True
+    while main_loop:
+        try:
+            # Display stock alerts and menu options
+            print("-" * 50)
+            if loading.done():
+                products, index = loading.result()
+                display_stock_alerts(products)
+            else:
+                print("Stock alerts will show once the catalog has loaded.")
+            print("-" * 50)
+            print("Given below are options for carrying out operations")
+            print("-" * 50)
+            print("\n")
+            print("Press 1 to sell product to customer")
+            print("Press 2 to purchase from manufacturer")
+            print("Press 3 to exit from system")
+            print("\n")
+            print("-" * 50)
+            print("\n")
+
+            # Get user choice
+            option = input("Enter option: ")
+            print("\n")
+            while not option.isnumeric():
+                print("Input should be a number")
+                option = input("Enter option: ")
+                print("\n")
+
+            # Process user choice
+            if option == "1":
+                products, index = loading.result()
+                option_1(products, repository, index)  # Sell products
+            elif option == "2":
+                products, index = loading.result()
+                option_2(products, repository, index)  # Restock products
+            elif option == "3":
+                option_3()  # Exit system
+                main_loop = False
+            else:
+                print("Please enter option 1,2 or 3")
+                print("\n")
+        except Exception as e:
+            # Handle errors in menu navigation
+            print(f"An error occurred in menu navigation: {e}")
+            print("Returning to main menu...\n")
+
+def parse_day(text):
+    """
+    Parses the day of a --from or --to option, as sales.parse_day does.
+
+    Args:
+        text (str): The day, written DD-MM-YYYY.
+
+    Returns:
+        datetime.date: The parsed day.
+    """
+    from sales import parse_day
+    return parse_day(text)
+
+def parse_arguments(argv=None):
+    """
+    Parses the command line options.
+
+    Args:
+        argv (list): The arguments to parse; sys.argv if None.
+
+    Returns:
+        argparse.Namespace: The parsed options.
+    """
+    parser = argparse.ArgumentParser(
+        description="WeCare Wholesale product management system.",
+        epilog=f"Set {INSTRUMENT_VARIABLE}=1 to time each stage and print a summary on exit, "
+               f"{PROFILE_VARIABLE}=FILE to save a cProfile of the session, or "
+               f"{SAMPLE_VARIABLE}=FILE to save a sampling profile as collapsed stacks.",
+    )
+    parser.add_argument("--database", default="product_database.txt",
+                        help="product database: a CSV file, a .bin snapshot or a .db SQLite database "
+                             "(default: product_database.txt)")
+    parser.add_argument("--pricing", default=PRICING_RULES_FILE, metavar="RULES_FILE",
+                        help="JSON file of markup, discount and promotion rules; the built-in 2x markup and "
+                             f"buy 3 get 1 free apply while it does not exist (default: {PRICING_RULES_FILE})")
+    parser.add_argument("--sell", metavar="ORDERS_FILE",
+                        help="sell the orders in ORDERS_FILE without the interactive menu")
+    parser.add_argument("--restock", metavar="PURCHASE_ORDER_FILE",
+                        help="restock the lines of PURCHASE_ORDER_FILE without the interactive menu")
+    parser.add_argument("--serve", action="store_true",
+                        help="serve the inventory over HTTP/JSON instead of the interactive menu")
+    parser.add_argument("--invoices", nargs="*", metavar="FILTER",
+                        help="list saved invoices matching filters such as customer:NAME, vendor:NAME, "
+                             "phone:NUMBER, from:DD-MM-YYYY and to:DD-MM-YYYY")
+    parser.add_argument("--invoice", type=int, metavar="ID", help="print the saved invoice with this id")
+    parser.add_argument("--sales-report", action="store_true",
+                        help="print revenue, margin and top sellers from the sales log")
+    parser.add_argument("--from", dest="start", type=parse_day, metavar="DD-MM-YYYY",
+                        help="first day included in --sales-report")
+    parser.add_argument("--to", dest="end", type=parse_day, metavar="DD-MM-YYYY",
+                        help="last day included in --sales-report")
+    parser.add_argument("--top", type=int, default=TOP_COUNT,
+                        help=f"entries in each top list of --sales-report (default: {TOP_COUNT})")
+    parser.add_argument("--suggest-orders", metavar="PURCHASE_ORDER_FILE",
+                        help="write purchase orders suggested by recent sales to PURCHASE_ORDER_FILE")
+    parser.add_argument("--snapshots", action="store_true",
+                        help="list the snapshots kept of the database for rollback")
+    parser.add_argument("--rollback", type=int, metavar="GENERATION",
+                        help="restore the stock and catalog of a snapshot listed by --snapshots")
+    parser.add_argument("--host", default="127.0.0.1", help="interface for --serve (default: 127.0.0.1)")
+    parser.add_argument("--port", type=int, default=8080, help="port for --serve (default: 8080)")
+    return parser.parse_args(argv)
+
+def run_batch_sales(database_name, orders_file):
+    """
+    Sells a file of orders and prints a summary.
+
+    Args:
+        database_name (str): The name of the product database file.
+        orders_file (str): The name of the file of orders.
+    """
+    from batch import process_order_file
+    from money import format_money
+    from repository import open_repository
+    from write import flush_invoices
+
+    repository = open_repository(database_name)
+    products = repository.load()
+    summary = process_order_file(products, repository, orders_file)
+    invoices = flush_invoices()
+
+    print("-" * 50)
+    print(f"Orders invoiced: {summary['orders']}")
+    print(f"Lines sold: {summary['lines']}")
+    print(f"Lines rejected: {summary['rejected']}")
+    print(f"Grand Total: {format_money(summary['grand_total'])}")
+    print(f"Time: {summary['seconds']:.3f} s ({summary['orders_per_second']:.0f} orders per second)")
+    print(f"Invoices written: {invoices['written']} ({invoices['errors']} failed)")
+    print("-" * 50)
+
+def run_batch_restock(database_name, orders_file):
+    """
+    Restocks a purchase-order file and prints a summary.
+
+    Args:
+        database_name (str): The name of the product database file.
+        orders_file (str): The name of the purchase-order file.
+    """
+    from batch import process_purchase_order_file
+    from money import format_money
+    from repository import open_repository
+    from write import flush_invoices
+
+    repository = open_repository(database_name)
+    products = repository.load()
+    summary = process_purchase_order_file(products, repository, orders_file)
+    invoices = flush_invoices()
+
+    print("-" * 50)
+    print(f"Vendors invoiced: {summary['vendors']}")
+    print(f"Lines restocked: {summary['lines']}")
+    print(f"Lines rejected: {summary['rejected']}")
+    print(f"Grand Total: {format_money(summary['grand_total_cost'])}")
+    print(f"Time: {summary['seconds']:.3f} s ({summary['lines_per_second']:.0f} lines per second)")
+    print(f"Invoices written: {invoices['written']} ({invoices['errors']} failed)")
+    print("-" * 50)
+
+def run_invoice_search(filters):
+    """
+    Lists the saved invoices matching filters.
+
+    Args:
+        filters (list): Filters written 'key:value'.
+    """
+    from invoices import InvoiceStore, parse_filters
+    from money import format_money
+
+    try:
+        arguments = parse_filters(term.split(":", 1) if ":" in term else (term, "") for term in filters)
+    except ValueError as e:
+        print(f"Invalid filter: {e}")
+        return
+
+    store = InvoiceStore()
+    invoice_ids = store.find(**arguments)
+    print("-" * 100)
+    print("{:<8} {:<20} {:<10} {:<30} {:<15} {:<15}".format("ID", "Date", "Kind", "Customer/Vendor", "Phone", "Total"))
+    print("-" * 100)
+    for invoice_id in invoice_ids:
+        record = store.get(invoice_id)
+        print("{:<8} {:<20} {:<10} {:<30} {:<15} {:<15}".format(
+            record["id"], record["date"], record["kind"], record["name"], record["phone"], format_money(record["total"])
+        ))
+    print("-" * 100)
+    print(f"Invoices found: {len(invoice_ids)}")
+
+def show_invoice(invoice_id):
+    """
+    Prints one saved invoice.
+
+    Args:
+        invoice_id (int): The id of the invoice.
+    """
+    from invoices import InvoiceStore
+
+    text = InvoiceStore().read(invoice_id)
+    if text is None:
+        print(f"No invoice with id {invoice_id}.")
+        return
+    print(text, end="")
+
+def run_sales_report(database_name, start, end, top):
+    """
+    Prints the sales summary for a range of days.
+
+    Args:
+        database_name (str): The name of the product database.
+        start (datetime.date): The first day included, or None.
+        end (datetime.date): The last day included, or None.
+        top (int): The number of entries in each top list.
+    """
+    from analytics import sales_summary
+    from money import format_money
+    from repository import open_repository
+    from sales import open_sales_log
+
+    products = open_repository(database_name).load()
+    summary = sales_summary(open_sales_log(database_name).read(start, end), products, top)
+
+    print("-" * 50)
+    print(f"Sales from {start.strftime('%d-%m-%Y') if start else 'the beginning'} "
+          f"to {end.strftime('%d-%m-%Y') if end else 'today'}")
+    print("-" * 50)
+    print(f"Invoice lines: {summary['lines']}")
+    print(f"Items sold: {summary['items_sold']} (plus {summary['free_items']} free)")
+    print(f"Revenue: {format_money(summary['revenue'])}")
+    print(f"Cost of items sold: {format_money(summary['cost_of_sales'])}")
+    print(f"Margin: {format_money(summary['margin'])}")
+    print(f"Cost of free items: {format_money(summary['giveaway_cost'])}")
+    print(f"Net margin: {format_money(summary['net_margin'])}")
+    for title, key in (("Top products", "top_products"), ("Top brands", "top_brands"), ("Top countries", "top_countries")):
+        print("-" * 50)
+        print(f"{title} by revenue")
+        for name, revenue in summary[key]:
+            print("{:<40} {:>15}".format(name, format_money(revenue)))
+    print("-" * 50)
+
+def run_suggest_orders(database_name, orders_file):
+    """
+    Writes the purchase orders suggested by recent sales and summarizes them.
+
+    Args:
+        database_name (str): The name of the product database.
+        orders_file (str): The name of the purchase-order file to write.
+    """
+    from money import format_money
+    from reorder import open_sales_velocity, suggest_purchase_orders, write_purchase_order_file
+    from repository import open_repository
+
+    products = open_repository(database_name).load()
+    orders = suggest_purchase_orders(products, open_sales_velocity(database_name))
+    write_purchase_order_file(orders, orders_file)
+
+    print("-" * 50)
+    for order in orders:
+        print(f"{order['brand']} ({order['country']}): {len(order['lines'])} products, "
+              f"total cost {format_money(order['total_cost'])}")
+    print("-" * 50)
+    print(f"Suggested lines: {sum(len(order['lines']) for order in orders)}, written to {orders_file}")
+    print(f"Review the file, then restock it with --restock {orders_file}")
+
+def run_list_snapshots(database_name):
+    """
+    Lists the snapshots kept of a database, checking each one.
+
+    Args:
+        database_name (str): The name of the product database file.
+    """
+    import datetime
+    import os
+    from read import check_snapshot, is_binary_database, retained_generations, retained_snapshot_name
+    from repository import is_sqlite_database
+
+    if is_sqlite_database(database_name):
+        print("SQLite databases keep no snapshots; back them up with the sqlite3 .backup command.")
+        return
+    binary = is_binary_database(database_name)
+    generations = retained_generations(database_name)
+
+    print("-" * 50)
+    print("{:<12} {:<22} {:<15}".format("Generation", "Written", "Products"))
+    print("-" * 50)
+    for generation in generations:
+        snapshot_name = retained_snapshot_name(database_name, generation)
+        written = datetime.datetime.fromtimestamp(os.path.getmtime(snapshot_name))
+        try:
+            count = check_snapshot(snapshot_name, binary)
+            status = "unknown" if count is None else str(count)
+        except (ValueError, OSError) as e:
+            status = f"damaged ({e})"
+        print("{:<12} {:<22} {:<15}".format(generation, written.strftime("%d-%m-%Y %H:%M:%S"), status))
+    print("-" * 50)
+    print(f"Snapshots kept: {len(generations)}")
+    if generations:
+        print("Restore one with --rollback GENERATION")
+
+def run_rollback(database_name, generation):
+    """
+    Restores a kept snapshot of a database and reports the result.
+
+    Args:
+        database_name (str): The name of the product database file.
+        generation (int): The generation to restore.
+    """
+    from repository import is_sqlite_database
+    from write import rollback_database
+
+    if is_sqlite_database(database_name):
+        print("SQLite databases keep no snapshots to roll back to.")
+        return
+    try:
+        new_generation = rollback_database(database_name, generation)
+    except FileNotFoundError:
+        print(f"No snapshot of generation {generation} is kept; see --snapshots.")
+        return
+    except ValueError as e:
+        print(f"Error: the snapshot of generation {generation} cannot be restored: {e}.")
+        return
+    print(f"Restored generation {generation} as generation {new_generation}.")
+    print(f"The state before the rollback is kept as generation {new_generation - 1}.")
+
+def main(argv=None):
+    """
+    Main function, entry point of the program.
+
+    Args:
+        argv (list): Command line arguments; sys.argv if None.
+    """
+    arguments = parse_arguments(argv)
+    start_profiling()
+    reports = (
+        arguments.restock, arguments.invoices is not None, arguments.invoice is not None, arguments.sales_report,
+        arguments.suggest_orders, arguments.snapshots, arguments.rollback is not None,
+    )
+    # Only selling reads the pricing rules: --sell, --serve and the menu
+    if arguments.sell or not any(reports):
+        from pricing import pricing_engine
+        try:
+            pricing_engine.use(arguments.pricing)
+        except (OSError, ValueError) as e:
+            print(f"Error: invalid pricing rules in '{arguments.pricing}': {e}")
+            return
+    try:
+        # Non-interactive batch mode
+        if arguments.sell:
+            run_batch_sales(arguments.database, arguments.sell)
+            return
+        if arguments.restock:
+            run_batch_restock(arguments.database, arguments.restock)
+            return
+        if arguments.invoices is not None:
+            run_invoice_search(arguments.invoices)
+            return
+        if arguments.invoice is not None:
+            show_invoice(arguments.invoice)
+            return
+        if arguments.sales_report:
+            run_sales_report(arguments.database, arguments.start, arguments.end, arguments.top)
+            return
+        if arguments.suggest_orders:
+            run_suggest_orders(arguments.database, arguments.suggest_orders)
+            return
+        if arguments.snapshots:
+            run_list_snapshots(arguments.database)
+            return
+        if arguments.rollback is not None:
+            run_rollback(arguments.database, arguments.rollback)
+            return
+        if arguments.serve:
+            import asyncio
+            from server import serve
+            asyncio.run(serve(arguments.database, arguments.host, arguments.port))
+            return
+
+        # Initialize system
+        from operations import PAGE_SIZE, display_products
+        from repository import BackgroundLoad, open_repository
+        display_intro()
+        repository = open_repository(arguments.database)
+
+        # Load product data, starting the menu early if that takes long
+        loading = BackgroundLoad(repository)
+        if loading.done(LOAD_WAIT):
+            products, index = loading.result()
+            display_products(products)
+        else:
+            display_products(repository.preview(PAGE_SIZE))
+            print("Loading the rest of the catalog; selling and restocking will wait for it.")
+        admin_options(loading, repository)
+    except KeyboardInterrupt:
+        print("\nStopped.")
+    except Exception as e:
+        # Handle critical errors
+        print(f"A critical error occurred: {e}")
+        print("The program will now exit.")
+
+if __name__ == "__main__":
+    main()
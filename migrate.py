@@ -0,0 +1,64 @@
+import argparse
+import os
+import sys
+import time
+from read import load_data
+from repository import SQLiteRepository, is_sqlite_database
+
+def migrate(source, target):
+    """
+    Copies a CSV or binary product database into a new SQLite database.
+
+    Journal entries not yet folded into the source are replayed first, so
+    every committed transaction is carried over. Product ids are kept.
+
+    Args:
+        source (str): The name of the product database file.
+        target (str): The name of the SQLite database to create.
+
+    Returns:
+        bool: True if the copy holds the same products and stock.
+    """
+    start = time.perf_counter()
+    products = load_data(source)
+    repository = SQLiteRepository(target)
+    repository.import_products(products)
+
+    # Check the copy against the source
+    count, total_stock = repository.connection().execute(
+        "SELECT COUNT(*), COALESCE(SUM(stock), 0) FROM products"
+    ).fetchone()
+    matches = count == len(products) and total_stock == sum(products.committed_stock())
+
+    print("-" * 50)
+    print(f"Products copied: {count} of {len(products)}")
+    print(f"Items in stock: {total_stock}")
+    print(f"Time: {time.perf_counter() - start:.3f} s")
+    print("Migration complete" if matches else "Error: the copy does not match the source")
+    print("-" * 50)
+    return matches
+
+def main(argv=None):
+    """
+    Entry point of the migration tool.
+
+    Args:
+        argv (list): Command line arguments; sys.argv if None.
+    """
+    parser = argparse.ArgumentParser(description="Copy a product database file into a new SQLite database.")
+    parser.add_argument("source", nargs="?", default="product_database.txt",
+                        help="product database file (default: product_database.txt)")
+    parser.add_argument("target", nargs="?", default="product_database.db",
+                        help="SQLite database to create (default: product_database.db)")
+    arguments = parser.parse_args(argv)
+
+    if not is_sqlite_database(arguments.target):
+        parser.error("the target name must end in .db, .sqlite or .sqlite3")
+    if os.path.exists(arguments.target):
+        parser.error(f"'{arguments.target}' already exists")
+    if not os.path.exists(arguments.source):
+        parser.error(f"'{arguments.source}' not found")
+    sys.exit(0 if migrate(arguments.source, arguments.target) else 1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+import operator
+from decimal import ROUND_HALF_UP, Decimal
+from fractions import Fraction
+
+# Money is held as whole paisa in ints; one rupee is this many paisa
+PAISA_PER_RUPEE = 100
+
+def parse_money(text):
+    """
+    Parses an amount in rupees, as written in the product database.
+
+    Amounts with at most two decimals, which is every price the system
+    writes, are converted with integer arithmetic only; longer ones are
+    rounded half up to the nearest paisa.
+
+    Args:
+        text (str): The amount, such as '1000', '1000.0' or '99.95'.
+
+    Returns:
+        int: The amount in paisa.
+
+    Raises:
+        ValueError: If the text is not a number.
+    """
+    text = text.strip()
+    whole, point, fraction = text.partition(".")
+    if whole.lstrip("+-").isdigit() and len(fraction) <= 2 and (fraction.isdigit() or not fraction):
+        paisa = abs(int(whole)) * PAISA_PER_RUPEE + int(fraction.ljust(2, "0"))
+        return -paisa if whole.startswith("-") else paisa
+    try:
+        amount = Decimal(text)
+    except ArithmeticError:
+        raise ValueError(f"could not convert string to money: {text!r}") from None
+    if not amount.is_finite():
+        raise ValueError(f"could not convert string to money: {text!r}")
+    return int((amount * PAISA_PER_RUPEE).to_integral_value(ROUND_HALF_UP))
+
+def format_money(paisa):
+    """
+    Writes an amount in rupees with exactly two decimals.
+
+    Args:
+        paisa (int): The amount in paisa.
+
+    Returns:
+        str: The amount, such as '1000.00'.
+    """
+    sign = "-" if paisa < 0 else ""
+    rupees, paisa = divmod(abs(paisa), PAISA_PER_RUPEE)
+    return f"{sign}{rupees}.{paisa:02d}"
+
+def to_rupees(paisa):
+    """
+    Converts an amount for JSON output, where numbers are in rupees.
+
+    The float printed for paisa / 100 is always the two-decimal amount
+    exactly, since it is the shortest text that reads back as that float.
+
+    Args:
+        paisa (int): The amount in paisa.
+
+    Returns:
+        float: The amount in rupees.
+    """
+    return paisa / PAISA_PER_RUPEE
+
+def parse_rate(value):
+    """
+    Converts a markup or multiplier from a config file into an exact ratio.
+
+    Args:
+        value (int or float): The rate as written, such as 2 or 2.5.
+
+    Returns:
+        Fraction: The rate, exactly as written in decimal.
+    """
+    return Fraction(str(value))
+
+def apply_rate(paisa, rate):
+    """
+    Multiplies an amount by an exact ratio, rounding half up to the paisa.
+
+    Args:
+        paisa (int): The amount in paisa; not negative.
+        rate (Fraction): The ratio to apply.
+
+    Returns:
+        int: The product in paisa.
+    """
+    numerator, denominator = rate.numerator, rate.denominator
+    return (paisa * numerator * 2 + denominator) // (denominator * 2)
+
+def money_dot(quantities, prices):
+    """
+    Adds up quantity times price over two columns, exactly.
+
+    This is the batched path for large carts and reports: both columns
+    are ints, so the sum runs in C through map and the int type, with no
+    per-item Decimal objects and no float rounding.
+
+    Args:
+        quantities (iterable): Item counts.
+        prices (iterable): Prices in paisa, lined up with quantities.
+
+    Returns:
+        int: The total in paisa.
+    """
+    return sum(map(operator.mul, quantities, prices))
@@ -1,245 +1,451 @@
-import datetime
-from write import generate_invoice, generate_purchase_invoice, update_database
-
-def display_products(products):
-    """
-    Displays a formatted table of all available products.
-    
-    Args:
-        products (list): List of product dictionaries to display.
-    """
-    # Print table header
-    print("\nAvailable Products:")
-    print("-" * 150)
-    headers = ["ID", "PRODUCT NAME", "BRAND NAME", "QUANTITY", "COST PRICE", "ORIGIN COUNTRY"]
-    format_str = "{:<5} {:<25} {:<25} {:<15} {:<15} {:<15}"
-    print(format_str.format(*headers))
-    print("-" * 150)
-    
-    # Print each product row
-    for product in products:
-        print(format_str.format(
-            product["id"],
-            product["name"],
-            product["brand"],
-            product["stock"],
-            product["cost_price"],
-            product["country"]
-        ))
-    print("-" * 150)
-    print("\n")
-
-def option_1(products, database_name):
-    """
-    Handles the product selling process and invoice generation.
-
-    Args:
-        products (list): The current product list.
-        database_name (str): The name of the product database file.
-    """
-    try:
-        # Get customer information
-        print("-" * 50)
-        print("Enter customer details for bill generation")
-        print("-" * 50)
-        print("\n")
-
-        customer_name = input("Enter name of customer: ")
-        phone_number = input("Enter phone number of customer: ")
-        # Validate phone number
-        while not phone_number.isnumeric():
-            print("\nInvalid number. Please enter again")
-            phone_number = input("Enter phone number of customer: ")
-
-        print("-" * 50)
-        print("\n")
-
-        # Initialize sales variables
-        item_selling = []
-        grand_total = 0
-        sell_loop = True
-        free_items = 0
-        total_quantity = 0
-
-        display_products(products)
-
-        # Product selection loop
-        while sell_loop:
-            try:
-                print("\n")
-                # Get product ID
-                product_id = input("Enter the ID of the product you want to sell: ")
-                while not product_id.isnumeric() or int(product_id) > len(products) - 1:
-                    print("Invalid ID")
-                    product_id = input("Enter the ID of the product you want to sell: ")
-                    print("\n")
-                product_id = int(product_id)
-
-                # Get product quantity
-                product_quantity = input("Enter the quantity of product: ")
-                print("\n")
-                while not product_quantity.isnumeric():
-                    print("Invalid Quantity")
-                    product_quantity = input("Enter the quantity of product: ")
-                    print("\n")
-
-                # Apply promotion: Buy 3, Get 1 Free
-                free_items = int(product_quantity) // 3
-                total_quantity = int(product_quantity) + free_items
-
-                # Check stock availability
-                while (
-                    int(product_quantity) <= 0 or products[product_id]["stock"] < total_quantity
-                ):
-                    print("THE QUANTITY YOU ARE LOOKING FOR IS UNAVAILABLE\n")
-                    product_quantity = input("Enter the quantity of product: ")
-                    if product_quantity.isnumeric():
-                        free_items = int(product_quantity) // 3
-                        total_quantity = int(product_quantity) + free_items
-                    else:
-                        while not product_quantity.isnumeric():
-                            print("Invalid Quantity")
-                            product_quantity = input("Enter the quantity of product: ")
-                            print("\n")
-
-                product_quantity = int(product_quantity)
-                print("You have received ", free_items, " free items")
-
-                # Update stock quantity
-                products[product_id]["stock"] -= total_quantity
-
-                # Calculate price (markup is 2x cost)
-                individual_item_price = products[product_id]["cost_price"] * 2
-                total_item_price = individual_item_price * product_quantity
-                grand_total += total_item_price
-
-                # Add item to sales list
-                item_selling.append(
-                    {
-                        "name": products[product_id]["name"],
-                        "brand": products[product_id]["brand"],
-                        "product_quantity": product_quantity,
-                        "total_quantity": total_quantity,
-                        "individual_item_price": individual_item_price,
-                        "total_item_price": total_item_price,
-                    }
-                )
-
-                print("\n" + "-" * 50)
-                display_products(products)
-
-                # Check if more products to sell
-                decision = input("Are there more products to sell?(y/n): ").lower()
-                while not decision == "y" and not decision == "n":
-                    print("Invalid input")
-                    decision = input("Are there more products to sell?(y/n): ").lower()
-                if decision == "n":
-                    sell_loop = False
-                else:
-                    display_products(products)
-            except Exception as e:
-                # Handle errors in sale process
-                print(f"Error processing sale: {e}")
-                print("Please try again\n")
-
-        # Generate invoice and update database
-        generate_invoice(customer_name, phone_number, item_selling, grand_total)
-        update_database(products, database_name)
-    except Exception as e:
-        # Catch all other exceptions
-        print(f"An error occurred during sales process: {e}")
-        print("Returning to main menu...\n")
-
-def option_2(products, database_name):
-    """
-    Handles the restocking of products from a vendor.
-
-    Args:
-        products (list): The current product list.
-        database_name (str): The name of the product database file.
-    """
-    try:
-        # Begin restocking process
-        print("-" * 50)
-        print("RESTOCKING IN PROGRESS")
-        print("-" * 50)
-        print("\n")
-
-        # Get vendor name
-        vendor_name = input("Enter name of vendor: ")
-        restock_loop = True
-        display_products(products)
-
-        # Initialize restocking variables
-        restock_items = []
-        grand_total_cost = 0
-
-        # Product selection loop
-        while restock_loop:
-            try:
-                # Get product ID
-                product_id = input("Enter ID of product you want to restock: ")
-                while not product_id.isnumeric() or int(product_id) > len(products) - 1:
-                    print("Invalid ID")
-                    product_id = input("Enter ID of product you want to restock: ")
-                    print("\n")
-                product_id = int(product_id)
-
-                # Get product quantity
-                product_quantity = input("Enter QUANTITY of product you want to restock: ")
-                while not product_quantity.isnumeric():
-                    print("Invalid Quantity")
-                    product_quantity = input("Enter QUANTITY of product you want to restock: ")
-                    print("\n")
-
-                product_quantity = int(product_quantity)
-                print("\n")
-
-                # Update stock
-                products[product_id]["stock"] += product_quantity
-
-                # Calculate cost
-                total_item_cost = product_quantity * products[product_id]["cost_price"]
-                grand_total_cost += total_item_cost
-
-                # Add item to restock list
-                restock_items.append(
-                    {
-                        "name": products[product_id]["name"],
-                        "brand": products[product_id]["brand"],
-                        "product_quantity": product_quantity,
-                        "cost_price": products[product_id]["cost_price"],
-                        "total_item_cost": total_item_cost,
-                    }
-                )
-
-                display_products(products)
-
-                # Check if more products to restock
-                decision = input("Are there more products to purchase?(y/n): ").lower()
-                while not decision == "y" and not decision == "n":
-                    print("Invalid input")
-                    decision = input("Are there more products to purchase?(y/n): ").lower()
-                if decision == "n":
-                    restock_loop = False
-                else:
-                    display_products(products)
-            except Exception as e:
-                # Handle errors in restock process
-                print(f"Error processing restock: {e}")
-                print("Please try again\n")
-
-        # Generate invoice and update database
-        generate_purchase_invoice(vendor_name, restock_items, grand_total_cost)
-        update_database(products, database_name)
-        print("-" * 150)
-        print("RESTOCK COMPLETE")
-        print("-" * 150)
-    except Exception as e:
-        # Catch all other exceptions
-        print(f"An error occurred during restocking process: {e}")
-        print("Returning to main menu...\n")
-
-def option_3():
-    """Exits the system with a farewell message."""
-    print("Thank you for using the system")
+import datetime
+import weakref
+from instrumentation import count, finish, timed, timing
+from money import format_money
+from pricing import price_table
+from reorder import open_sales_velocity, suggest_purchase_orders
+from sales import open_sales_log
+from store import LOW_STOCK_THRESHOLD
+from write import flush_invoices, generate_invoice, generate_purchase_invoice
+
+# Number of rows shown per page of the product table
+PAGE_SIZE = 20
+# Number of low-stock products listed in the menu's reorder alert
+ALERT_LIMIT = 5
+TABLE_FORMAT = "{:<5} {:<25} {:<25} {:<15} {:<15} {:<15}"
+REORDER_FORMAT = "{:<5} {:<25} {:<10} {:<10} {:<15} {:<10}"
+
+# Formatted rows per product store: {product_id: (stock, cost_price, line)}
+row_cache = weakref.WeakKeyDictionary()
+
+def format_product_row(products, product_id):
+    """
+    Formats one table row, reusing the cached text if the row is unchanged.
+
+    Args:
+        products (ProductStore): The current products.
+        product_id (int): The id of the product to format.
+
+    Returns:
+        str: The formatted row.
+    """
+    cache = row_cache.setdefault(products, {})
+    stock = products.stock[product_id]
+    cost_price = products.cost_price[product_id]
+    cached = cache.get(product_id)
+    if cached is not None and cached[0] == stock and cached[1] == cost_price:
+        return cached[2]
+
+    # Only rows whose stock or price changed are formatted again
+    count("display.rows_formatted")
+    product = products[product_id]
+    line = TABLE_FORMAT.format(
+        product_id,
+        product["name"],
+        product["brand"],
+        stock,
+        format_money(cost_price),
+        product["country"]
+    )
+    cache[product_id] = (stock, cost_price, line)
+    return line
+
+@timed("display")
+def display_products(products, product_ids=None, page=0, page_size=PAGE_SIZE):
+    """
+    Displays one page of the product table.
+
+    Only the rows on the requested page are formatted, and rows whose
+    stock and price have not changed since they were last shown come
+    from a cache.
+    
+    Args:
+        products (ProductStore): The products to display.
+        product_ids (list): Ids of the products to show; all if None.
+        page (int): The zero-based page to show; clamped to the last page.
+        page_size (int): The number of rows per page.
+
+    Returns:
+        int: The page actually shown.
+    """
+    if product_ids is None:
+        product_ids = range(len(products))
+    page_count = max(1, -(-len(product_ids) // page_size))
+    page = min(max(page, 0), page_count - 1)
+
+    # Print table header
+    print("\nAvailable Products:")
+    print("-" * 150)
+    headers = ["ID", "PRODUCT NAME", "BRAND NAME", "QUANTITY", "COST PRICE", "ORIGIN COUNTRY"]
+    print(TABLE_FORMAT.format(*headers))
+    print("-" * 150)
+    
+    # Print the rows of the visible page
+    for product_id in product_ids[page * page_size:(page + 1) * page_size]:
+        print(format_product_row(products, product_id))
+    print("-" * 150)
+    if page_count > 1:
+        print(f"Page {page + 1} of {page_count} ({len(product_ids)} products). "
+              "Enter + or - to change page, brand:NAME or country:NAME to filter.")
+    print("\n")
+    return page
+
+def display_stock_alerts(products):
+    """
+    Displays the inventory value and the products due for reordering.
+
+    Both come from running totals, so this costs the same at any
+    catalog size.
+
+    Args:
+        products (ProductStore): The current products.
+    """
+    print(f"Inventory value: {format_money(products.inventory_value())} ({products.total_stock()} items in stock)")
+    low_stock_count = products.low_stock_count()
+    if not low_stock_count:
+        return
+    print(f"REORDER ALERT: {low_stock_count} products have fewer than {LOW_STOCK_THRESHOLD} items in stock")
+    for product_id, stock in products.low_stock(ALERT_LIMIT):
+        product = products[product_id]
+        print(f"  ID {product_id}: {product['name']} ({product['brand']}), {stock} left")
+    if low_stock_count > ALERT_LIMIT:
+        print(f"  ... and {low_stock_count - ALERT_LIMIT} more")
+
+def display_reorder_suggestions(products, velocity):
+    """
+    Displays suggested purchase orders, grouped by brand and country.
+
+    Args:
+        products (ProductStore): The current products.
+        velocity (SalesVelocity): The sales velocity of the database.
+    """
+    orders = suggest_purchase_orders(products, velocity)
+    if not orders:
+        print("No products are projected to run out before a new order could arrive.")
+        return
+
+    print("Suggested purchase orders, from recent sales:")
+    for order in orders:
+        print("-" * 85)
+        print(f"{order['brand']} ({order['country']}), total cost {format_money(order['total_cost'])}")
+        print(REORDER_FORMAT.format("ID", "PRODUCT NAME", "STOCK", "PER DAY", "RUNS OUT", "ORDER"))
+        for line in order["lines"]:
+            print(REORDER_FORMAT.format(
+                line["product_id"],
+                line["name"],
+                line["stock"],
+                f"{line['daily_rate']:.1f}",
+                line["stockout_date"],
+                line["quantity"],
+            ))
+    print("-" * 85)
+
+def select_product(products, index, prompt):
+    """
+    Asks for a product until the input identifies exactly one.
+
+    The clerk may type a product ID, 'name,brand', a full name or part of
+    a name. When several products match, they are listed and the clerk is
+    asked again. '+' and '-' page through the table last shown, and
+    'brand:NAME' or 'country:NAME' show only matching products.
+
+    Args:
+        products (ProductStore): The current products.
+        index (ProductIndex): The lookup index over the products.
+        prompt (str): The prompt shown to the clerk.
+
+    Returns:
+        int: The id of the selected product.
+    """
+    view = None  # Ids in the table last shown; None for all products
+    page = 0
+    while True:
+        query = input(prompt).strip()
+
+        # Table navigation and filters
+        if query in ("+", "-"):
+            page = display_products(products, view, page + (1 if query == "+" else -1))
+            continue
+        if query.lower().startswith(("brand:", "country:")):
+            field, value = query.split(":", 1)
+            view = index.with_brand(value) if field.lower() == "brand" else index.from_country(value)
+            page = display_products(products, view)
+            continue
+
+        matches = index.resolve(query) if query else []
+        if len(matches) == 1:
+            return matches[0]
+        if not matches:
+            print("Invalid ID or no product matches")
+        else:
+            print("Several products match, please enter one of these IDs")
+            view = matches
+            page = display_products(products, view)
+        print("\n")
+
+def sale_item(product, quantity, prices):
+    """
+    Prices one invoice line with the pricing rules, free items included.
+
+    Args:
+        product (ProductRow): The product being sold.
+        quantity (int): The number of items paid for.
+        prices (PriceTable): The pricing rules compiled for the products,
+            fetched once per cart with price_table.
+
+    Returns:
+        dict: The invoice line, with the total quantity leaving stock and
+            prices in paisa.
+    """
+    individual_item_price, free_items = prices.price(product, quantity)
+    return {
+        "product_id": product["id"],
+        "name": product["name"],
+        "brand": product["brand"],
+        "product_quantity": quantity,
+        "free_items": free_items,
+        "total_quantity": quantity + free_items,
+        "individual_item_price": individual_item_price,
+        "total_item_price": individual_item_price * quantity,
+        "cost_price": product["cost_price"],
+    }
+
+def purchase_item(product, quantity):
+    """
+    Costs one purchase invoice line.
+
+    Args:
+        product (ProductRow): The product being restocked.
+        quantity (int): The number of items bought.
+
+    Returns:
+        dict: The purchase invoice line, with costs in paisa.
+    """
+    return {
+        "name": product["name"],
+        "brand": product["brand"],
+        "product_quantity": quantity,
+        "cost_price": product["cost_price"],
+        "total_item_cost": quantity * product["cost_price"],
+    }
+
+def option_1(products, repository, index=None):
+    """
+    Handles the product selling process and invoice generation.
+
+    Args:
+        products (ProductStore): The current products.
+        repository (Repository): Where the products are kept.
+        index (ProductIndex): The lookup index over the products; built
+            on demand if None.
+    """
+    try:
+        if index is None:
+            index = repository.index(products)
+
+        # Get customer information
+        print("-" * 50)
+        print("Enter customer details for bill generation")
+        print("-" * 50)
+        print("\n")
+
+        customer_name = input("Enter name of customer: ")
+        phone_number = input("Enter phone number of customer: ")
+        # Validate phone number
+        while not phone_number.isnumeric():
+            print("\nInvalid number. Please enter again")
+            phone_number = input("Enter phone number of customer: ")
+
+        print("-" * 50)
+        print("\n")
+
+        # Initialize sales variables
+        prices = price_table(products)
+        item_selling = []
+        stock_changes = []
+        grand_total = 0
+        sell_loop = True
+
+        display_products(products)
+
+        # Product selection loop
+        while sell_loop:
+            try:
+                print("\n")
+                # Get product ID
+                product_id = select_product(products, index, "Enter the ID or name of the product you want to sell: ")
+
+                # Get product quantity
+                product_quantity = input("Enter the quantity of product: ")
+                print("\n")
+                while not product_quantity.isnumeric():
+                    print("Invalid Quantity")
+                    product_quantity = input("Enter the quantity of product: ")
+                    print("\n")
+                product_quantity = int(product_quantity)
+
+                # Price the item, then check stock availability, free items included
+                item = sale_item(products[product_id], product_quantity, prices)
+                while product_quantity <= 0 or products[product_id]["stock"] < item["total_quantity"]:
+                    print("THE QUANTITY YOU ARE LOOKING FOR IS UNAVAILABLE\n")
+                    product_quantity = input("Enter the quantity of product: ")
+                    while not product_quantity.isnumeric():
+                        print("Invalid Quantity")
+                        product_quantity = input("Enter the quantity of product: ")
+                        print("\n")
+                    product_quantity = int(product_quantity)
+                    item = sale_item(products[product_id], product_quantity, prices)
+
+                # Take the items out of stock unless another session just did
+                if not products.reserve(product_id, item["total_quantity"]):
+                    print("THE QUANTITY YOU ARE LOOKING FOR IS UNAVAILABLE\n")
+                    continue
+                stock_changes.append((product_id, -item["total_quantity"]))
+                print("You have received ", item["free_items"], " free items")
+
+                # Add item to sales list
+                grand_total += item["total_item_price"]
+                item_selling.append(item)
+
+                # Show only the row that changed
+                print("\n" + "-" * 50)
+                display_products(products, [product_id])
+
+                # Check if more products to sell
+                decision = input("Are there more products to sell?(y/n): ").lower()
+                while not decision == "y" and not decision == "n":
+                    print("Invalid input")
+                    decision = input("Are there more products to sell?(y/n): ").lower()
+                if decision == "n":
+                    sell_loop = False
+            except Exception as e:
+                # Handle errors in sale process
+                print(f"Error processing sale: {e}")
+                print("Please try again\n")
+
+        # Commit the stock changes, then log the sale and generate the invoice
+        with timing("sell.checkout"):
+            committed = repository.commit(products, stock_changes, "sale")
+            if committed:
+                open_sales_log(repository.database_name).append(item_selling)
+                generate_invoice(customer_name, phone_number, item_selling, grand_total)
+                count("sell.lines", len(item_selling))
+        if committed:
+            # Warn about products this sale leaves short
+            velocity = open_sales_velocity(repository.database_name)
+            for product_id in velocity.refresh(products):
+                suggestion = velocity.suggestion(products, product_id)
+                if suggestion is not None:
+                    print(f"Reorder soon: {suggestion['name']} ({suggestion['brand']}) is projected to run out "
+                          f"on {suggestion['stockout_date']}; suggested order {suggestion['quantity']}")
+        else:
+            print("The sale was not completed. Returning to main menu...\n")
+    except Exception as e:
+        # Catch all other exceptions
+        print(f"An error occurred during sales process: {e}")
+        print("Returning to main menu...\n")
+
+def option_2(products, repository, index=None):
+    """
+    Handles the restocking of products from a vendor.
+
+    Args:
+        products (ProductStore): The current products.
+        repository (Repository): Where the products are kept.
+        index (ProductIndex): The lookup index over the products; built
+            on demand if None.
+    """
+    try:
+        if index is None:
+            index = repository.index(products)
+
+        # Begin restocking process
+        print("-" * 50)
+        print("RESTOCKING IN PROGRESS")
+        print("-" * 50)
+        print("\n")
+
+        # Show what recent sales suggest ordering
+        display_reorder_suggestions(products, open_sales_velocity(repository.database_name))
+        print("\n")
+
+        # Get vendor name
+        vendor_name = input("Enter name of vendor: ")
+        restock_loop = True
+        display_products(products)
+
+        # Initialize restocking variables
+        restock_items = []
+        stock_changes = []
+        grand_total_cost = 0
+
+        # Product selection loop
+        while restock_loop:
+            try:
+                # Get product ID
+                product_id = select_product(products, index, "Enter ID or name of product you want to restock: ")
+
+                # Get product quantity
+                product_quantity = input("Enter QUANTITY of product you want to restock: ")
+                while not product_quantity.isnumeric():
+                    print("Invalid Quantity")
+                    product_quantity = input("Enter QUANTITY of product you want to restock: ")
+                    print("\n")
+
+                product_quantity = int(product_quantity)
+                print("\n")
+
+                # Update stock
+                products.adjust(product_id, product_quantity)
+                stock_changes.append((product_id, product_quantity))
+
+                # Calculate cost and add item to restock list
+                item = purchase_item(products[product_id], product_quantity)
+                grand_total_cost += item["total_item_cost"]
+                restock_items.append(item)
+
+                # Show only the row that changed
+                display_products(products, [product_id])
+
+                # Check if more products to restock
+                decision = input("Are there more products to purchase?(y/n): ").lower()
+                while not decision == "y" and not decision == "n":
+                    print("Invalid input")
+                    decision = input("Are there more products to purchase?(y/n): ").lower()
+                if decision == "n":
+                    restock_loop = False
+            except Exception as e:
+                # Handle errors in restock process
+                print(f"Error processing restock: {e}")
+                print("Please try again\n")
+
+        # Commit the stock changes, then generate the invoice
+        with timing("restock.checkout"):
+            committed = repository.commit(products, stock_changes, "restock")
+            if committed:
+                generate_purchase_invoice(vendor_name, restock_items, grand_total_cost)
+                count("restock.lines", len(restock_items))
+        if not committed:
+            print("The restock was not completed. Returning to main menu...\n")
+            return
+        print("-" * 150)
+        print("RESTOCK COMPLETE")
+        print("-" * 150)
+    except Exception as e:
+        # Catch all other exceptions
+        print(f"An error occurred during restocking process: {e}")
+        print("Returning to main menu...\n")
+
+def option_3():
+    """
+    Saves any invoices still being written, prints the instrumentation
+    summary if it is on, then exits with a farewell message.
+    """
+    metrics = flush_invoices()
+    if metrics["submitted"]:
+        print(f"Invoices saved: {metrics['written']} in {metrics['batches']} batches, "
+              f"longest wait {metrics['max_lag'] * 1000:.1f} ms")
+    if metrics["errors"]:
+        print(f"Invoices that could not be saved: {metrics['errors']}")
+    finish()
+    print("Thank you for using the system")
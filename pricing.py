@@ -0,0 +1,439 @@
+import bisect
+import json
+import os
+import threading
+import time
+import weakref
+from array import array
+from money import apply_rate, parse_rate
+from sales import day_bounds, parse_day
+from store import ProductStore
+
+# Seconds between checks of the rules file for changes
+RELOAD_INTERVAL = 1.0
+
+# Rules used when there is no rules file: selling price is twice the
+# cost price, and one item is given free for every three bought
+DEFAULT_RULES = {
+    "markup": 2,
+    "promotion": {"buy": 3, "free": 1},
+    "rules": [],
+}
+
+# Selectors a rule may use, most specific first
+SELECTORS = ("product_id", "brand", "country")
+SETTINGS = ("markup", "discounts", "promotion")
+# Per-product profile number of a product not priced yet
+UNCOMPILED = -1
+
+def parse_promotion(value):
+    """
+    Checks a promotion setting.
+
+    Args:
+        value (dict): {"buy": N, "free": M}, or None for no promotion.
+
+    Returns:
+        tuple: (buy, free); (0, 0) for no promotion.
+
+    Raises:
+        ValueError: If the promotion is malformed.
+    """
+    if value is None:
+        return (0, 0)
+    buy, free = value.get("buy"), value.get("free", 1)
+    if not isinstance(buy, int) or not isinstance(free, int) or buy <= 0 or free < 0:
+        raise ValueError(f"a promotion needs a positive 'buy' and a non-negative 'free': {value}")
+    return (buy, free)
+
+def parse_discounts(value):
+    """
+    Checks a list of quantity discount tiers.
+
+    Args:
+        value (list): [{"min_quantity": N, "percent": P}, ...].
+
+    Returns:
+        tuple: (min quantities, exact price multipliers), both sorted by
+            quantity.
+
+    Raises:
+        ValueError: If a tier is malformed.
+    """
+    tiers = []
+    for tier in value or []:
+        quantity, percent = tier.get("min_quantity"), tier.get("percent")
+        if not isinstance(quantity, int) or quantity <= 0 or not isinstance(percent, (int, float)) \
+                or not 0 <= percent < 100:
+            raise ValueError(f"a discount tier needs a positive 'min_quantity' and a 'percent' below 100: {tier}")
+        tiers.append((quantity, 1 - parse_rate(percent) / 100))
+    tiers.sort()
+    return (tuple(quantity for quantity, _ in tiers), tuple(multiplier for _, multiplier in tiers))
+
+def parse_rule(rule):
+    """
+    Checks one rule of the rules file.
+
+    A rule selects products by product_id, brand or country, or all
+    products if it names none, and sets any of markup, discounts and
+    promotion for them. 'from' and 'to' limit it to a range of days.
+
+    Args:
+        rule (dict): The rule as read from the file.
+
+    Returns:
+        dict: The rule with its selector, settings and active period.
+
+    Raises:
+        ValueError: If the rule is malformed.
+    """
+    selectors = [key for key in SELECTORS if key in rule]
+    if len(selectors) > 1:
+        raise ValueError(f"a rule may select by one of {', '.join(SELECTORS)} only: {rule}")
+    unknown = set(rule) - set(SELECTORS) - set(SETTINGS) - {"from", "to", "name"}
+    if unknown:
+        raise ValueError(f"unknown keys {sorted(unknown)} in rule {rule}")
+
+    parsed = {"selector": selectors[0] if selectors else None, "settings": {}}
+    if selectors:
+        value = rule[selectors[0]]
+        if selectors[0] == "product_id" and (not isinstance(value, int) or value < 0):
+            raise ValueError(f"a product_id must be a product ID: {rule}")
+        parsed["value"] = value if selectors[0] == "product_id" else str(value).casefold()
+    if "markup" in rule:
+        if not isinstance(rule["markup"], (int, float)) or rule["markup"] <= 0:
+            raise ValueError(f"a markup must be a positive number: {rule}")
+        parsed["settings"]["markup"] = parse_rate(rule["markup"])
+    if "discounts" in rule:
+        parsed["settings"]["discounts"] = parse_discounts(rule["discounts"])
+    if "promotion" in rule:
+        parsed["settings"]["promotion"] = parse_promotion(rule["promotion"])
+    parsed["start"], parsed["end"] = day_bounds(
+        parse_day(rule["from"]) if "from" in rule else None,
+        parse_day(rule["to"]) if "to" in rule else None,
+    )
+    return parsed
+
+def load_rules(rules_file):
+    """
+    Reads and checks a rules file.
+
+    Args:
+        rules_file (str): The name of the JSON rules file.
+
+    Returns:
+        tuple: (defaults, rules) where defaults holds the settings applied
+            to every product and rules the parsed rules in file order.
+
+    Raises:
+        ValueError: If the file is not valid JSON or a rule is malformed.
+    """
+    with open(rules_file) as file:
+        try:
+            config = json.load(file)
+        except json.JSONDecodeError as e:
+            raise ValueError(f"'{rules_file}' is not valid JSON: {e}") from None
+    return parse_config(config)
+
+def parse_config(config):
+    """
+    Checks the contents of a rules file.
+
+    Args:
+        config (dict): The decoded rules file.
+
+    Returns:
+        tuple: (defaults, rules) as load_rules returns.
+    """
+    defaults = parse_rule({key: config[key] for key in SETTINGS if key in config})["settings"]
+    defaults.setdefault("markup", parse_rate(DEFAULT_RULES["markup"]))
+    defaults.setdefault("discounts", ((), ()))
+    defaults.setdefault("promotion", (0, 0))
+    return defaults, [parse_rule(rule) for rule in config.get("rules", [])]
+
+class PriceTable:
+    """
+    Pricing rules compiled for one product store at one moment.
+
+    Every product maps to a pricing profile: its markup, discount tiers
+    and promotion after all rules active at that moment are applied. The
+    profiles are computed once per brand and country pair, and a
+    ProductStore also gets a per-product array of profile numbers, filled
+    in the first time each product is priced, so pricing a line is a
+    couple of lookups whatever the number of rules.
+    Markups and discounts are exact fractions, so a unit price is the
+    cost price in paisa times one ratio, rounded half up once.
+
+    A product takes each setting from its most specific matching rule:
+    product, then brand, then country, then the defaults; among rules
+    of the same kind the later one in the file wins.
+    """
+
+    def __init__(self, products, defaults, rules, now=None):
+        now = time.time() if now is None else now
+        self.expires = float("inf")  # When a rule starts or ends
+        levels = {selector: {} for selector in SELECTORS}
+        for rule in rules:
+            start, end = rule["start"], rule["end"]
+            if start is not None and now < start:
+                self.expires = min(self.expires, start)
+                continue
+            if end is not None and now >= end:
+                continue
+            if end is not None:
+                self.expires = min(self.expires, end)
+            if rule["selector"] is None:
+                defaults = {**defaults, **rule["settings"]}
+            else:
+                level = levels[rule["selector"]].setdefault(rule["value"], {})
+                level.update(rule["settings"])
+        self.defaults = defaults
+        self.by_product, self.by_brand, self.by_country = (levels[selector] for selector in SELECTORS)
+
+        self.lock = threading.Lock()
+        self.profiles = []
+        self.compiled = []  # (min quantities, rates, promotion) per profile
+        self.profile_numbers = {}  # Profile: its position in profiles
+        self.pair_profiles = {}  # (brand, country): profile number
+        self.product_profiles = None
+        if isinstance(products, ProductStore):
+            self.compile_store(products)
+
+    def intern(self, profile):
+        """
+        Numbers a profile, reusing the number of an identical one.
+
+        Args:
+            profile (tuple): (markup, discounts, promotion).
+
+        Returns:
+            int: The profile's position in profiles.
+        """
+        with self.lock:
+            number = self.profile_numbers.get(profile)
+            if number is None:
+                markup, (quantities, multipliers), promotion = profile
+                # rates[0] applies below the first tier, rates[i] from tier i
+                rates = (markup,) + tuple(markup * multiplier for multiplier in multipliers)
+                self.compiled.append((quantities, rates, promotion))
+                number = self.profile_numbers[profile] = len(self.profiles)
+                self.profiles.append(profile)
+            return number
+
+    def pair_profile(self, brand, country):
+        """
+        Returns the profile number of products of a brand and country.
+
+        Args:
+            brand (str): The brand name.
+            country (str): The country of origin.
+
+        Returns:
+            int: The profile number, before product rules.
+        """
+        key = (brand, country)
+        number = self.pair_profiles.get(key)
+        if number is None:
+            settings = {
+                **self.defaults,
+                **self.by_country.get(country.casefold(), {}),
+                **self.by_brand.get(brand.casefold(), {}),
+            }
+            number = self.pair_profiles[key] = self.intern(
+                (settings["markup"], settings["discounts"], settings["promotion"])
+            )
+        return number
+
+    def product_profile(self, product_id, base):
+        """
+        Applies the rules naming a product to its brand and country profile.
+
+        Args:
+            product_id (int): The id of the product.
+            base (int): The brand and country profile number.
+
+        Returns:
+            int: The product's profile number.
+        """
+        settings = self.by_product.get(product_id)
+        if settings is None:
+            return base
+        markup, discounts, promotion = self.profiles[base]
+        return self.intern((
+            settings.get("markup", markup),
+            settings.get("discounts", discounts),
+            settings.get("promotion", promotion),
+        ))
+
+    def compile_store(self, products):
+        """
+        Sets up the per-product profile array of a ProductStore.
+
+        Every entry starts as UNCOMPILED, so a batch that prices a few
+        thousand products of a large catalog does not pay for all of them.
+
+        Args:
+            products (ProductStore): The products to compile for.
+        """
+        self.product_profiles = array("l", [UNCOMPILED]) * len(products)
+
+    def profile(self, product):
+        """
+        Looks up the pricing profile of a product.
+
+        Args:
+            product (ProductRow): The product.
+
+        Returns:
+            tuple: (min quantities, rates, promotion), where rates[i] is
+                the markup with the discount of tier i applied.
+        """
+        product_id = product["id"]
+        profiles = self.product_profiles
+        if profiles is not None and product_id < len(profiles):
+            number = profiles[product_id]
+            if number == UNCOMPILED:
+                base = self.pair_profile(product["brand"], product["country"])
+                number = profiles[product_id] = self.product_profile(product_id, base)
+            return self.compiled[number]
+        # Products added after compiling, or stores without code columns
+        base = self.pair_profile(product["brand"], product["country"])
+        return self.compiled[self.product_profile(product_id, base)]
+
+    def free_items(self, product, quantity):
+        """
+        Applies the product's promotion.
+
+        Args:
+            product (ProductRow): The product being sold.
+            quantity (int): The number of items paid for.
+
+        Returns:
+            int: The number of free items given on top.
+        """
+        buy, free = self.profile(product)[2]
+        return quantity // buy * free if buy else 0
+
+    def price(self, product, quantity):
+        """
+        Prices a line of a product.
+
+        Args:
+            product (ProductRow): The product being sold.
+            quantity (int): The number of items paid for.
+
+        Returns:
+            tuple: (unit price in paisa, free items).
+        """
+        quantities, rates, (buy, free) = self.profile(product)
+        rate = rates[bisect.bisect_right(quantities, quantity)]
+        return apply_rate(product["cost_price"], rate), (quantity // buy * free if buy else 0)
+
+class PricingEngine:
+    """
+    Loads the pricing rules and keeps them compiled for each product store.
+
+    The rules file is checked for changes at most every RELOAD_INTERVAL
+    seconds. A table is compiled again when the rules change or when a
+    time-limited rule starts or ends; otherwise the compiled table is
+    reused for every line and cart. A rules file that stops parsing
+    keeps the last good rules in force. Without a rules file the engine
+    uses the built-in rules and reads nothing from disk.
+    """
+
+    def __init__(self, rules_file=None):
+        self.lock = threading.Lock()
+        self.tables = weakref.WeakKeyDictionary()  # Product store: PriceTable
+        self.use(rules_file)
+
+    def use(self, rules_file):
+        """
+        Switches to another rules file, checking it first.
+
+        Args:
+            rules_file (str): The name of the JSON rules file; the built-in
+                rules apply while it does not exist, or if it is None.
+
+        Raises:
+            ValueError: If the file exists but is malformed.
+        """
+        with self.lock:
+            self.rules_file = None if rules_file is None else os.path.abspath(rules_file)
+            self.signature = self.file_signature()
+            self.defaults, self.rules = self.read_rules()
+            self.checked = time.monotonic()
+            self.tables = weakref.WeakKeyDictionary()
+
+    def file_signature(self):
+        """
+        Identifies the current version of the rules file.
+
+        Returns:
+            tuple: Its modification time and size; None if it is missing.
+        """
+        if self.rules_file is None:
+            return None
+        try:
+            status = os.stat(self.rules_file)
+        except FileNotFoundError:
+            return None
+        return (status.st_mtime_ns, status.st_size)
+
+    def read_rules(self):
+        """
+        Reads the rules file, or the built-in rules if it is missing.
+
+        Returns:
+            tuple: (defaults, rules) as load_rules returns.
+        """
+        if self.signature is None:
+            return parse_config(DEFAULT_RULES)
+        return load_rules(self.rules_file)
+
+    def reload(self):
+        """Reads the rules file again if it changed since it was last read."""
+        self.checked = time.monotonic()
+        signature = self.file_signature()
+        if signature == self.signature:
+            return
+        self.signature = signature
+        try:
+            self.defaults, self.rules = self.read_rules()
+        except (OSError, ValueError) as e:
+            print(f"Warning: pricing rules not reloaded, keeping the previous rules: {e}")
+            return
+        self.tables = weakref.WeakKeyDictionary()
+
+    def table(self, products):
+        """
+        Returns the rules compiled for a product store.
+
+        Args:
+            products (ProductStore): The current products.
+
+        Returns:
+            PriceTable: The compiled rules in force now.
+        """
+        with self.lock:
+            if time.monotonic() - self.checked >= RELOAD_INTERVAL:
+                self.reload()
+            table = self.tables.get(products)
+            if table is None or time.time() >= table.expires:
+                table = self.tables[products] = PriceTable(products, self.defaults, self.rules)
+            return table
+
+# Pricing rules shared by every sale in the process; the built-in rules
+# until main switches it to the rules file chosen on the command line
+pricing_engine = PricingEngine()
+
+def price_table(products):
+    """
+    Returns the pricing rules compiled for a product store.
+
+    Args:
+        products (ProductStore): The current products.
+
+    Returns:
+        PriceTable: The compiled rules in force now.
+    """
+    return pricing_engine.table(products)
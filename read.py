@@ -1,52 +1,870 @@
-def load_data(database_name):
-    """
-    Loads product data from a given text file.
-
-    Args:
-        database_name (str): The name of the file containing product data.
-
-    Returns:
-        list: A list of product dictionaries loaded from the file.
-    """
-    try:
-        with open(database_name, "r") as file:
-            products = []
-            product_id = 0  # Unique ID for each product
-            
-            for line in file:
-                if not line.strip():
-                    continue  # Skip blank lines
-
-                try:
-                    product_details = line.strip().split(",")
-                    
-                    # Ensure the line has all required fields
-                    if len(product_details) < 5:
-                        print(f"Error: Line '{line.strip()}' doesn't have enough fields. Skipping...")
-                        continue
-                    
-                    # Create product dictionary
-                    product = {
-                        "id": product_id,
-                        "name": product_details[0],
-                        "brand": product_details[1],
-                        "stock": int(product_details[2]),
-                        "cost_price": float(product_details[3]),
-                        "country": product_details[4].strip(),
-                    }
-                    product_id += 1
-                    products.append(product)
-                except (IndexError, ValueError) as e:
-                    # Handle malformed lines or type conversion errors
-                    print(f"Error processing line: {line.strip()}. Error: {e}. Skipping...")
-                    continue
-                    
-            return products
-    except FileNotFoundError:
-        # Handle case where file does not exist
-        print(f"Error: File '{database_name}' not found. Creating a new empty database.")
-        return []
-    except Exception as e:
-        # Catch-all for any unexpected errors
-        print(f"An unexpected error occurred while loading data: {e}")
-        return []
+import os
+import struct
+import sys
+import zlib
+from array import array
+from instrumentation import timed
+from locking import database_lock
+from money import parse_money
+from store import ProductStore
+
+# Databases with this suffix are stored as binary snapshots
+BINARY_SUFFIX = ".bin"
+BINARY_MAGIC = b"WCPS"
+BINARY_VERSION = 3
+# Oldest snapshot version still read
+BINARY_OLDEST_VERSION = 2
+# Versions before this one carry no checksum
+BINARY_CHECKSUM_VERSION = 3
+# Magic, version, byte order (0 little, 1 big), generation, product count,
+# brand count, country count
+BINARY_HEADER = struct.Struct("<4sHHQQII")
+# CRC32 of everything after it; follows the header from BINARY_CHECKSUM_VERSION
+BINARY_CHECKSUM = struct.Struct("<I")
+BINARY_LENGTH = struct.Struct("<Q")
+# Bytes read at a time while checksumming a CSV snapshot
+CHECKSUM_BLOCK = 1024 * 1024
+# CSV snapshots at least this large are parsed in worker processes when
+# there is more than one CPU; below it starting the workers costs more
+# than they save
+PARALLEL_PARSE_BYTES = 32 * 1024 * 1024
+# CSV databases keep their parsed products in a binary snapshot with this suffix
+PARSE_CACHE_SUFFIX = ".cache"
+PARSE_CACHE_MAGIC = b"WCPC"
+# Magic, then the modification time in ns, size and CRC32 of the CSV
+# file the cache was built from; a binary snapshot follows
+PARSE_CACHE_HEADER = struct.Struct("<4sqqI")
+
+class CorruptSnapshotError(ValueError):
+    """Raised when a snapshot does not match its checksum or record count."""
+
+def journal_name(database_name, generation):
+    """
+    Builds the name of the stock journal belonging to a snapshot generation.
+
+    Args:
+        database_name (str): The name of the product database file.
+        generation (int): The snapshot generation the journal applies to.
+
+    Returns:
+        str: The journal file name.
+    """
+    return f"{database_name}.journal.{generation}"
+
+def retained_snapshot_name(database_name, generation):
+    """
+    Builds the name under which an earlier snapshot generation is kept.
+
+    Args:
+        database_name (str): The name of the product database file.
+        generation (int): The generation of the kept snapshot.
+
+    Returns:
+        str: The snapshot file name.
+    """
+    return f"{database_name}.snapshot.{generation}"
+
+def retained_generations(database_name):
+    """
+    Lists the generations of the earlier snapshots kept for a database.
+
+    Args:
+        database_name (str): The name of the product database file.
+
+    Returns:
+        list: Generations, oldest first.
+    """
+    directory, base_name = os.path.split(database_name)
+    prefix = base_name + ".snapshot."
+    try:
+        file_names = os.listdir(directory or ".")
+    except FileNotFoundError:
+        return []
+    return sorted(
+        int(file_name[len(prefix):]) for file_name in file_names
+        if file_name.startswith(prefix) and file_name[len(prefix):].isdigit()
+    )
+
+def parse_header(line):
+    """
+    Parses a snapshot header line such as
+    '#generation,3,count,1000,checksum,1c291ca3'.
+
+    Args:
+        line (str): A line from the product database starting with '#'.
+
+    Returns:
+        dict: The header fields found on the line.
+    """
+    header = {}
+    fields = line.strip().lstrip("#").split(",")
+    # Fields come in name,value pairs
+    for i in range(0, len(fields) - 1, 2):
+        header[fields[i]] = fields[i + 1]
+    return header
+
+def is_binary_database(database_name):
+    """
+    Tells whether a database is kept as a binary snapshot or as CSV.
+
+    Args:
+        database_name (str): The name of the product database file.
+
+    Returns:
+        bool: True for binary snapshots.
+    """
+    return database_name.endswith(BINARY_SUFFIX)
+
+def read_generation(database_name):
+    """
+    Reads the snapshot generation from the first line of the database.
+
+    Args:
+        database_name (str): The name of the product database file.
+
+    Returns:
+        int: The snapshot generation, 0 for files written without a header.
+    """
+    try:
+        if is_binary_database(database_name):
+            with open(database_name, "rb") as file:
+                return BINARY_HEADER.unpack(file.read(BINARY_HEADER.size))[3]
+
+        with open(database_name, "r") as file:
+            first_line = file.readline()
+        if first_line.startswith("#"):
+            return int(parse_header(first_line).get("generation", 0))
+    except (FileNotFoundError, ValueError, struct.error):
+        pass
+    return 0
+
+def replay_journal(products, database_name, generation, offset=0):
+    """
+    Applies the stock deltas recorded in the journal on top of a snapshot.
+
+    Each journal line is one committed transaction in the form
+    'timestamp,reason,product_id:delta product_id:delta'. A line without
+    a trailing newline was torn by a crash and is ignored as a whole.
+    Afterwards the store remembers the generation and how far into the
+    journal it has read, so later calls can pick up only new entries.
+
+    Args:
+        products (ProductStore): The products loaded from the snapshot.
+        database_name (str): The name of the product database file.
+        generation (int): The snapshot generation the journal applies to.
+        offset (int): Byte offset of the first entry not yet applied.
+    """
+    try:
+        with open(journal_name(database_name, generation), "rb") as file:
+            file.seek(offset)
+            for raw_line in file:
+                if not raw_line.endswith(b"\n"):
+                    print("Warning: Ignoring incomplete journal entry left by an interrupted write.")
+                    break
+                offset += len(raw_line)
+                line = raw_line.decode("utf-8", errors="replace")
+
+                try:
+                    timestamp, reason, deltas = line.strip().split(",")
+                    changes = []
+                    for change in deltas.split():
+                        product_id, delta = change.split(":")
+                        changes.append((int(product_id), int(delta)))
+                except ValueError as e:
+                    # Handle malformed journal entries
+                    print(f"Error processing journal entry: {line.strip()}. Error: {e}. Skipping...")
+                    continue
+
+                # Apply the whole transaction
+                for product_id, delta in changes:
+                    if 0 <= product_id < len(products):
+                        products.apply_committed(product_id, delta)
+    except FileNotFoundError:
+        pass  # No transactions since the last snapshot
+
+    products.generation = generation
+    products.journal_offset = offset
+
+# Number of products yielded per chunk by iter_product_chunks
+CHUNK_SIZE = 10000
+
+def print_parse_error(offset, line, message):
+    """
+    Default error callback for iter_product_chunks; prints the problem.
+
+    Args:
+        offset (int): Byte offset of the line in the file.
+        line (str): The offending line, without its line ending.
+        message (str): A description of the problem.
+    """
+    print(f"Error processing line: {line}. Error: {message}. Skipping...")
+
+def parse_product_line(line):
+    """
+    Parses one CSV product line.
+
+    Args:
+        line (str): The line, without its line ending.
+
+    Returns:
+        tuple: (name, brand, stock, cost_price, country), with the cost
+            price in paisa.
+
+    Raises:
+        ValueError: If the line has too few fields or a bad number.
+    """
+    product_details = line.split(",")
+
+    # Ensure the line has all required fields
+    if len(product_details) < 5:
+        raise ValueError("line doesn't have enough fields")
+
+    return (
+        product_details[0],
+        product_details[1],
+        int(product_details[2]),
+        parse_money(product_details[3]),
+        product_details[4].strip(),
+    )
+
+def iter_product_chunks(database_name, chunk_size=CHUNK_SIZE, on_error=print_parse_error,
+                        start_offset=0, stop_offset=None, start_id=0):
+    """
+    Streams products from a CSV file in chunks of bounded size.
+
+    Only one chunk is held in memory at a time. Each chunk comes with the
+    byte offset just after its last line, which can be passed back as
+    start_offset (with the next product id as start_id) to resume the
+    scan later.
+
+    Args:
+        database_name (str): The name of the file containing product data.
+        chunk_size (int): The maximum number of products per chunk.
+        on_error (callable): Called as on_error(offset, line, message) for
+            every line that cannot be parsed.
+        start_offset (int): Byte offset to start reading at; must be the
+            start of a line.
+        stop_offset (int): Stop before the first line starting at or after
+            this byte offset. None reads to the end of the file.
+        start_id (int): The id given to the first product yielded.
+
+    Yields:
+        tuple: (next_offset, rows) where rows is a list of
+            (id, name, brand, stock, cost_price, country) tuples.
+    """
+    with open(database_name, "rb") as file:
+        file.seek(start_offset)
+        offset = start_offset
+        product_id = start_id
+        rows = []
+
+        for raw_line in file:
+            if stop_offset is not None and offset >= stop_offset:
+                break
+            line_offset = offset
+            offset += len(raw_line)
+
+            line = raw_line.decode("utf-8", errors="replace").strip()
+            if not line or line.startswith("#"):
+                continue  # Skip blank lines and the snapshot header
+
+            try:
+                rows.append((product_id,) + parse_product_line(line))
+                product_id += 1
+            except ValueError as e:
+                # Report malformed lines or type conversion errors
+                on_error(line_offset, line, e)
+                continue
+
+            if len(rows) >= chunk_size:
+                yield offset, rows
+                rows = []
+
+        if rows:
+            yield offset, rows
+
+def split_ranges(database_name, parts):
+    """
+    Splits a file into byte ranges that start and end on line boundaries.
+
+    Args:
+        database_name (str): The name of the file to split.
+        parts (int): The number of ranges wanted.
+
+    Returns:
+        list: (start, stop) byte offsets; fewer than parts for small files.
+    """
+    size = os.path.getsize(database_name)
+    boundaries = [0]
+    with open(database_name, "rb") as file:
+        for part in range(1, parts):
+            position = max(size * part // parts, boundaries[-1])
+            file.seek(position)
+            if position > 0:
+                file.readline()  # Move to the start of the next line
+            position = file.tell()
+            if position >= size:
+                break
+            if position > boundaries[-1]:
+                boundaries.append(position)
+    boundaries.append(size)
+    return list(zip(boundaries, boundaries[1:]))
+
+def parse_range(database_name, start, stop):
+    """
+    Parses the products in one byte range; run inside a worker process.
+
+    Args:
+        database_name (str): The name of the file containing product data.
+        start (int): Byte offset of the first line of the range.
+        stop (int): Byte offset just past the range.
+
+    Returns:
+        tuple: (columns, errors) where columns is (names, brands, stock,
+            cost_price, countries) and errors lists (offset, line, message).
+    """
+    names, brands, countries = [], [], []
+    stock, cost_price = array("q"), array("q")
+    errors = []
+
+    def collect_error(offset, line, message):
+        errors.append((offset, line, str(message)))
+
+    for offset, rows in iter_product_chunks(database_name, on_error=collect_error,
+                                            start_offset=start, stop_offset=stop):
+        for row in rows:
+            names.append(row[1])
+            brands.append(row[2])
+            stock.append(row[3])
+            cost_price.append(row[4])
+            countries.append(row[5])
+    return (names, brands, stock, cost_price, countries), errors
+
+def parse_parallel(database_name, workers=None, on_error=print_parse_error):
+    """
+    Parses a CSV snapshot by byte ranges in worker processes.
+
+    The ranges are merged in file order, so product ids match a
+    sequential parse exactly. Parse errors from every worker are reported
+    through on_error in file order once all ranges are parsed.
+
+    Args:
+        database_name (str): The name of the file containing product data.
+        workers (int): Number of worker processes; defaults to the CPU count.
+        on_error (callable): Called as on_error(offset, line, message) for
+            every line that cannot be parsed.
+
+    Returns:
+        ProductStore: The parsed products, without the journal replayed.
+    """
+    # Worker processes cost a noticeable share of startup to import
+    from concurrent.futures import ProcessPoolExecutor
+
+    workers = workers or os.cpu_count() or 1
+    ranges = split_ranges(database_name, workers)
+    products = ProductStore()
+    errors = []
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(parse_range, database_name, start, stop) for start, stop in ranges]
+        # Merge in range order so ids follow file order
+        for future in futures:
+            columns, range_errors = future.result()
+            products.extend(*columns)
+            errors.extend(range_errors)
+
+    for offset, line, message in errors:
+        on_error(offset, line, message)
+    return products
+
+@timed("load")
+def load_data_parallel(database_name, workers=None, on_error=print_parse_error):
+    """
+    Loads a CSV catalog by parsing byte ranges in worker processes.
+
+    load_data already does this for catalogs of PARALLEL_PARSE_BYTES or
+    more; this entry point forces it, with a chosen number of workers,
+    e.g. for benchmarks. A snapshot that fails its checks is read again
+    through read_database, which recovers it.
+
+    Args:
+        database_name (str): The name of the file containing product data.
+        workers (int): Number of worker processes; defaults to the CPU count.
+        on_error (callable): Called as on_error(offset, line, message) for
+            every line that cannot be parsed.
+
+    Returns:
+        ProductStore: The products loaded from the file, indexed by id.
+    """
+    try:
+        header = read_csv_header(database_name)
+        products = parse_parallel(database_name, workers, on_error)
+        check_count(products, header)
+    except CorruptSnapshotError as e:
+        print(f"Error: '{database_name}' is damaged: {e}.")
+        return read_database(database_name)
+
+    replay_journal(products, database_name, read_generation(database_name))
+    return products
+
+def load_binary_snapshot(snapshot_name, verify=True, start=0, trusted=False):
+    """
+    Loads products from a binary snapshot without parsing the numbers.
+
+    The file is read into one buffer and closed right away, so nothing
+    holds it open or mapped and it can be replaced at once, which Windows
+    requires. The stock, cost price, brand and country columns of the
+    returned store are views straight into the buffer, so nothing is
+    converted until a value is read. Only the string tables are decoded. Snapshots since
+    BINARY_CHECKSUM_VERSION are checked against their CRC32 first, which
+    reads the file once at memory speed.
+
+    Args:
+        snapshot_name (str): The name of the binary snapshot file.
+        verify (bool): Whether to check the checksum, length and product
+            count.
+        start (int): Byte offset of the snapshot within the file.
+        trusted (bool): Whether the contents are already vouched for, as
+            those of a parse cache whose source signature matched; the
+            checksum is then skipped, leaving the length and count checks.
+
+    Returns:
+        tuple: (ProductStore, generation).
+
+    Raises:
+        CorruptSnapshotError: If the file does not match its checksum.
+        ValueError: If the file is not a snapshot this version can read.
+    """
+    with open(snapshot_name, "rb") as file:
+        file.seek(start)
+        header = file.read(BINARY_HEADER.size)
+        if len(header) < BINARY_HEADER.size:
+            raise ValueError("snapshot header is truncated")
+        magic, version, byte_order, generation, count, brand_count, country_count = BINARY_HEADER.unpack(header)
+        if magic != BINARY_MAGIC or not BINARY_OLDEST_VERSION <= version <= BINARY_VERSION:
+            raise ValueError("not a supported product snapshot")
+        buffer = bytearray(os.fstat(file.fileno()).st_size - file.tell())
+        if file.readinto(buffer) != len(buffer):
+            raise ValueError("snapshot changed while being read")
+
+    view = memoryview(buffer)
+    native = byte_order == (0 if sys.byteorder == "little" else 1)
+    offset = 0
+    if version >= BINARY_CHECKSUM_VERSION:
+        (checksum,) = BINARY_CHECKSUM.unpack_from(view, offset)
+        offset += BINARY_CHECKSUM.size
+        if verify and not trusted and zlib.crc32(view[offset:]) != checksum:
+            raise CorruptSnapshotError("checksum does not match")
+
+    def column(typecode, itemsize):
+        nonlocal offset
+        raw = view[offset:offset + count * itemsize]
+        if len(raw) != count * itemsize:
+            raise CorruptSnapshotError("snapshot is truncated")
+        offset += count * itemsize
+        if native:
+            return raw.cast(typecode)
+        # Foreign byte order has to be copied and swapped
+        values = array(typecode)
+        values.frombytes(raw)
+        values.byteswap()
+        return values
+
+    def strings(number):
+        nonlocal offset
+        if len(view) - offset < BINARY_LENGTH.size:
+            raise CorruptSnapshotError("snapshot is truncated")
+        (length,) = BINARY_LENGTH.unpack_from(view, offset)
+        offset += BINARY_LENGTH.size
+        if len(view) - offset < length:
+            raise CorruptSnapshotError("snapshot is truncated")
+        blob = bytes(view[offset:offset + length]).decode("utf-8")
+        offset += length
+        return blob.split("\n") if number else []
+
+    stock = column("q", 8)
+    cost_price = column("q", 8)
+    brand_codes = column("I", 4)
+    country_codes = column("I", 4)
+    names = strings(count)
+    brand_table = strings(brand_count)
+    country_table = strings(country_count)
+    if verify and version >= BINARY_CHECKSUM_VERSION and len(names) != count:
+        raise CorruptSnapshotError(f"{len(names)} products found, {count} expected")
+    if verify and version >= BINARY_CHECKSUM_VERSION and offset != len(view):
+        raise CorruptSnapshotError("snapshot length does not match its tables")
+
+    products = ProductStore.from_columns(
+        names, stock, cost_price, brand_codes, brand_table, country_codes, country_table
+    )
+    return products, generation
+
+def read_csv_header(snapshot_name, verify=True):
+    """
+    Reads the header of a CSV snapshot and checks the body against it.
+
+    Args:
+        snapshot_name (str): The name of the CSV snapshot file.
+        verify (bool): Whether to check the checksum, if the header has one.
+
+    Returns:
+        dict: The header fields; empty for files without a header.
+
+    Raises:
+        CorruptSnapshotError: If the body does not match the checksum.
+    """
+    with open(snapshot_name, "rb") as file:
+        first_line = file.readline()
+        if not first_line.startswith(b"#"):
+            return {}
+        header = parse_header(first_line.decode("utf-8", errors="replace"))
+        if verify and "checksum" in header:
+            checksum = 0
+            for block in iter(lambda: file.read(CHECKSUM_BLOCK), b""):
+                checksum = zlib.crc32(block, checksum)
+            if f"{checksum:08x}" != header["checksum"].lower():
+                raise CorruptSnapshotError("checksum does not match")
+    return header
+
+def check_count(products, header):
+    """
+    Checks the products parsed from a CSV snapshot against its header.
+
+    Args:
+        products (ProductStore): The products parsed.
+        header (dict): The header fields from read_csv_header.
+
+    Raises:
+        CorruptSnapshotError: If the header holds a different count.
+    """
+    if "count" in header and str(len(products)) != header["count"]:
+        raise CorruptSnapshotError(f"{len(products)} products found, {header['count']} expected")
+
+def load_csv_snapshot(snapshot_name, verify=True):
+    """
+    Loads products from a CSV snapshot.
+
+    Snapshots whose header carries a checksum are checked against it
+    before parsing. Snapshots of PARALLEL_PARSE_BYTES or more are parsed
+    in worker processes when there is more than one CPU. The products
+    parsed are checked against the count in the header, so a damaged
+    file is never taken for a smaller catalog. Files without these
+    fields, such as ones written by hand, are loaded as they are.
+
+    Args:
+        snapshot_name (str): The name of the CSV snapshot file.
+        verify (bool): Whether to check the checksum and product count.
+
+    Returns:
+        tuple: (ProductStore, generation).
+
+    Raises:
+        CorruptSnapshotError: If the file does not match its header.
+    """
+    header = read_csv_header(snapshot_name, verify)
+    products = None
+    if (os.cpu_count() or 1) > 1 and os.path.getsize(snapshot_name) >= PARALLEL_PARSE_BYTES:
+        try:
+            products = parse_parallel(snapshot_name)
+        except (OSError, RuntimeError) as e:
+            # No worker processes here, e.g. in a sandbox; parse in this one
+            print(f"Warning: parsing '{snapshot_name}' in one process: {e}")
+    if products is None:
+        products = ProductStore()
+        for offset, rows in iter_product_chunks(snapshot_name):
+            for row in rows:
+                products.add(row[1], row[2], row[3], row[4], row[5])
+    if verify:
+        check_count(products, header)
+    try:
+        return products, int(header.get("generation", 0))
+    except ValueError:
+        return products, 0
+
+def source_signature(database_name):
+    """
+    Identifies the contents of a CSV database for the parse cache.
+
+    The whole file is checksummed on every load, header included, rather
+    than trusting the CRC32 in its header: a body torn or bit-flipped
+    after the cache was written then misses the cache and is parsed,
+    where the header check catches the damage. Checksumming reads the
+    file at memory speed, still far cheaper than parsing it.
+
+    Args:
+        database_name (str): The name of the CSV database file.
+
+    Returns:
+        tuple: (modification time in ns, size, CRC32).
+    """
+    status = os.stat(database_name)
+    checksum = 0
+    with open(database_name, "rb") as file:
+        for block in iter(lambda: file.read(CHECKSUM_BLOCK), b""):
+            checksum = zlib.crc32(block, checksum)
+    return status.st_mtime_ns, status.st_size, checksum
+
+def load_parse_cache(database_name, signature):
+    """
+    Loads the products of a CSV database from its parse cache.
+
+    Args:
+        database_name (str): The name of the CSV database file.
+        signature (tuple): The database's source_signature.
+
+    Returns:
+        tuple: (ProductStore, generation), or None if there is no cache
+            for this exact file or the cache is damaged.
+    """
+    cache_name = database_name + PARSE_CACHE_SUFFIX
+    try:
+        with open(cache_name, "rb") as file:
+            header = file.read(PARSE_CACHE_HEADER.size)
+        if len(header) < PARSE_CACHE_HEADER.size:
+            return None
+        magic, *cached_signature = PARSE_CACHE_HEADER.unpack(header)
+        if magic != PARSE_CACHE_MAGIC or tuple(cached_signature) != signature:
+            return None
+        # The signature's CRC already covered the source, so the cache body is not checksummed again
+        return load_binary_snapshot(cache_name, start=PARSE_CACHE_HEADER.size, trusted=True)
+    except (OSError, ValueError, struct.error):
+        return None
+
+def save_parse_cache(products, database_name, generation):
+    """
+    Saves the snapshot products of a CSV database as its parse cache.
+
+    The cache is only a copy, so it is written without fsync and any
+    failure to write it, such as a read-only directory, is ignored.
+    Callers must hold the database lock, so the file cannot change
+    between being read and being signed.
+
+    Args:
+        products (ProductStore): The products as of the snapshot, before
+            any journal is replayed.
+        database_name (str): The name of the CSV database file.
+        generation (int): The generation of the snapshot.
+    """
+    # write imports this module, so it is only imported once needed
+    from write import write_binary_snapshot
+
+    cache_name = database_name + PARSE_CACHE_SUFFIX
+    temp_name = cache_name + ".tmp"
+    try:
+        prefix = PARSE_CACHE_HEADER.pack(PARSE_CACHE_MAGIC, *source_signature(database_name))
+        write_binary_snapshot(products, temp_name, generation, prefix=prefix, sync=False)
+        os.replace(temp_name, cache_name)
+    except OSError:
+        pass
+
+def load_csv_database(database_name):
+    """
+    Loads the snapshot of a CSV database, from its parse cache if that
+    was built from this exact file, and otherwise by parsing it and
+    caching the result for the next session.
+
+    Args:
+        database_name (str): The name of the CSV database file.
+
+    Returns:
+        tuple: (ProductStore, generation).
+
+    Raises:
+        CorruptSnapshotError: If the file does not match its header.
+    """
+    cached = load_parse_cache(database_name, source_signature(database_name))
+    if cached is not None:
+        return cached
+    products, generation = load_csv_snapshot(database_name)
+    save_parse_cache(products, database_name, generation)
+    return products, generation
+
+def load_snapshot(snapshot_name, binary, verify=True):
+    """
+    Loads a CSV or binary snapshot, without its journal.
+
+    Args:
+        snapshot_name (str): The name of the snapshot file.
+        binary (bool): Whether the snapshot is binary rather than CSV.
+        verify (bool): Whether to check the checksum and product count.
+
+    Returns:
+        tuple: (ProductStore, generation).
+
+    Raises:
+        CorruptSnapshotError: If the file does not match its header.
+    """
+    if binary:
+        return load_binary_snapshot(snapshot_name, verify)
+    return load_csv_snapshot(snapshot_name, verify)
+
+def check_snapshot(snapshot_name, binary):
+    """
+    Checks a snapshot against its checksum without parsing CSV lines.
+
+    Args:
+        snapshot_name (str): The name of the snapshot file.
+        binary (bool): Whether the snapshot is binary rather than CSV.
+
+    Returns:
+        int: The number of products, or None if a CSV header lacks it.
+
+    Raises:
+        CorruptSnapshotError: If the file does not match its checksum.
+    """
+    if binary:
+        products, _ = load_binary_snapshot(snapshot_name)
+        return len(products)
+    count = read_csv_header(snapshot_name).get("count")
+    return int(count) if count and count.isdigit() else None
+
+def recover_snapshot(database_name):
+    """
+    Rebuilds the snapshot of a damaged database from the retained ones.
+
+    The newest retained snapshot that passes its checks is loaded and
+    the journals of the generations after it are replayed up to the
+    damaged one. A retained generation without its journal was replaced
+    by a rollback rather than compacted, so recovery cannot reach past
+    it. If no retained snapshot helps, the readable part of the damaged
+    file is loaded, as earlier versions did.
+
+    Args:
+        database_name (str): The name of the product database file.
+
+    Returns:
+        tuple: (ProductStore, generation), the products as of the start
+            of the damaged generation, marked as recovered.
+    """
+    binary = is_binary_database(database_name)
+    retained_list = retained_generations(database_name)
+    # Each snapshot retains the one before it, so a damaged header can be worked out
+    generation = read_generation(database_name) or (retained_list[-1] + 1 if retained_list else 0)
+    for retained in reversed(retained_list):
+        if retained >= generation:
+            continue
+        journals = [journal_name(database_name, journal) for journal in range(retained, generation)]
+        if not all(os.path.exists(journal) for journal in journals):
+            break
+        try:
+            products, _ = load_snapshot(retained_snapshot_name(database_name, retained), binary)
+        except (ValueError, OSError, struct.error):
+            continue
+        for journal in range(retained, generation):
+            replay_journal(products, database_name, journal)
+        print(f"Recovered '{database_name}' from snapshot generation {retained} "
+              f"and {len(journals)} journal(s); it will be rewritten.")
+        products.recovered = True
+        return products, generation
+
+    print(f"Warning: No intact snapshot to recover '{database_name}' from. Loading the readable products.")
+    products, _ = load_snapshot(database_name, binary, verify=False)
+    products.recovered = True
+    return products, generation
+
+def read_database(database_name):
+    """
+    Reads the snapshot and journal of a database without locking it.
+
+    CSV snapshots come from their parse cache when it is current. A
+    snapshot that fails its checks is rebuilt from the retained ones
+    with recover_snapshot. Callers must hold the database lock; see
+    load_data.
+
+    Args:
+        database_name (str): The name of the file containing product data.
+
+    Returns:
+        ProductStore: The products loaded from the file, indexed by id.
+    """
+    try:
+        if is_binary_database(database_name):
+            products, generation = load_binary_snapshot(database_name)
+        else:
+            products, generation = load_csv_database(database_name)
+    except CorruptSnapshotError as e:
+        print(f"Error: '{database_name}' is damaged: {e}.")
+        products, generation = recover_snapshot(database_name)
+
+    # Replay transactions committed since the snapshot
+    replay_journal(products, database_name, generation)
+    return products
+
+def load_prefix(database_name, limit):
+    """
+    Loads the first products of a database, e.g. to show them while the
+    whole catalog is still loading.
+
+    Only CSV files are read partially; binary snapshots load whole at
+    memory speed anyway. The journal is replayed for the products read,
+    so their stock matches a full load. No lock is taken, since the
+    products are only shown, and lines that cannot be parsed are skipped
+    quietly, since the full load reports them.
+
+    Args:
+        database_name (str): The name of the product database file.
+        limit (int): The number of products to read.
+
+    Returns:
+        ProductStore: The first products, with the ids they have in the
+            full catalog.
+    """
+    if is_binary_database(database_name):
+        return load_data(database_name)
+    products = ProductStore()
+    try:
+        for offset, rows in iter_product_chunks(database_name, limit, on_error=lambda *error: None):
+            for row in rows:
+                products.add(row[1], row[2], row[3], row[4], row[5])
+            break
+    except FileNotFoundError:
+        return products
+    replay_journal(products, database_name, read_generation(database_name))
+    return products
+
+def refresh_data(products, database_name):
+    """
+    Brings a store up to date with transactions committed elsewhere.
+
+    If the database is still at the store's generation only the new
+    journal entries are applied. If another session has compacted it in
+    the meantime, the database is read again and the store's uncommitted
+    changes are carried over. Callers must hold the database lock.
+
+    Args:
+        products (ProductStore): The store to bring up to date.
+        database_name (str): The name of the product database file.
+    """
+    generation = read_generation(database_name)
+    if generation == products.generation:
+        replay_journal(products, database_name, generation, products.journal_offset)
+    else:
+        products.replace_with(read_database(database_name))
+
+@timed("load")
+def load_data(database_name):
+    """
+    Loads product data from a given text file or binary snapshot.
+
+    The stock journal written since the last snapshot is replayed on top
+    of the file contents, so the returned store reflects every committed
+    transaction. A shared database lock keeps other sessions from
+    compacting the database halfway through.
+
+    Args:
+        database_name (str): The name of the file containing product data.
+
+    Returns:
+        ProductStore: The products loaded from the file, indexed by id.
+    """
+    try:
+        with database_lock(database_name, shared=True):
+            return read_database(database_name)
+    except FileNotFoundError:
+        # Handle case where file does not exist
+        print(f"Error: File '{database_name}' not found. Creating a new empty database.")
+        return ProductStore()
+    except Exception as e:
+        # Catch-all for any unexpected errors
+        print(f"An unexpected error occurred while loading data: {e}")
+        return ProductStore()
@@ -0,0 +1,224 @@
+import datetime
+import math
+import threading
+import time
+from array import array
+from sales import open_sales_log
+from store import LOW_STOCK_THRESHOLD
+
+# Days after which a sale counts half as much towards the sales rate
+HALF_LIFE_DAYS = 14
+# Sales older than this many half-lives are too faint to replay
+REPLAY_HALF_LIVES = 10
+# Days a purchase order takes to arrive
+LEAD_TIME_DAYS = 7
+# Days of sales a purchase order should cover once it arrives
+COVER_DAYS = 30
+# Rates below this many items per day are treated as no sales
+MIN_RATE = 0.01
+
+SECONDS_PER_DAY = 86400
+
+# Sales velocities by database name
+velocities = {}
+velocities_lock = threading.Lock()
+
+def open_sales_velocity(database_name):
+    """
+    Returns the sales velocity of a database, building it on first use.
+
+    Args:
+        database_name (str): The name of the product database.
+
+    Returns:
+        SalesVelocity: The database's sales velocity.
+    """
+    with velocities_lock:
+        velocity = velocities.get(database_name)
+        if velocity is None:
+            velocity = velocities[database_name] = SalesVelocity(open_sales_log(database_name))
+        return velocity
+
+class SalesVelocity:
+    """
+    Exponentially weighted sales rate of every product.
+
+    Each product keeps a rate in items per day and the time it was last
+    updated. A sale decays the rate by the time elapsed, with a half-life
+    of HALF_LIFE_DAYS, and adds the items sold divided by the decay
+    constant, so a steady stream of sales converges to its true daily
+    rate. Updates are O(1), and refresh only reads the rows appended to
+    the sales log since the last refresh, by this or any other session.
+
+    Products that may need reordering are kept in a candidate set. A
+    product can only start needing stock when it sells, because decay
+    only lowers rates, so just the products in each refresh are
+    re-evaluated; the rest are checked when suggestions are asked for.
+    """
+
+    def __init__(self, log):
+        self.log = log
+        self.lock = threading.Lock()
+        self.time_constant = HALF_LIFE_DAYS * SECONDS_PER_DAY / math.log(2)
+        self.rates = array("d")  # Items per day at the time of updated
+        self.updated = array("d")  # Seconds since the epoch
+        self.candidates = set()
+        self.next_row = log.first_row_since(time.time() - REPLAY_HALF_LIVES * HALF_LIFE_DAYS * SECONDS_PER_DAY)
+
+    def rate(self, product_id, now=None):
+        """
+        Returns a product's current sales rate.
+
+        Args:
+            product_id (int): The id of the product.
+            now (float): The moment to evaluate at; the current time if None.
+
+        Returns:
+            float: Items sold per day.
+        """
+        if product_id >= len(self.rates):
+            return 0.0
+        now = time.time() if now is None else now
+        decay = math.exp(-max(now - self.updated[product_id], 0) / self.time_constant)
+        return self.rates[product_id] * decay
+
+    def refresh(self, products):
+        """
+        Applies the sales logged since the last refresh.
+
+        Args:
+            products (ProductStore): The current products.
+
+        Returns:
+            list: Ids of the products sold since the last refresh.
+        """
+        with self.lock:
+            columns = self.log.read_rows(self.next_row)
+            self.next_row += len(columns["timestamp"])
+
+            # Items leaving stock, free items included, per day per time constant
+            scale = SECONDS_PER_DAY / self.time_constant
+            sold = set()
+            for timestamp, product_id, quantity, free_items in zip(
+                columns["timestamp"], columns["product_id"], columns["quantity"], columns["free_items"]
+            ):
+                if product_id >= len(self.rates):
+                    missing = product_id + 1 - len(self.rates)
+                    self.rates.extend([0.0] * missing)
+                    self.updated.extend([float(timestamp)] * missing)
+                decay = math.exp(-max(timestamp - self.updated[product_id], 0) / self.time_constant)
+                self.rates[product_id] = self.rates[product_id] * decay + (quantity + free_items) * scale
+                self.updated[product_id] = max(self.updated[product_id], timestamp)
+                sold.add(product_id)
+
+            now = time.time()
+            for product_id in sold:
+                if self.suggestion(products, product_id, now) is not None:
+                    self.candidates.add(product_id)
+                else:
+                    self.candidates.discard(product_id)
+        return sorted(sold)
+
+    def suggestion(self, products, product_id, now=None):
+        """
+        Projects when a product runs out and how much to reorder.
+
+        A product is due for reordering when its stock will not last the
+        lead time, or is already below LOW_STOCK_THRESHOLD while selling.
+        The suggested quantity brings it up to the sales expected over
+        the lead time and COVER_DAYS more.
+
+        Args:
+            products (ProductStore): The current products.
+            product_id (int): The id of the product.
+            now (float): The moment to project from; the current time if None.
+
+        Returns:
+            dict: The projection and suggested quantity, or None if the
+                product does not need reordering.
+        """
+        if product_id >= len(products):
+            return None
+        now = time.time() if now is None else now
+        rate = self.rate(product_id, now)
+        if rate < MIN_RATE:
+            return None
+        product = products[product_id]
+        stock = product["stock"]
+        days_left = max(stock, 0) / rate
+        if days_left >= LEAD_TIME_DAYS and stock >= LOW_STOCK_THRESHOLD:
+            return None
+
+        stockout = datetime.datetime.fromtimestamp(now + days_left * SECONDS_PER_DAY)
+        return {
+            "product_id": product_id,
+            "name": product["name"],
+            "brand": product["brand"],
+            "country": product["country"],
+            "stock": stock,
+            "daily_rate": rate,
+            "days_left": days_left,
+            "stockout_date": stockout.strftime("%d-%m-%Y"),
+            "quantity": max(math.ceil(rate * (LEAD_TIME_DAYS + COVER_DAYS)) - stock, 1),
+        }
+
+    def suggestions(self, products):
+        """
+        Lists the products due for reordering, soonest stock-out first.
+
+        Args:
+            products (ProductStore): The current products.
+
+        Returns:
+            list: Suggestions as returned by suggestion.
+        """
+        self.refresh(products)
+        now = time.time()
+        with self.lock:
+            suggestions = []
+            for product_id in list(self.candidates):
+                suggestion = self.suggestion(products, product_id, now)
+                if suggestion is None:
+                    self.candidates.discard(product_id)
+                else:
+                    suggestions.append(suggestion)
+        suggestions.sort(key=lambda suggestion: (suggestion["days_left"], suggestion["product_id"]))
+        return suggestions
+
+def suggest_purchase_orders(products, velocity):
+    """
+    Groups reorder suggestions into purchase orders by brand and country.
+
+    Args:
+        products (ProductStore): The current products.
+        velocity (SalesVelocity): The sales velocity of the database.
+
+    Returns:
+        list: One dictionary per (brand, country) with its lines and
+            total cost, in brand then country order.
+    """
+    orders = {}
+    for suggestion in velocity.suggestions(products):
+        key = (suggestion["brand"], suggestion["country"])
+        order = orders.setdefault(key, {"brand": key[0], "country": key[1], "lines": [], "total_cost": 0})
+        order["lines"].append(suggestion)
+        order["total_cost"] += suggestion["quantity"] * products[suggestion["product_id"]]["cost_price"]
+    return [orders[key] for key in sorted(orders)]
+
+def write_purchase_order_file(orders, orders_file):
+    """
+    Writes suggested purchase orders in the bulk restock file format.
+
+    Each brand and country becomes one vendor, so the file can be checked
+    and then restocked with --restock.
+
+    Args:
+        orders (list): Purchase orders from suggest_purchase_orders.
+        orders_file (str): The name of the file to write.
+    """
+    with open(orders_file, "w") as file:
+        for order in orders:
+            vendor_name = f"{order['brand']} {order['country']}".replace(",", " ")
+            file.write(f"# {vendor_name}\n")
+            for line in order["lines"]:
+                file.write(f"{vendor_name},{line['product_id']},{line['quantity']}\n")
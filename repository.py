@@ -0,0 +1,683 @@
+import datetime
+import sqlite3
+import threading
+from instrumentation import timed
+from read import load_data, load_prefix
+from search import ProductIndex
+from store import LOCK_STRIPES, LOW_STOCK_THRESHOLD
+from write import record_transaction, update_database
+
+# Database names with these suffixes are SQLite databases
+SQLITE_SUFFIXES = (".db", ".sqlite", ".sqlite3")
+# Seconds a SQLite connection waits for another writer before giving up
+SQLITE_TIMEOUT = 30
+
+PRODUCT_COLUMNS = "id, name, brand, stock, cost_price, country"
+
+CREATE_TABLES = """
+CREATE TABLE IF NOT EXISTS products (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL COLLATE NOCASE,
+    brand TEXT NOT NULL COLLATE NOCASE,
+    stock INTEGER NOT NULL,
+    cost_price INTEGER NOT NULL,
+    country TEXT NOT NULL COLLATE NOCASE
+);
+CREATE TABLE IF NOT EXISTS transactions (
+    id INTEGER PRIMARY KEY,
+    timestamp TEXT NOT NULL,
+    reason TEXT NOT NULL,
+    changes TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS brand_totals (
+    brand TEXT PRIMARY KEY COLLATE NOCASE,
+    stock INTEGER NOT NULL,
+    value INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS country_totals (
+    country TEXT PRIMARY KEY COLLATE NOCASE,
+    stock INTEGER NOT NULL,
+    value INTEGER NOT NULL
+);
+CREATE TRIGGER IF NOT EXISTS products_stock_totals AFTER UPDATE OF stock ON products BEGIN
+    UPDATE brand_totals SET stock = stock + NEW.stock - OLD.stock,
+        value = value + (NEW.stock - OLD.stock) * NEW.cost_price WHERE brand = NEW.brand;
+    UPDATE country_totals SET stock = stock + NEW.stock - OLD.stock,
+        value = value + (NEW.stock - OLD.stock) * NEW.cost_price WHERE country = NEW.country;
+END;
+"""
+
+# Recomputes the totals tables from the products
+REBUILD_TOTALS = (
+    "DELETE FROM brand_totals",
+    "DELETE FROM country_totals",
+    "INSERT INTO brand_totals SELECT brand, SUM(stock), SUM(stock * cost_price) FROM products GROUP BY brand",
+    "INSERT INTO country_totals SELECT country, SUM(stock), SUM(stock * cost_price) FROM products GROUP BY country",
+)
+
+CREATE_INDEXES = """
+CREATE INDEX IF NOT EXISTS products_name ON products (name);
+CREATE INDEX IF NOT EXISTS products_brand ON products (brand);
+CREATE INDEX IF NOT EXISTS products_country ON products (country);
+CREATE INDEX IF NOT EXISTS products_stock ON products (stock);
+"""
+
+# Takes stock out or puts it back, refusing to go below zero
+UPDATE_STOCK = "UPDATE products SET stock = stock + ? WHERE id = ? AND stock + ? >= 0"
+INSERT_TRANSACTION = "INSERT INTO transactions (timestamp, reason, changes) VALUES (?, ?, ?)"
+INSERT_PRODUCT = f"INSERT INTO products ({PRODUCT_COLUMNS}) VALUES (?, ?, ?, ?, ?, ?)"
+
+def is_sqlite_database(database_name):
+    """
+    Tells whether a database name refers to a SQLite database.
+
+    Args:
+        database_name (str): The name of the product database.
+
+    Returns:
+        bool: True for SQLite databases.
+    """
+    return database_name.lower().endswith(SQLITE_SUFFIXES)
+
+class Repository:
+    """
+    Where the products are kept and how stock changes are committed.
+
+    The menu, the batch processors and the server only talk to a
+    repository, so the storage behind them can be swapped. Stock changes
+    are made in the store through reserve or adjust and then committed
+    with commit, which settles them either way.
+    """
+
+    def __init__(self, database_name):
+        self.database_name = database_name
+
+    def load(self):
+        """
+        Opens the products.
+
+        Returns:
+            ProductStore: The products, or a store with the same interface.
+        """
+        raise NotImplementedError
+
+    def preview(self, limit):
+        """
+        Opens the first products only, to show while load is still running.
+
+        Args:
+            limit (int): The number of products wanted.
+
+        Returns:
+            ProductStore: At least the first limit products, with the ids
+                they have in the full catalog.
+        """
+        raise NotImplementedError
+
+    def index(self, products):
+        """
+        Builds the lookup index over the products.
+
+        Args:
+            products (ProductStore): The store returned by load.
+
+        Returns:
+            ProductIndex: The lookup index.
+        """
+        raise NotImplementedError
+
+    def commit(self, products, changes, reason):
+        """
+        Commits the stock changes of one transaction.
+
+        Args:
+            products (ProductStore): The store returned by load, already
+                updated through reserve or adjust.
+            changes (list): (product_id, delta) pairs of the transaction.
+            reason (str): A short label for the transaction, e.g. 'sale'.
+
+        Returns:
+            bool: True if the transaction was committed.
+        """
+        raise NotImplementedError
+
+    def save(self, products):
+        """
+        Folds committed transactions into the main database file.
+
+        Args:
+            products (ProductStore): The store returned by load.
+        """
+        raise NotImplementedError
+
+class FileRepository(Repository):
+    """
+    The CSV or binary snapshot file with its stock journal.
+
+    The whole catalog is loaded into a ProductStore, and every commit is
+    one line appended to the journal.
+    """
+
+    def load(self):
+        products = load_data(self.database_name)
+        if products.recovered:
+            # Replace the damaged file with the recovered products right away
+            update_database(products, self.database_name)
+        return products
+
+    def preview(self, limit):
+        return load_prefix(self.database_name, limit)
+
+    def index(self, products):
+        return ProductIndex(products)
+
+    def commit(self, products, changes, reason):
+        return record_transaction(products, changes, self.database_name, reason)
+
+    def save(self, products):
+        update_database(products, self.database_name)
+
+class SQLiteProductRow(dict):
+    """One product read from SQLite, with the keys of a ProductRow."""
+
+    def to_dict(self):
+        """
+        Copies the row into a plain product dictionary.
+
+        Returns:
+            dict: The product.
+        """
+        return dict(self)
+
+class SQLiteColumn:
+    """
+    Read-only view of one numeric column of a SQLiteProductStore.
+
+    Lets code that reads store.stock[product_id] or
+    store.cost_price[product_id] run unchanged against SQLite.
+    """
+
+    def __init__(self, store, column):
+        self.store = store
+        self.query = f"SELECT {column} FROM products WHERE id = ?"
+        self.pending = column == "stock"
+
+    def __len__(self):
+        return len(self.store)
+
+    def __getitem__(self, product_id):
+        row = self.store.repository.connection().execute(self.query, (product_id,)).fetchone()
+        if row is None:
+            raise IndexError("product id out of range")
+        if self.pending:
+            return row[0] + self.store.pending.get(product_id, 0)
+        return row[0]
+
+class SQLiteProductStore:
+    """
+    Product store that reads rows from SQLite on demand.
+
+    Only the number of products is read at startup, so opening a catalog
+    of millions of products is instant and takes no memory. Rows are
+    fetched by primary key when they are shown or priced.
+
+    Uncommitted stock changes made through reserve and adjust are kept in
+    pending, under the same striped locks as ProductStore, and added to
+    the stock read from the database until they are settled.
+
+    Inventory totals come from the brand and country totals tables, which
+    a trigger updates with every stock change, and low stock from the
+    index on stock; both reflect committed stock.
+    """
+
+    def __init__(self, repository):
+        self.repository = repository
+        self.locks = [threading.Lock() for _ in range(LOCK_STRIPES)]
+        self.pending = {}  # {product_id: uncommitted stock delta}
+        self.stock = SQLiteColumn(self, "stock")
+        self.cost_price = SQLiteColumn(self, "cost_price")
+        self.count = repository.count()
+
+    def __len__(self):
+        return self.count
+
+    def row(self, values):
+        """
+        Wraps a fetched row, adding the uncommitted stock change.
+
+        Args:
+            values (tuple): The product columns in PRODUCT_COLUMNS order.
+
+        Returns:
+            SQLiteProductRow: The product.
+        """
+        product_id, name, brand, stock, cost_price, country = values
+        return SQLiteProductRow(
+            id=product_id,
+            name=name,
+            brand=brand,
+            stock=stock + self.pending.get(product_id, 0),
+            cost_price=cost_price,
+            country=country,
+        )
+
+    def __getitem__(self, product_id):
+        if product_id < 0:
+            product_id += self.count
+        values = self.repository.connection().execute(
+            f"SELECT {PRODUCT_COLUMNS} FROM products WHERE id = ?", (product_id,)
+        ).fetchone()
+        if values is None:
+            raise IndexError("product id out of range")
+        return self.row(values)
+
+    def __iter__(self):
+        # Stream the rows instead of fetching them all at once
+        for values in self.repository.connection().execute(f"SELECT {PRODUCT_COLUMNS} FROM products ORDER BY id"):
+            yield self.row(values)
+
+    def reserve(self, product_id, quantity):
+        """
+        Takes items out of stock if enough are available.
+
+        Args:
+            product_id (int): The id of the product.
+            quantity (int): The number of items to take.
+
+        Returns:
+            bool: True if the items were taken, False if stock was short.
+        """
+        with self.locks[product_id % LOCK_STRIPES]:
+            if self.stock[product_id] < quantity:
+                return False
+            self.pending[product_id] = self.pending.get(product_id, 0) - quantity
+            return True
+
+    def adjust(self, product_id, delta):
+        """
+        Changes the stock of a product by an uncommitted delta.
+
+        Args:
+            product_id (int): The id of the product.
+            delta (int): The change in stock.
+        """
+        with self.locks[product_id % LOCK_STRIPES]:
+            self.pending[product_id] = self.pending.get(product_id, 0) + delta
+
+    def settle(self, changes, committed):
+        """
+        Settles uncommitted changes after a commit attempt.
+
+        Committed changes are in the database by now and rejected ones are
+        dropped, so either way they stop being pending.
+
+        Args:
+            changes (list): (product_id, delta) pairs of the transaction.
+            committed (bool): Whether the transaction was committed.
+        """
+        for product_id, delta in changes:
+            with self.locks[product_id % LOCK_STRIPES]:
+                remaining = self.pending.get(product_id, 0) - delta
+                if remaining:
+                    self.pending[product_id] = remaining
+                else:
+                    self.pending.pop(product_id, None)
+
+    def total_stock(self):
+        """
+        Counts the items in stock across the catalog.
+
+        Returns:
+            int: The number of items in stock across the catalog.
+        """
+        return self.repository.connection().execute("SELECT COALESCE(SUM(stock), 0) FROM brand_totals").fetchone()[0]
+
+    def inventory_value(self):
+        """
+        Returns the value of the stock on hand at cost price.
+
+        Returns:
+            int: The sum of stock times cost price over all products, in paisa.
+        """
+        return self.repository.connection().execute("SELECT COALESCE(SUM(value), 0) FROM brand_totals").fetchone()[0]
+
+    def value_by_brand(self):
+        """
+        Returns the inventory value of each brand.
+
+        Returns:
+            dict: Inventory value per brand name, in paisa.
+        """
+        return dict(self.repository.connection().execute("SELECT brand, value FROM brand_totals"))
+
+    def value_by_country(self):
+        """
+        Returns the inventory value of each country of origin.
+
+        Returns:
+            dict: Inventory value per country of origin, in paisa.
+        """
+        return dict(self.repository.connection().execute("SELECT country, value FROM country_totals"))
+
+    def low_stock(self, limit=None):
+        """
+        Lists the products below LOW_STOCK_THRESHOLD, lowest stock first.
+
+        Args:
+            limit (int): The maximum number of products to return.
+
+        Returns:
+            list: (product_id, stock) pairs.
+        """
+        return self.repository.connection().execute(
+            "SELECT id, stock FROM products WHERE stock < ? ORDER BY stock, id LIMIT ?",
+            (LOW_STOCK_THRESHOLD, -1 if limit is None else limit),
+        ).fetchall()
+
+    def low_stock_count(self):
+        """
+        Counts the products below LOW_STOCK_THRESHOLD.
+
+        Returns:
+            int: The number of products due for reordering.
+        """
+        return self.repository.connection().execute(
+            "SELECT COUNT(*) FROM products WHERE stock < ?", (LOW_STOCK_THRESHOLD,)
+        ).fetchone()[0]
+
+class SQLiteProductIndex(ProductIndex):
+    """
+    Product lookups answered by SQLite's indexes.
+
+    Name, brand and country are NOCASE columns with an index each, so
+    exact and prefix lookups are index searches; partial names scan the
+    name index.
+    """
+
+    def __init__(self, products):
+        self.products = products
+        self.repository = products.repository
+
+    def ids(self, query, parameters):
+        """
+        Runs a query selecting product ids.
+
+        Args:
+            query (str): The SQL query.
+            parameters (tuple): The query parameters.
+
+        Returns:
+            list: The selected ids.
+        """
+        return [row[0] for row in self.repository.connection().execute(query, parameters)]
+
+    @staticmethod
+    def like_pattern(text):
+        """
+        Escapes text for use in a LIKE pattern.
+
+        Args:
+            text (str): The text to match literally.
+
+        Returns:
+            str: The escaped text.
+        """
+        return text.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+    def find(self, name, brand):
+        product_ids = self.ids(
+            "SELECT id FROM products WHERE name = ? AND brand = ? ORDER BY id DESC LIMIT 1",
+            (name.strip(), brand.strip()),
+        )
+        return product_ids[0] if product_ids else None
+
+    def with_name(self, name):
+        return self.ids("SELECT id FROM products WHERE name = ? ORDER BY id", (name.strip(),))
+
+    def with_brand(self, brand):
+        return self.ids("SELECT id FROM products WHERE brand = ? ORDER BY id", (brand.strip(),))
+
+    def from_country(self, country):
+        return self.ids("SELECT id FROM products WHERE country = ? ORDER BY id", (country.strip(),))
+
+    def with_prefix(self, prefix, limit=None):
+        return self.ids(
+            "SELECT id FROM products WHERE name LIKE ? ESCAPE '\\' ORDER BY name, id LIMIT ?",
+            (self.like_pattern(prefix.strip()) + "%", -1 if limit is None else limit),
+        )
+
+    def containing(self, text, limit=None):
+        return self.ids(
+            "SELECT id FROM products WHERE name LIKE ? ESCAPE '\\' ORDER BY id LIMIT ?",
+            ("%" + self.like_pattern(text.strip()) + "%", -1 if limit is None else limit),
+        )
+
+class SQLiteRepository(Repository):
+    """
+    A SQLite database in WAL mode.
+
+    Readers never block the writer, and each thread gets its own
+    connection. Every commit is one transaction of conditional UPDATE
+    statements, so a sale that would take any product below zero is
+    rolled back as a whole, whoever sold the stock first. Statements are
+    fixed strings with bound parameters, which sqlite3 prepares once and
+    keeps in its statement cache.
+    """
+
+    def __init__(self, database_name):
+        super().__init__(database_name)
+        self.local = threading.local()
+        connection = self.connection()
+        connection.executescript(CREATE_TABLES + CREATE_INDEXES)
+
+        # Fill the totals tables of a database created before they existed;
+        # only then is the write lock needed
+        if self.totals_missing():
+            rebuilt = False
+            connection.execute("BEGIN IMMEDIATE")
+            try:
+                # Another session may have filled them while we waited for the lock
+                if self.totals_missing():
+                    for statement in REBUILD_TOTALS:
+                        connection.execute(statement)
+                rebuilt = True
+            finally:
+                connection.execute("COMMIT" if rebuilt else "ROLLBACK")
+
+    def connection(self):
+        """
+        Returns this thread's connection, opening it on first use.
+
+        Returns:
+            sqlite3.Connection: A connection in autocommit mode.
+        """
+        connection = getattr(self.local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(self.database_name, timeout=SQLITE_TIMEOUT, isolation_level=None)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=FULL")
+            self.local.connection = connection
+        return connection
+
+    def totals_missing(self):
+        """
+        Tells whether the totals tables still have to be filled.
+
+        Returns:
+            bool: True if there are products but no brand totals.
+        """
+        connection = self.connection()
+        return bool(self.count()) and not connection.execute("SELECT 1 FROM brand_totals LIMIT 1").fetchone()
+
+    def count(self):
+        """
+        Counts the products.
+
+        Returns:
+            int: One more than the highest product id.
+        """
+        return self.connection().execute("SELECT COALESCE(MAX(id) + 1, 0) FROM products").fetchone()[0]
+
+    def load(self):
+        return SQLiteProductStore(self)
+
+    def preview(self, limit):
+        return self.load()  # Rows are read on demand anyway
+
+    def index(self, products):
+        return SQLiteProductIndex(products)
+
+    @timed("persist.commit")
+    def commit(self, products, changes, reason):
+        if not changes:
+            return True
+
+        totals = {}
+        for product_id, delta in changes:
+            totals[product_id] = totals.get(product_id, 0) + delta
+
+        committed = False
+        connection = self.connection()
+        try:
+            connection.execute("BEGIN IMMEDIATE")
+            try:
+                for product_id, delta in totals.items():
+                    if connection.execute(UPDATE_STOCK, (delta, product_id, delta)).rowcount != 1:
+                        print(f"Error: Not enough stock left of product {product_id}; "
+                              "another session sold it first. Transaction cancelled.")
+                        break
+                else:
+                    timestamp = datetime.datetime.now().strftime("%Y-%m-%dT%H:%M:%S")
+                    deltas = " ".join(f"{product_id}:{delta}" for product_id, delta in changes)
+                    connection.execute(INSERT_TRANSACTION, (timestamp, reason, deltas))
+                    committed = True
+            finally:
+                connection.execute("COMMIT" if committed else "ROLLBACK")
+        except sqlite3.Error as e:
+            # Handle database errors
+            committed = False
+            print(f"Error recording transaction: {e}")
+        finally:
+            products.settle(changes, committed)
+        return committed
+
+    def save(self, products):
+        try:
+            # Fold the write-ahead log into the database file
+            self.connection().execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        except sqlite3.Error as e:
+            print(f"An unexpected error occurred while updating database: {e}")
+
+    def import_products(self, products):
+        """
+        Copies a loaded catalog into an empty database, keeping product ids.
+
+        Rows are inserted in one transaction before the indexes are built,
+        which is much faster than maintaining the indexes row by row.
+
+        Args:
+            products (ProductStore): The products to copy.
+
+        Raises:
+            ValueError: If the database already holds products.
+        """
+        connection = self.connection()
+        if self.count():
+            raise ValueError(f"'{self.database_name}' already holds products")
+
+        stock = products.committed_stock()
+        rows = (
+            (
+                product_id,
+                products.names[product_id],
+                products.brand_table[products.brand_codes[product_id]],
+                stock[product_id],
+                products.cost_price[product_id],
+                products.country_table[products.country_codes[product_id]],
+            )
+            for product_id in range(len(products))
+        )
+        connection.executescript(
+            "DROP INDEX products_name; DROP INDEX products_brand; DROP INDEX products_country; DROP INDEX products_stock;"
+        )
+        connection.execute("BEGIN")
+        try:
+            connection.executemany(INSERT_PRODUCT, rows)
+            for statement in REBUILD_TOTALS:
+                connection.execute(statement)
+            connection.execute("COMMIT")
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+        finally:
+            connection.executescript(CREATE_INDEXES + "ANALYZE;")
+
+class BackgroundLoad:
+    """
+    Loads a repository's products on a background thread.
+
+    Lets the menu start while a large catalog is still being parsed.
+    Whatever needs the whole catalog, such as a sale, calls result, which
+    waits for the load to finish.
+    """
+
+    def __init__(self, repository):
+        self.repository = repository
+        self.finished = threading.Event()
+        self.products = None
+        self.index = None
+        self.error = None
+        threading.Thread(target=self.run, name="catalog-load", daemon=True).start()
+
+    def run(self):
+        """Loads the products and sets up their index."""
+        try:
+            self.products = self.repository.load()
+            self.index = self.repository.index(self.products)
+        except BaseException as e:
+            self.error = e  # Raised again by result, in the caller's thread
+        finally:
+            self.finished.set()
+
+    def done(self, timeout=0):
+        """
+        Tells whether the load has finished, waiting for it a little.
+
+        Args:
+            timeout (float): The seconds to wait at most.
+
+        Returns:
+            bool: True once the load has finished.
+        """
+        return self.finished.wait(timeout)
+
+    def result(self):
+        """
+        Waits for the load to finish.
+
+        Returns:
+            tuple: (products, index) as load and index return them.
+        """
+        if not self.finished.is_set():
+            print("Waiting for the catalog to finish loading...")
+            self.finished.wait()
+        if self.error is not None:
+            raise self.error
+        return self.products, self.index
+
+def open_repository(database_name):
+    """
+    Opens the repository a database name refers to.
+
+    Names ending in .db, .sqlite or .sqlite3 are SQLite databases; any
+    other name is a CSV or binary snapshot file.
+
+    Args:
+        database_name (str): The name of the product database.
+
+    Returns:
+        Repository: The repository.
+    """
+    if is_sqlite_database(database_name):
+        return SQLiteRepository(database_name)
+    return FileRepository(database_name)
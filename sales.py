@@ -0,0 +1,228 @@
+import datetime
+import os
+import threading
+import time
+from array import array
+from locking import file_lock, lock_name
+
+# Columns of the sales log: one file per column, one entry per invoice line
+SALES_COLUMNS = (
+    ("timestamp", "q"),  # Seconds since the epoch
+    ("product_id", "q"),
+    ("quantity", "q"),  # Items paid for
+    ("free_items", "q"),
+    ("unit_price", "q"),  # Paisa
+    ("cost_price", "q"),  # Paisa
+)
+
+# Open sales logs by database name
+sales_logs = {}
+sales_logs_lock = threading.Lock()
+
+def sales_log_name(database_name):
+    """
+    Builds the name of the directory holding a database's sales log.
+
+    Args:
+        database_name (str): The name of the product database.
+
+    Returns:
+        str: The sales log directory name.
+    """
+    return f"{database_name}.sales"
+
+def open_sales_log(database_name):
+    """
+    Returns the sales log of a database, opening it on first use.
+
+    Args:
+        database_name (str): The name of the product database.
+
+    Returns:
+        SalesLog: The database's sales log.
+    """
+    with sales_logs_lock:
+        log = sales_logs.get(database_name)
+        if log is None:
+            log = sales_logs[database_name] = SalesLog(sales_log_name(database_name))
+        return log
+
+def parse_day(text):
+    """
+    Parses a day written DD-MM-YYYY, as on the invoices.
+
+    Args:
+        text (str): The day.
+
+    Returns:
+        datetime.date: The parsed day.
+
+    Raises:
+        ValueError: If the text is not a valid day.
+    """
+    return datetime.datetime.strptime(text.strip(), "%d-%m-%Y").date()
+
+def day_bounds(start=None, end=None):
+    """
+    Converts a range of days into epoch seconds.
+
+    Args:
+        start (datetime.date): The first day to include, or None.
+        end (datetime.date): The last day to include, or None.
+
+    Returns:
+        tuple: (first second included, first second excluded); None for
+            an open end.
+    """
+    low = None if start is None else int(datetime.datetime.combine(start, datetime.time()).timestamp())
+    high = None
+    if end is not None:
+        high = int(datetime.datetime.combine(end + datetime.timedelta(days=1), datetime.time()).timestamp())
+    return low, high
+
+class SalesLog:
+    """
+    Append-only, column-oriented log of every invoice line sold.
+
+    Each column is a file of fixed-width native values, so reading the
+    log is one read per column straight into an array, and a date range
+    is found by binary search on the timestamp column, which only grows.
+    Appends hold the log's lock, a file lock of its own that never holds
+    up stock commits; a column left longer than the others by a crash is
+    cut back to the common length before the next append.
+    """
+
+    def __init__(self, directory):
+        self.directory = os.path.abspath(directory)
+        self.lock_name = lock_name(os.path.join(self.directory, "log"))
+        self.lock = threading.Lock()  # Serializes appends between threads
+        os.makedirs(self.directory, exist_ok=True)
+
+    def column_name(self, column):
+        """
+        Builds the file name of a column.
+
+        Args:
+            column (str): The column name.
+
+        Returns:
+            str: The path of the column file.
+        """
+        return os.path.join(self.directory, f"{column}.col")
+
+    def row_count(self):
+        """
+        Counts the complete rows in the log.
+
+        Returns:
+            int: The length of the shortest column.
+        """
+        counts = []
+        for column, typecode in SALES_COLUMNS:
+            try:
+                size = os.path.getsize(self.column_name(column))
+            except FileNotFoundError:
+                size = 0
+            counts.append(size // array(typecode).itemsize)
+        return min(counts)
+
+    def append(self, items):
+        """
+        Logs the lines of a committed sale.
+
+        Args:
+            items (list): Invoice lines as built by sale_item.
+        """
+        if not items:
+            return
+        with self.lock, file_lock(self.lock_name):
+            rows = self.row_count()
+            timestamp = int(time.time())
+            values = {
+                "timestamp": [timestamp] * len(items),
+                "product_id": [item["product_id"] for item in items],
+                "quantity": [item["product_quantity"] for item in items],
+                "free_items": [item["free_items"] for item in items],
+                "unit_price": [item["individual_item_price"] for item in items],
+                "cost_price": [item["cost_price"] for item in items],
+            }
+            for column, typecode in SALES_COLUMNS:
+                data = array(typecode, values[column])
+                with open(self.column_name(column), "ab") as file:
+                    # Drop values of a row a crashed writer left incomplete
+                    file.truncate(rows * data.itemsize)
+                    data.tofile(file)
+
+    def read_rows(self, first, last=None):
+        """
+        Reads a range of rows by position.
+
+        Args:
+            first (int): The first row to read.
+            last (int): The row to stop before; the end of the log if None.
+
+        Returns:
+            dict: One array per column, all of the same length.
+        """
+        if last is None:
+            last = self.row_count()
+        columns = {}
+        for column, typecode in SALES_COLUMNS:
+            data = array(typecode)
+            if last > first:
+                with open(self.column_name(column), "rb") as file:
+                    file.seek(first * data.itemsize)
+                    data.fromfile(file, last - first)
+            columns[column] = data
+        return columns
+
+    def first_row_since(self, timestamp, rows=None):
+        """
+        Finds the first row logged at or after a moment.
+
+        Rows are logged in time order, so the timestamp column is binary
+        searched in place, reading one value per step.
+
+        Args:
+            timestamp (float): Seconds since the epoch.
+            rows (int): The number of rows to search; the row count if None.
+
+        Returns:
+            int: The position of the row; the row count if there is none.
+        """
+        if rows is None:
+            rows = self.row_count()
+        if not rows:
+            return 0
+        low, high = 0, rows
+        value = array("q")
+        with open(self.column_name("timestamp"), "rb") as file:
+            while low < high:
+                middle = (low + high) // 2
+                file.seek(middle * value.itemsize)
+                value.fromfile(file, 1)
+                if value.pop() < timestamp:
+                    low = middle + 1
+                else:
+                    high = middle
+        return low
+
+    def read(self, start=None, end=None):
+        """
+        Reads the rows logged within a range of days.
+
+        The range is found in the timestamp column first, and only its
+        rows are read from the other columns.
+
+        Args:
+            start (datetime.date): The first day to include, or None.
+            end (datetime.date): The last day to include, or None.
+
+        Returns:
+            dict: One array per column, all of the same length.
+        """
+        low, high = day_bounds(start, end)
+        rows = self.row_count()
+        first = 0 if low is None else self.first_row_since(low, rows)
+        last = rows if high is None else self.first_row_since(high, rows)
+        return self.read_rows(first, max(first, last))
@@ -0,0 +1,218 @@
+import threading
+from bisect import bisect_left
+
+# Maximum number of candidates resolve returns for a partial name
+MATCH_LIMIT = 20
+
+class ProductIndex:
+    """
+    Lookup indexes over a ProductStore.
+
+    Keeps a hash index on (name, brand), inverted indexes on name, brand
+    and country, a sorted name list for prefix search and a trigram index
+    for partial name search. The indexes are only built by the first
+    lookup by name, brand or country, so sessions that only go by product
+    id, such as batch files, never pay for them; the trigram index, the
+    most expensive, waits for the first substring search. All keys are
+    lower-cased. The indexes only cover the descriptive fields, so stock
+    changes never invalidate them; stock is read live from the store when
+    filtering. When the store takes over a freshly loaded catalog, after
+    another session compacted the database or a rollback, its
+    catalog_version changes and the next lookup builds them again.
+    """
+
+    def __init__(self, products):
+        self.products = products
+        self.version = None  # catalog_version of the store the indexes were built from
+        self.build_lock = threading.Lock()
+        self.trigrams = None
+
+    def build(self):
+        """Builds the hash, inverted and sorted indexes, once per catalog version."""
+        with self.build_lock:
+            version = self.products.catalog_version
+            if self.version == version:
+                return
+            self.by_name_brand = {}
+            self.by_name = {}
+            self.by_brand = {}
+            self.by_country = {}
+            self.sorted_names = []
+
+            # Bulk build straight from the store's columns
+            products = self.products
+            brands = [brand.lower() for brand in products.brand_table]
+            countries = [country.lower() for country in products.country_table]
+            for product_id, (name, brand_code, country_code) in enumerate(
+                zip(products.names, products.brand_codes, products.country_codes)
+            ):
+                name = name.lower()
+                brand = brands[brand_code]
+                self.by_name_brand[(name, brand)] = product_id
+                self.by_name.setdefault(name, []).append(product_id)
+                self.by_brand.setdefault(brand, []).append(product_id)
+                self.by_country.setdefault(countries[country_code], []).append(product_id)
+                self.sorted_names.append((name, product_id))
+            self.sorted_names.sort()
+            self.trigrams = None
+            self.version = version
+
+    @staticmethod
+    def name_trigrams(text):
+        """
+        Splits text into its set of three-character substrings.
+
+        Args:
+            text (str): Lower-cased text.
+
+        Returns:
+            set: The trigrams of the text.
+        """
+        return {text[i:i + 3] for i in range(len(text) - 2)}
+
+    def build_trigrams(self):
+        """Builds the trigram index from the sorted name list."""
+        self.build()
+        trigrams = {}
+        for name, product_id in sorted(self.sorted_names, key=lambda entry: entry[1]):
+            for trigram in self.name_trigrams(name):
+                trigrams.setdefault(trigram, []).append(product_id)
+        self.trigrams = trigrams
+
+    def find(self, name, brand):
+        """
+        Looks up a product by its exact name and brand.
+
+        Args:
+            name (str): The product name.
+            brand (str): The brand name.
+
+        Returns:
+            int: The product id, or None if there is no such product.
+        """
+        self.build()
+        return self.by_name_brand.get((name.strip().lower(), brand.strip().lower()))
+
+    def with_name(self, name):
+        """
+        Lists the products with an exact name.
+
+        Args:
+            name (str): The product name.
+
+        Returns:
+            list: Ids of the products with the name.
+        """
+        self.build()
+        return list(self.by_name.get(name.strip().lower(), []))
+
+    def with_brand(self, brand):
+        """
+        Lists the products of a brand.
+
+        Args:
+            brand (str): The brand name.
+
+        Returns:
+            list: Ids of the products of the brand.
+        """
+        self.build()
+        return list(self.by_brand.get(brand.strip().lower(), []))
+
+    def from_country(self, country):
+        """
+        Lists the products from a country of origin.
+
+        Args:
+            country (str): The country of origin.
+
+        Returns:
+            list: Ids of the products from the country.
+        """
+        self.build()
+        return list(self.by_country.get(country.strip().lower(), []))
+
+    def with_prefix(self, prefix, limit=None):
+        """
+        Finds products whose name starts with a prefix.
+
+        Args:
+            prefix (str): The start of the product name.
+            limit (int): The maximum number of ids to return.
+
+        Returns:
+            list: Matching ids in name order.
+        """
+        self.build()
+        prefix = prefix.strip().lower()
+        matches = []
+        position = bisect_left(self.sorted_names, (prefix, -1))
+        while position < len(self.sorted_names) and self.sorted_names[position][0].startswith(prefix):
+            matches.append(self.sorted_names[position][1])
+            if limit is not None and len(matches) >= limit:
+                break
+            position += 1
+        return matches
+
+    def containing(self, text, limit=None):
+        """
+        Finds products whose name contains a piece of text.
+
+        Queries of three or more characters intersect the trigram posting
+        lists, starting from the shortest; shorter queries fall back to a
+        prefix search.
+
+        Args:
+            text (str): Part of the product name.
+            limit (int): The maximum number of ids to return.
+
+        Returns:
+            list: Matching ids in id order.
+        """
+        text = text.strip().lower()
+        if len(text) < 3:
+            return sorted(self.with_prefix(text, limit))
+        self.build()
+        if self.trigrams is None:
+            self.build_trigrams()
+
+        postings = sorted((self.trigrams.get(trigram, []) for trigram in self.name_trigrams(text)), key=len)
+        candidates = set(postings[0])
+        for posting in postings[1:]:
+            candidates.intersection_update(posting)
+            if not candidates:
+                break
+
+        # Trigrams can match out of order, so confirm each candidate
+        names = self.products.names
+        matches = [product_id for product_id in sorted(candidates) if text in names[product_id].lower()]
+        return matches[:limit] if limit is not None else matches
+
+    def resolve(self, query, limit=MATCH_LIMIT):
+        """
+        Resolves what a clerk typed into candidate product ids.
+
+        Accepts a numeric id, 'name,brand', an exact name, the start of a
+        name or any part of a name, tried in that order.
+
+        Args:
+            query (str): The text entered by the clerk.
+            limit (int): The maximum number of candidates for partial names.
+
+        Returns:
+            list: The candidate ids; empty if nothing matches.
+        """
+        query = query.strip()
+        if query.isnumeric():
+            product_id = int(query)
+            return [product_id] if product_id < len(self.products) else []
+
+        if "," in query:
+            name, brand = query.split(",", 1)
+            product_id = self.find(name, brand)
+            return [] if product_id is None else [product_id]
+
+        exact = self.with_name(query)
+        if exact:
+            return exact
+        return self.with_prefix(query, limit) or self.containing(query, limit)
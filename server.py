@@ -0,0 +1,471 @@
+import asyncio
+import json
+import traceback
+from urllib.parse import parse_qs, urlsplit
+from batch import ProductResolver
+from analytics import TOP_COUNT, sales_summary
+import instrumentation
+from invoices import parse_filters
+from money import to_rupees
+from repository import open_repository
+from reorder import open_sales_velocity, suggest_purchase_orders
+from sales import open_sales_log, parse_day
+from operations import PAGE_SIZE, purchase_item, sale_item
+from pricing import price_table
+from write import (
+    flush_invoices,
+    generate_invoice,
+    generate_purchase_invoice,
+    invoice_store,
+    invoice_writer,
+)
+
+# Largest request body accepted, in bytes
+MAX_BODY = 1024 * 1024
+
+# Amounts kept in paisa, sent as rupees in JSON
+MONEY_FIELDS = frozenset((
+    "cost_price", "individual_item_price", "total_item_price", "total_item_cost", "total_cost",
+    "grand_total", "grand_total_cost", "inventory_value", "revenue", "cost_of_sales", "margin",
+    "giveaway_cost", "net_margin",
+))
+
+REASONS = {
+    200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed", 409: "Conflict",
+    500: "Internal Server Error",
+}
+
+class RequestError(Exception):
+    """A request that cannot be served, with the HTTP status to answer."""
+
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+def in_rupees(record):
+    """
+    Converts the amounts of a response record from paisa to rupees.
+
+    Args:
+        record (dict): A product, invoice line, order or summary.
+
+    Returns:
+        dict: A copy with every field in MONEY_FIELDS in rupees.
+    """
+    return {key: to_rupees(value) if key in MONEY_FIELDS else value for key, value in record.items()}
+
+def invoice_json(record):
+    """
+    Converts an invoice index record into a JSON-ready dictionary.
+
+    Args:
+        record (dict): The index record, with its total in paisa.
+
+    Returns:
+        dict: A copy with the total in rupees.
+    """
+    return dict(record, total=to_rupees(record["total"]))
+
+def product_json(products, product_id):
+    """
+    Converts one product into a JSON-ready dictionary.
+
+    Args:
+        products (ProductStore): The current products.
+        product_id (int): The id of the product.
+
+    Returns:
+        dict: The product's fields, with the cost price in rupees.
+    """
+    return in_rupees(products[product_id].to_dict())
+
+def parse_items(payload, resolver):
+    """
+    Reads and validates the 'items' list of a sell or restock request.
+
+    Args:
+        payload (dict): The decoded request body.
+        resolver (ProductResolver): Resolves product IDs and names.
+
+    Returns:
+        list: (product_id, quantity) pairs.
+
+    Raises:
+        RequestError: If an item is malformed or names an unknown product.
+    """
+    items = payload.get("items")
+    if not isinstance(items, list) or not items:
+        raise RequestError(400, "'items' must be a non-empty list")
+
+    lines = []
+    for item in items:
+        if not isinstance(item, dict):
+            raise RequestError(400, "each item must be an object")
+        product_id = resolver.resolve(str(item.get("product", "")).strip())
+        if product_id is None:
+            raise RequestError(404, f"unknown or ambiguous product: {item.get('product')}")
+        quantity = item.get("quantity")
+        # JSON true and false decode as bool, which is an int subclass
+        if isinstance(quantity, bool) or not isinstance(quantity, int) or quantity <= 0:
+            raise RequestError(400, "quantity must be a positive integer")
+        lines.append((product_id, quantity))
+    return lines
+
+class InventoryServer:
+    """
+    Serves the inventory over HTTP/1.1 with JSON bodies.
+
+    Endpoints:
+        GET  /products?page=N&page_size=M   one page of the product table
+        GET  /products/<id>                 one product
+        GET  /search?q=TEXT | brand=B | country=C
+        POST /sell     {"customer_name", "phone_number", "items": [{"product", "quantity"}]}
+        POST /restock  {"vendor_name", "items": [{"product", "quantity"}]}
+        GET  /invoices?customer=C&vendor=V&phone=P&from=DD-MM-YYYY&to=DD-MM-YYYY
+        GET  /invoices/<id>                 one invoice with its text
+        GET  /inventory?limit=N                 inventory value and low-stock products
+        GET  /reorder                       purchase orders suggested by sales velocity
+        GET  /analytics?from=DD-MM-YYYY&to=DD-MM-YYYY&top=N
+        GET  /metrics                       invoice writer counters and lag, and stage
+                                            latencies when instrumentation is on
+
+    Connections are handled concurrently on one event loop. Commits and
+    invoice files are written in the loop's thread pool, where the
+    per-product locks and the journal lock keep concurrent requests from
+    overselling. Searches, inventory totals, reorder suggestions and
+    analytics run there too, since they may scan the sales log or build
+    indexes and aggregates.
+    """
+
+    def __init__(self, products, repository, index=None):
+        self.products = products
+        self.repository = repository
+        self.index = index if index is not None else repository.index(products)
+        self.resolver = ProductResolver(products, self.index)
+
+    def list_products(self, query):
+        """
+        Answers GET /products with one page of products.
+
+        Args:
+            query (dict): The parsed query string.
+
+        Returns:
+            dict: The response body.
+        """
+        page = int(query.get("page", ["0"])[0])
+        page_size = min(int(query.get("page_size", [str(PAGE_SIZE)])[0]), 1000)
+        start = max(page, 0) * page_size
+        product_ids = range(start, min(start + page_size, len(self.products)))
+        return {
+            "page": page,
+            "page_size": page_size,
+            "total": len(self.products),
+            "products": [product_json(self.products, product_id) for product_id in product_ids],
+        }
+
+    def search_products(self, query):
+        """
+        Answers GET /search by name text, brand or country.
+
+        Args:
+            query (dict): The parsed query string.
+
+        Returns:
+            dict: The response body.
+        """
+        if "brand" in query:
+            product_ids = self.index.with_brand(query["brand"][0])
+        elif "country" in query:
+            product_ids = self.index.from_country(query["country"][0])
+        elif "q" in query:
+            product_ids = self.index.resolve(query["q"][0])
+        else:
+            raise RequestError(400, "give q, brand or country")
+        limit = min(int(query.get("limit", [str(PAGE_SIZE)])[0]), 1000)
+        return {
+            "total": len(product_ids),
+            "products": [product_json(self.products, product_id) for product_id in product_ids[:limit]],
+        }
+
+    def search_invoices(self, query):
+        """
+        Answers GET /invoices with the saved invoices matching the filters.
+
+        Args:
+            query (dict): The parsed query string.
+
+        Returns:
+            dict: The response body.
+        """
+        filters = {key: values[0] for key, values in query.items() if key != "limit"}
+        store = invoice_store()
+        invoice_ids = store.find(**parse_filters(filters.items()))
+        limit = min(int(query.get("limit", [str(PAGE_SIZE)])[0]), 1000)
+        return {
+            "total": len(invoice_ids),
+            "invoices": [invoice_json(store.get(invoice_id)) for invoice_id in invoice_ids[-limit:]],
+        }
+
+    def inventory(self, query):
+        """
+        Answers GET /inventory with the running inventory totals.
+
+        Args:
+            query (dict): The parsed query string.
+
+        Returns:
+            dict: The response body.
+        """
+        limit = min(int(query.get("limit", [str(PAGE_SIZE)])[0]), 1000)
+        return {
+            "total_stock": self.products.total_stock(),
+            "inventory_value": to_rupees(self.products.inventory_value()),
+            "value_by_brand": {name: to_rupees(value) for name, value in self.products.value_by_brand().items()},
+            "value_by_country": {name: to_rupees(value) for name, value in self.products.value_by_country().items()},
+            "low_stock_count": self.products.low_stock_count(),
+            "low_stock": [
+                dict(product_json(self.products, product_id), stock=stock)
+                for product_id, stock in self.products.low_stock(limit)
+            ],
+        }
+
+    def suggest_orders(self, query):
+        """
+        Answers GET /reorder with the purchase orders suggested by sales.
+
+        Args:
+            query (dict): The parsed query string.
+
+        Returns:
+            dict: The response body.
+        """
+        velocity = open_sales_velocity(self.repository.database_name)
+        return {"orders": list(map(in_rupees, suggest_purchase_orders(self.products, velocity)))}
+
+    def sales_report(self, query):
+        """
+        Answers GET /analytics with revenue, margin and top sellers.
+
+        Args:
+            query (dict): The parsed query string.
+
+        Returns:
+            dict: The response body.
+        """
+        start = parse_day(query["from"][0]) if "from" in query else None
+        end = parse_day(query["to"][0]) if "to" in query else None
+        top = min(int(query.get("top", [str(TOP_COUNT)])[0]), 1000)
+        columns = open_sales_log(self.repository.database_name).read(start, end)
+        summary = in_rupees(sales_summary(columns, self.products, top))
+        for key in ("top_products", "top_brands", "top_countries"):
+            summary[key] = [(name, to_rupees(amount)) for name, amount in summary[key]]
+        return summary
+
+    @instrumentation.timed("sell.request")
+    def sell(self, payload):
+        """
+        Sells a cart: prices it with the pricing rules,
+        takes the items out of stock, commits, logs the sale and writes
+        the invoice.
+
+        Args:
+            payload (dict): The decoded request body.
+
+        Returns:
+            dict: The response body with the invoice lines and total.
+        """
+        customer_name = str(payload.get("customer_name", "")).strip()
+        phone_number = str(payload.get("phone_number", "")).strip()
+        if not customer_name or not phone_number.isnumeric():
+            raise RequestError(400, "customer_name and a numeric phone_number are required")
+        lines = parse_items(payload, self.resolver)
+
+        # Take every line out of stock or none of them
+        prices = price_table(self.products)
+        item_selling = []
+        stock_changes = []
+        for product_id, quantity in lines:
+            item = sale_item(self.products[product_id], quantity, prices)
+            if not self.products.reserve(product_id, item["total_quantity"]):
+                self.products.settle(stock_changes, committed=False)
+                raise RequestError(409, f"insufficient stock of product {product_id}")
+            stock_changes.append((product_id, -item["total_quantity"]))
+            item_selling.append(item)
+        grand_total = sum(item["total_item_price"] for item in item_selling)
+
+        if not self.repository.commit(self.products, stock_changes, "sale"):
+            raise RequestError(409, "stock changed in another session; sale cancelled")
+        open_sales_log(self.repository.database_name).append(item_selling)
+        generate_invoice(customer_name, phone_number, item_selling, grand_total, display=False)
+        return in_rupees({"items": list(map(in_rupees, item_selling)), "grand_total": grand_total})
+
+    @instrumentation.timed("restock.request")
+    def restock(self, payload):
+        """
+        Restocks a purchase from a vendor, commits and writes the invoice.
+
+        Args:
+            payload (dict): The decoded request body.
+
+        Returns:
+            dict: The response body with the invoice lines and total.
+        """
+        vendor_name = str(payload.get("vendor_name", "")).strip()
+        if not vendor_name:
+            raise RequestError(400, "vendor_name is required")
+        lines = parse_items(payload, self.resolver)
+
+        restock_items = []
+        stock_changes = []
+        for product_id, quantity in lines:
+            self.products.adjust(product_id, quantity)
+            stock_changes.append((product_id, quantity))
+            restock_items.append(purchase_item(self.products[product_id], quantity))
+        grand_total_cost = sum(item["total_item_cost"] for item in restock_items)
+
+        if not self.repository.commit(self.products, stock_changes, "restock"):
+            raise RequestError(409, "restock could not be committed")
+        generate_purchase_invoice(vendor_name, restock_items, grand_total_cost, display=False)
+        return in_rupees({"items": list(map(in_rupees, restock_items)), "grand_total_cost": grand_total_cost})
+
+    async def dispatch(self, method, target, body):
+        """
+        Routes one request to its handler.
+
+        Args:
+            method (str): The HTTP method.
+            target (str): The request target, path and query string.
+            body (bytes): The request body.
+
+        Returns:
+            dict: The response body.
+
+        Raises:
+            RequestError: If the request cannot be served.
+        """
+        url = urlsplit(target)
+        query = parse_qs(url.query)
+        path = url.path.rstrip("/")
+        # Handlers that scan or build indexes, kept off the event loop
+        readers = {
+            "/search": self.search_products,
+            "/inventory": self.inventory,
+            "/reorder": self.suggest_orders,
+            "/analytics": self.sales_report,
+        }
+
+        try:
+            if method == "GET" and path == "/products":
+                return self.list_products(query)
+            if method == "GET" and path.startswith("/products/"):
+                product_id = path[len("/products/"):]
+                if not product_id.isnumeric() or int(product_id) >= len(self.products):
+                    raise RequestError(404, "no such product")
+                return product_json(self.products, int(product_id))
+            if method == "GET" and path in readers:
+                return await asyncio.get_running_loop().run_in_executor(None, readers[path], query)
+            if method == "GET" and path == "/invoices":
+                return self.search_invoices(query)
+            if method == "GET" and path.startswith("/invoices/"):
+                invoice_id = path[len("/invoices/"):]
+                store = invoice_store()
+                record = store.get(int(invoice_id)) if invoice_id.isnumeric() else None
+                if record is None:
+                    raise RequestError(404, "no such invoice")
+                return dict(invoice_json(record), text=store.read(record["id"]))
+            if method == "GET" and path == "/metrics":
+                metrics = {"invoice_writer": invoice_writer.metrics()}
+                if instrumentation.enabled:
+                    metrics["instrumentation"] = instrumentation.instruments.summary()
+                return metrics
+            if path in ("/sell", "/restock"):
+                if method != "POST":
+                    raise RequestError(405, "use POST")
+                payload = json.loads(body or b"{}")
+                if not isinstance(payload, dict):
+                    raise RequestError(400, "body must be a JSON object")
+                handler = self.sell if path == "/sell" else self.restock
+                # Commits block on fsync, so keep them off the event loop
+                return await asyncio.get_running_loop().run_in_executor(None, handler, payload)
+        except ValueError as e:
+            raise RequestError(400, f"bad request: {e}")
+        raise RequestError(404, "no such endpoint")
+
+    async def handle_connection(self, reader, writer):
+        """
+        Serves the requests of one keep-alive connection.
+
+        Args:
+            reader (asyncio.StreamReader): The connection's reader.
+            writer (asyncio.StreamWriter): The connection's writer.
+        """
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                try:
+                    method, target, version = request_line.decode("latin-1").split()
+                except ValueError:
+                    break
+
+                # Read headers and body
+                headers = {}
+                while True:
+                    header = await reader.readline()
+                    if header in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = header.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                length = int(headers.get("content-length", "0") or 0)
+                if length > MAX_BODY:
+                    break
+                body = await reader.readexactly(length) if length else b""
+
+                try:
+                    status, response = 200, await self.dispatch(method, target, body)
+                except RequestError as e:
+                    status, response = e.status, {"error": str(e)}
+                except Exception:
+                    # Keep serving other requests after an unexpected error
+                    print(f"Error handling {method} {target}:")
+                    traceback.print_exc()
+                    status, response = 500, {"error": "internal server error"}
+
+                keep_alive = headers.get("connection", "").lower() != "close" and version == "HTTP/1.1"
+                payload = json.dumps(response).encode()
+                writer.write(
+                    f"HTTP/1.1 {status} {REASONS.get(status, 'Error')}\r\n"
+                    f"Content-Type: application/json\r\n"
+                    f"Content-Length: {len(payload)}\r\n"
+                    f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n".encode("latin-1")
+                    + payload
+                )
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass  # Client went away
+        finally:
+            writer.close()
+
+async def serve(database_name, host="127.0.0.1", port=8080):
+    """
+    Loads the database and serves it until cancelled.
+
+    Args:
+        database_name (str): The name of the product database file.
+        host (str): The interface to listen on.
+        port (int): The TCP port to listen on.
+    """
+    repository = open_repository(database_name)
+    inventory = InventoryServer(repository.load(), repository)
+    server = await asyncio.start_server(inventory.handle_connection, host, port)
+    print(f"Serving {database_name} on http://{host}:{port}")
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        # Let queued invoices reach disk before the process exits
+        flush_invoices()
@@ -0,0 +1,8 @@
+# Defaults the command line shows before any command runs. This module
+# imports nothing, so main can build its options without loading the
+# modules behind each command.
+
+# Rules file read when none is given on the command line
+PRICING_RULES_FILE = "pricing_rules.json"
+# Number of entries in each top list
+TOP_COUNT = 10
@@ -0,0 +1,588 @@
+import contextlib
+import operator
+import sys
+import threading
+from array import array
+
+# Number of locks shared out between products for stock updates
+LOCK_STRIPES = 64
+# Products with less stock than this are due for reordering
+LOW_STOCK_THRESHOLD = 10
+
+class ProductRow:
+    """
+    Dictionary-style view of one product held in a ProductStore.
+
+    Reading or assigning a key goes straight to the store's columns, so
+    code written against product dictionaries keeps working unchanged.
+    """
+
+    __slots__ = ("store", "id")
+
+    KEYS = ("id", "name", "brand", "stock", "cost_price", "country")
+
+    def __init__(self, store, product_id):
+        self.store = store
+        self.id = product_id
+
+    def __getitem__(self, key):
+        # Most frequent keys first: every sale line reads the id
+        if key == "id":
+            return self.id
+        store = self.store
+        if key == "stock":
+            return store.stock[self.id]
+        if key == "cost_price":
+            return store.cost_price[self.id]
+        if key == "name":
+            return store.names[self.id]
+        if key == "brand":
+            return store.brand_table[store.brand_codes[self.id]]
+        if key == "country":
+            return store.country_table[store.country_codes[self.id]]
+        raise KeyError(key)
+
+    def __setitem__(self, key, value):
+        store = self.store
+        if key == "stock":
+            with store.locks[self.id % LOCK_STRIPES]:
+                store.change_stock(self.id, value - store.stock[self.id])
+            return
+        if key == "cost_price":
+            store.cost_price[self.id] = value
+        elif key == "name":
+            store.names[self.id] = sys.intern(value)
+        elif key == "brand":
+            store.brand_codes[self.id] = store.intern_code(store.brand_table, store.brand_index, value)
+        elif key == "country":
+            store.country_codes[self.id] = store.intern_code(store.country_table, store.country_index, value)
+        else:
+            raise KeyError(key)
+        # Values are grouped by these fields, so start the totals afresh
+        store.aggregates = None
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def keys(self):
+        return self.KEYS
+
+    def to_dict(self):
+        """
+        Copies the row into a plain product dictionary.
+
+        Returns:
+            dict: The product with the same keys load_data used to produce.
+        """
+        return {key: self[key] for key in self.KEYS}
+
+class StockAggregates:
+    """
+    Running inventory totals of a ProductStore.
+
+    Holds the total stock and value (stock times cost price, in paisa),
+    the value of each brand and country, and the products below
+    LOW_STOCK_THRESHOLD bucketed by their stock level. Built once by
+    scanning the store, then every stock change updates it in O(1), so
+    totals and reorder alerts never need another scan. The brand and
+    country values take a second scan, so they wait until first asked for.
+    """
+
+    def __init__(self, store, threshold=LOW_STOCK_THRESHOLD):
+        self.lock = threading.Lock()
+        self.threshold = threshold
+        self.total_stock = sum(store.stock)
+        self.total_value = sum(map(operator.mul, store.stock, store.cost_price))
+        # Values per brand and country code; built by group_values on first use
+        self.brand_values = None
+        self.country_values = None
+
+        # low_stock[level] holds the ids of the products with that much stock
+        self.low_stock = [set() for _ in range(threshold)]
+        for product_id, stock in enumerate(store.stock):
+            if stock < threshold:
+                self.low_stock[max(stock, 0)].add(product_id)
+
+    def group_values(self, store):
+        """
+        Builds the value of each brand and country, once.
+
+        Every product lock must be held, so no stock change is missed.
+
+        Args:
+            store (ProductStore): The store the totals belong to.
+        """
+        with self.lock:
+            if self.brand_values is not None:
+                return
+            brand_values = [0] * len(store.brand_table)
+            country_values = [0] * len(store.country_table)
+            for brand_code, country_code, value in zip(
+                store.brand_codes, store.country_codes, map(operator.mul, store.stock, store.cost_price)
+            ):
+                brand_values[brand_code] += value
+                country_values[country_code] += value
+            self.brand_values = brand_values
+            self.country_values = country_values
+
+    def update(self, store, product_id, old_stock, new_stock):
+        """
+        Accounts for one product's stock changing.
+
+        Args:
+            store (ProductStore): The store the product belongs to.
+            product_id (int): The id of the product.
+            old_stock (int): The stock before the change.
+            new_stock (int): The stock after the change.
+        """
+        delta = new_stock - old_stock
+        value = delta * store.cost_price[product_id]
+        brand_code = store.brand_codes[product_id]
+        country_code = store.country_codes[product_id]
+        with self.lock:
+            self.total_stock += delta
+            self.total_value += value
+            if self.brand_values is not None:
+                self.brand_values[brand_code] += value
+                self.country_values[country_code] += value
+            if old_stock < self.threshold:
+                self.low_stock[max(old_stock, 0)].discard(product_id)
+            if new_stock < self.threshold:
+                self.low_stock[max(new_stock, 0)].add(product_id)
+
+    def add_product(self, store, product_id):
+        """
+        Accounts for a product added to the store.
+
+        Args:
+            store (ProductStore): The store the product belongs to.
+            product_id (int): The id of the new product.
+        """
+        with self.lock:
+            if self.brand_values is not None:
+                self.brand_values.extend([0] * (len(store.brand_table) - len(self.brand_values)))
+                self.country_values.extend([0] * (len(store.country_table) - len(self.country_values)))
+        self.update(store, product_id, 0, store.stock[product_id])
+
+    def low_stock_count(self):
+        """
+        Counts the products below the threshold.
+
+        Returns:
+            int: The number of products due for reordering.
+        """
+        with self.lock:
+            return sum(map(len, self.low_stock))
+
+    def lowest(self, limit=None):
+        """
+        Lists the products below the threshold, lowest stock first.
+
+        Args:
+            limit (int): The maximum number of ids to return.
+
+        Returns:
+            list: (product_id, stock) pairs.
+        """
+        products = []
+        with self.lock:
+            for stock, product_ids in enumerate(self.low_stock):
+                for product_id in sorted(product_ids):
+                    if limit is not None and len(products) >= limit:
+                        return products
+                    products.append((product_id, stock))
+        return products
+
+class ProductStore:
+    """
+    Column-oriented product table.
+
+    Stock is kept in an int64 array and cost price, in paisa, in another.
+    Brand and country are stored as small integer codes into tables of
+    unique strings, and product names are interned. Indexing the store
+    returns a ProductRow, so it can be used wherever the old list of
+    product dictionaries was.
+
+    Stock changes made by sales and restocks go through reserve and
+    adjust, which hold a per-product lock (striped over LOCK_STRIPES
+    locks) so sessions sharing a store cannot oversell. Until committed
+    to the journal such changes are tracked in pending, which lets the
+    committed state be recovered at any time.
+
+    Inventory totals and the low-stock index are kept in a
+    StockAggregates, built the first time they are asked for and then
+    updated by every stock change.
+    """
+
+    def __init__(self):
+        self.names = []
+        self.stock = array("q")
+        self.cost_price = array("q")
+        self.brand_codes = array("I")
+        self.country_codes = array("I")
+        self.brand_table = []
+        self.brand_index = {}
+        self.country_table = []
+        self.country_index = {}
+        self.locks = [threading.Lock() for _ in range(LOCK_STRIPES)]
+        self.pending = {}  # {product_id: uncommitted stock delta}
+        self.generation = 0  # Snapshot generation the store was loaded from
+        self.journal_offset = 0  # Bytes of that generation's journal applied
+        self.recovered = False  # Rebuilt from retained snapshots; the database needs rewriting
+        self.aggregates = None  # StockAggregates, built on first use
+        self.catalog_version = 0  # Changed whenever replace_with swaps in another catalog
+
+    @classmethod
+    def from_columns(cls, names, stock, cost_price, brand_codes, brand_table, country_codes, country_table):
+        """
+        Builds a store around existing columns without copying them.
+
+        The numeric columns may be arrays or memoryviews of the matching
+        type; a store built on memoryviews can be updated but not grown.
+
+        Args:
+            names (list): Product names, indexed by id.
+            stock (array): Stock column.
+            cost_price (array): Cost price column, in paisa.
+            brand_codes (array): Brand code column.
+            brand_table (list): Brand names, indexed by code.
+            country_codes (array): Country code column.
+            country_table (list): Country names, indexed by code.
+
+        Returns:
+            ProductStore: The new store.
+        """
+        store = cls()
+        store.names = names
+        store.stock = stock
+        store.cost_price = cost_price
+        store.brand_codes = brand_codes
+        store.country_codes = country_codes
+        store.brand_table = brand_table
+        store.brand_index = {brand: code for code, brand in enumerate(brand_table)}
+        store.country_table = country_table
+        store.country_index = {country: code for code, country in enumerate(country_table)}
+        return store
+
+    def __len__(self):
+        return len(self.stock)
+
+    def __getitem__(self, product_id):
+        if product_id < 0:
+            product_id += len(self.stock)
+        if not 0 <= product_id < len(self.stock):
+            raise IndexError("product id out of range")
+        return ProductRow(self, product_id)
+
+    def __iter__(self):
+        for product_id in range(len(self.stock)):
+            yield ProductRow(self, product_id)
+
+    @staticmethod
+    def intern_code(table, index, value):
+        """
+        Returns the code of a string in a lookup table, adding it if new.
+
+        Args:
+            table (list): Unique strings, indexed by code.
+            index (dict): Mapping from string to code.
+            value (str): The string to look up.
+
+        Returns:
+            int: The code of the string.
+        """
+        code = index.get(value)
+        if code is None:
+            code = len(table)
+            table.append(sys.intern(value))
+            index[value] = code
+        return code
+
+    def add(self, name, brand, stock, cost_price, country):
+        """
+        Appends a product to the store.
+
+        Args:
+            name (str): The product name.
+            brand (str): The brand name.
+            stock (int): The quantity in stock.
+            cost_price (int): The cost price of one item in paisa.
+            country (str): The country of origin.
+
+        Returns:
+            int: The id of the new product.
+        """
+        self.names.append(sys.intern(name))
+        self.brand_codes.append(self.intern_code(self.brand_table, self.brand_index, brand))
+        self.country_codes.append(self.intern_code(self.country_table, self.country_index, country))
+        self.stock.append(stock)
+        self.cost_price.append(cost_price)
+        if self.aggregates is not None:
+            self.aggregates.add_product(self, len(self.stock) - 1)
+        return len(self.stock) - 1
+
+    def extend(self, names, brands, stock, cost_price, countries):
+        """
+        Appends many products at once from parallel columns.
+
+        Args:
+            names (list): Product names.
+            brands (list): Brand names.
+            stock (array): Quantities in stock.
+            cost_price (array): Cost prices in paisa.
+            countries (list): Countries of origin.
+        """
+        intern = sys.intern
+        intern_code = self.intern_code
+        self.names.extend(map(intern, names))
+        self.brand_codes.extend(intern_code(self.brand_table, self.brand_index, brand) for brand in brands)
+        self.country_codes.extend(intern_code(self.country_table, self.country_index, country) for country in countries)
+        self.stock.extend(stock)
+        self.cost_price.extend(cost_price)
+        self.aggregates = None
+
+    def change_stock(self, product_id, delta):
+        """
+        Changes a product's stock, keeping the aggregates in step.
+
+        The caller holds the product's lock.
+
+        Args:
+            product_id (int): The id of the product.
+            delta (int): The change in stock.
+        """
+        old_stock = self.stock[product_id]
+        self.stock[product_id] = old_stock + delta
+        aggregates = self.aggregates
+        if aggregates is not None:
+            aggregates.update(self, product_id, old_stock, old_stock + delta)
+
+    def reserve(self, product_id, quantity):
+        """
+        Takes items out of stock if enough are available.
+
+        The check and the decrement happen under the product's lock, so two
+        sessions can never both take the last items.
+
+        Args:
+            product_id (int): The id of the product.
+            quantity (int): The number of items to take.
+
+        Returns:
+            bool: True if the items were taken, False if stock was short.
+        """
+        with self.locks[product_id % LOCK_STRIPES]:
+            if self.stock[product_id] < quantity:
+                return False
+            self.change_stock(product_id, -quantity)
+            self.pending[product_id] = self.pending.get(product_id, 0) - quantity
+            return True
+
+    def adjust(self, product_id, delta):
+        """
+        Changes the stock of a product by an uncommitted delta.
+
+        Args:
+            product_id (int): The id of the product.
+            delta (int): The change in stock.
+        """
+        with self.locks[product_id % LOCK_STRIPES]:
+            self.change_stock(product_id, delta)
+            self.pending[product_id] = self.pending.get(product_id, 0) + delta
+
+    def apply_committed(self, product_id, delta):
+        """
+        Applies a delta that another session already committed.
+
+        Args:
+            product_id (int): The id of the product.
+            delta (int): The change in stock.
+        """
+        with self.locks[product_id % LOCK_STRIPES]:
+            self.change_stock(product_id, delta)
+
+    def settle(self, changes, committed):
+        """
+        Settles uncommitted changes after a commit attempt.
+
+        Committed changes simply stop being pending; rejected ones are
+        taken back out of stock.
+
+        Args:
+            changes (list): (product_id, delta) pairs of the transaction.
+            committed (bool): Whether the transaction reached the journal.
+        """
+        for product_id, delta in changes:
+            with self.locks[product_id % LOCK_STRIPES]:
+                if not committed:
+                    self.change_stock(product_id, -delta)
+                remaining = self.pending.get(product_id, 0) - delta
+                if remaining:
+                    self.pending[product_id] = remaining
+                else:
+                    self.pending.pop(product_id, None)
+
+    def committed_stock(self):
+        """
+        Returns the stock column without uncommitted changes.
+
+        Returns:
+            array: A copy of the stock column as last committed.
+        """
+        stock = array("q", self.stock)
+        for product_id, delta in list(self.pending.items()):
+            stock[product_id] -= delta
+        return stock
+
+    def replace_with(self, other):
+        """
+        Takes over the columns of a freshly loaded store, keeping the
+        uncommitted changes of this one on top.
+
+        Args:
+            other (ProductStore): The store loaded from disk.
+        """
+        for product_id, delta in list(self.pending.items()):
+            other.stock[product_id] += delta
+        self.names = other.names
+        self.stock = other.stock
+        self.cost_price = other.cost_price
+        self.brand_codes = other.brand_codes
+        self.country_codes = other.country_codes
+        self.brand_table = other.brand_table
+        self.brand_index = other.brand_index
+        self.country_table = other.country_table
+        self.country_index = other.country_index
+        self.generation = other.generation
+        self.journal_offset = other.journal_offset
+        self.recovered = other.recovered
+        self.aggregates = None
+        self.catalog_version += 1
+
+    def inventory(self):
+        """
+        Returns the running inventory totals, building them on first use.
+
+        The first call scans the store with every product lock held, so no
+        stock change is missed while the totals are built.
+
+        Returns:
+            StockAggregates: The totals, kept up to date from now on.
+        """
+        aggregates = self.aggregates
+        if aggregates is None:
+            with self.all_locks():
+                if self.aggregates is None:
+                    self.aggregates = StockAggregates(self)
+                aggregates = self.aggregates
+        return aggregates
+
+    @contextlib.contextmanager
+    def all_locks(self):
+        """Holds every product lock, so no stock changes meanwhile."""
+        with contextlib.ExitStack() as stack:
+            for lock in self.locks:
+                stack.enter_context(lock)
+            yield
+
+    def grouped_inventory(self):
+        """
+        Returns the running inventory totals with the brand and country
+        values built.
+
+        Returns:
+            StockAggregates: The totals, kept up to date from now on.
+        """
+        aggregates = self.inventory()
+        if aggregates.brand_values is None:
+            with self.all_locks():
+                aggregates.group_values(self)
+        return aggregates
+
+    def total_stock(self):
+        """
+        Counts the items in stock across the catalog.
+
+        Returns:
+            int: The number of items in stock across the catalog.
+        """
+        return self.inventory().total_stock
+
+    def inventory_value(self):
+        """
+        Returns the value of the stock on hand at cost price.
+
+        Returns:
+            int: The sum of stock times cost price over all products, in paisa.
+        """
+        return self.inventory().total_value
+
+    def low_stock(self, limit=None):
+        """
+        Lists the products below LOW_STOCK_THRESHOLD, lowest stock first.
+
+        Args:
+            limit (int): The maximum number of products to return.
+
+        Returns:
+            list: (product_id, stock) pairs.
+        """
+        return self.inventory().lowest(limit)
+
+    def low_stock_count(self):
+        """
+        Counts the products below LOW_STOCK_THRESHOLD.
+
+        Returns:
+            int: The number of products due for reordering.
+        """
+        return self.inventory().low_stock_count()
+
+    def low_stock_mask(self, threshold):
+        """
+        Flags the products whose stock is below a threshold.
+
+        Args:
+            threshold (int): The reorder point.
+
+        Returns:
+            bytes: One byte per product, 1 where stock is below the threshold.
+        """
+        return bytes(map(threshold.__gt__, self.stock))
+
+    def low_stock_ids(self, threshold):
+        """
+        Lists the products whose stock is below a threshold.
+
+        Args:
+            threshold (int): The reorder point.
+
+        Returns:
+            list: The ids of products whose stock is below the threshold.
+        """
+        return [product_id for product_id, stock in enumerate(self.stock) if stock < threshold]
+
+    def value_by_brand(self):
+        """
+        Returns the inventory value of each brand.
+
+        Returns:
+            dict: Inventory value per brand name, in paisa.
+        """
+        aggregates = self.grouped_inventory()
+        with aggregates.lock:
+            return dict(zip(self.brand_table, aggregates.brand_values))
+
+    def value_by_country(self):
+        """
+        Returns the inventory value of each country of origin.
+
+        Returns:
+            dict: Inventory value per country of origin, in paisa.
+        """
+        aggregates = self.grouped_inventory()
+        with aggregates.lock:
+            return dict(zip(self.country_table, aggregates.country_values))
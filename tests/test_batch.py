@@ -0,0 +1,116 @@
+import batch
+import write
+from read import journal_name
+from repository import open_repository
+
+CATALOG = (
+    "Vitamin C Serum,Garnier,10,1000.0,France\n"
+    "Aloe Vera Gel,Himalaya,10,200.0,India\n"
+)
+ORDERS = (
+    "Asha,9800000001,0,3\n"
+    "Asha,9800000001,1,2\n"
+    "Bikash,9800000002,1,4\n"
+)
+
+def test_mid_file_failure_leaves_stock_unchanged(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    database_name = str(tmp_path / "products.txt")
+    (tmp_path / "products.txt").write_text(CATALOG)
+    (tmp_path / "orders.txt").write_text(ORDERS)
+
+    # Fail on the second line, after the first has reserved its stock
+    calls = []
+    sale_item = batch.sale_item
+    def failing_sale_item(*arguments):
+        calls.append(arguments)
+        if len(calls) == 2:
+            raise RuntimeError("bad record")
+        return sale_item(*arguments)
+    monkeypatch.setattr(batch, "sale_item", failing_sale_item)
+
+    repository = open_repository(database_name)
+    products = repository.load()
+    summary = batch.process_order_file(products, repository, str(tmp_path / "orders.txt"))
+
+    assert summary["orders"] == 0
+    assert summary["lines"] == 0
+    assert list(products.stock) == [10, 10]
+    assert not products.pending
+    assert list(open_repository(database_name).load().stock) == [10, 10]
+    assert not (tmp_path / "invoices").exists()
+
+def test_batch_sells_valid_lines_in_one_commit(tmp_path, monkeypatch):
+    database_name = str(tmp_path / "products.txt")
+    (tmp_path / "products.txt").write_text(CATALOG)
+    (tmp_path / "orders.txt").write_text(
+        ORDERS
+        + "Chitra,9800000003,0,9\n"  # 9 plus 3 free, only 6 left
+        + "Dev,98000x,0,1\n"
+        + "Dev,9800000004,Aloe Vera Gel,0\n"
+    )
+    writer = write.InvoiceWriter(str(tmp_path / "invoices"))
+    monkeypatch.setattr(write, "invoice_writer", writer)
+
+    rejected = []
+    repository = open_repository(database_name)
+    products = repository.load()
+    summary = batch.process_order_file(
+        products, repository, str(tmp_path / "orders.txt"),
+        on_reject=lambda line_number, line, reason: rejected.append((line_number, reason)),
+    )
+
+    # Twice the cost price, and one item free for every three bought
+    assert summary["orders"] == 2
+    assert summary["lines"] == 3
+    assert summary["grand_total"] == 3 * 200000 + 6 * 40000
+    assert rejected == [(4, "insufficient stock"), (5, "invalid phone number"), (6, "invalid quantity")]
+    assert list(products.stock) == [6, 3]
+    assert not products.pending
+
+    # One journal entry for the whole file
+    with open(journal_name(database_name, products.generation)) as file:
+        assert len(file.readlines()) == 1
+    assert list(open_repository(database_name).load().stock) == [6, 3]
+
+    writer.flush()
+    invoices = writer.invoices()
+    assert [invoices.get(invoice_id)["name"] for invoice_id in invoices.find()] == ["Asha", "Bikash"]
+    assert invoices.get(1)["total"] == 680000
+    assert writer.metrics()["written"] == 2
+
+def test_purchase_orders_restock_per_vendor(tmp_path, monkeypatch):
+    database_name = str(tmp_path / "products.txt")
+    (tmp_path / "products.txt").write_text(CATALOG)
+    (tmp_path / "purchases.txt").write_text(
+        "Nepal Traders,0,5\n"
+        "Nepal Traders,Aloe Vera Gel,2\n"
+        "Himal Supply,1,3\n"
+        "Nepal Traders,0,1\n"
+        "Nepal Traders,Face Wash,4\n"
+        ",1,2\n"
+    )
+    writer = write.InvoiceWriter(str(tmp_path / "invoices"))
+    monkeypatch.setattr(write, "invoice_writer", writer)
+
+    rejected = []
+    repository = open_repository(database_name)
+    products = repository.load()
+    summary = batch.process_purchase_order_file(
+        products, repository, str(tmp_path / "purchases.txt"),
+        on_reject=lambda line_number, line, reason: rejected.append((line_number, reason)),
+    )
+
+    assert summary["vendors"] == 2
+    assert summary["lines"] == 4
+    assert summary["grand_total_cost"] == 6 * 100000 + 5 * 20000
+    assert rejected == [(5, "unknown or ambiguous product"), (6, "missing vendor name")]
+    assert list(products.stock) == [16, 15]
+    assert list(open_repository(database_name).load().stock) == [16, 15]
+
+    # Repeated lines for a vendor's product are merged on one invoice
+    writer.flush()
+    invoices = writer.invoices()
+    assert invoices.find(vendor="nepal traders") == [1]
+    assert invoices.get(1)["total"] == 6 * 100000 + 2 * 20000
+    assert invoices.read(1).count("Vitamin C Serum") == 1
@@ -0,0 +1,62 @@
+import argparse
+import json
+import pytest
+from benchmarks import compare, suite
+from benchmarks.catalog import generate_catalog, generate_orders, parse_size
+from read import iter_product_chunks
+
+def test_parse_size():
+    assert parse_size("1000") == 1000
+    assert parse_size("10k") == 10000
+    assert parse_size(" 2M ") == 2000000
+    for text in ("", "0", "k", "1.5k", "-3", "10g"):
+        with pytest.raises(argparse.ArgumentTypeError):
+            parse_size(text)
+
+def test_generated_files_are_reproducible(tmp_path):
+    generate_catalog(str(tmp_path / "first.txt"), 250, seed=4)
+    generate_catalog(str(tmp_path / "second.txt"), 250, seed=4)
+    generate_catalog(str(tmp_path / "other.txt"), 250, seed=5)
+    assert (tmp_path / "first.txt").read_bytes() == (tmp_path / "second.txt").read_bytes()
+    assert (tmp_path / "first.txt").read_bytes() != (tmp_path / "other.txt").read_bytes()
+
+    # Every line is a valid product
+    errors = []
+    rows = [row for offset, rows in iter_product_chunks(str(tmp_path / "first.txt"),
+                                                        on_error=lambda *error: errors.append(error))
+            for row in rows]
+    assert len(rows) == 250 and not errors
+
+    generate_orders(str(tmp_path / "orders.txt"), 10, 250, lines_per_order=2)
+    lines = (tmp_path / "orders.txt").read_text().splitlines()
+    assert len(lines) == 20
+    assert all(0 <= int(line.split(",")[2]) < 250 for line in lines)
+
+def suite_results(**seconds):
+    return {
+        "environment": {"commit": "abc", "date": "2024-01-01"},
+        "results": [{"benchmark": name, "size": 1000, "metrics": {"total": {"min": value}}}
+                    for name, value in seconds.items()],
+    }
+
+def test_compare_flags_slowdowns_past_the_threshold(capsys):
+    baseline = suite_results(load=1.0, display=1.0, sell=1.0)
+    candidate = suite_results(load=1.05, display=1.2, restock=1.0)
+
+    assert compare.compare(baseline, candidate) == [("display", 1000, "total")]
+    assert compare.compare(baseline, candidate, threshold=0.01) == [("display", 1000, "total"),
+                                                                    ("load", 1000, "total")]
+    output = capsys.readouterr().out
+    assert "Only in baseline: sell 1000 total" in output
+    assert "Only in candidate: restock 1000 total" in output
+
+def test_suite_writes_results(tmp_path, capsys):
+    output = str(tmp_path / "results.json")
+    suite.run([200], ["load", "update", "display"], 1, output)
+
+    with open(output) as file:
+        results = json.load(file)
+    assert [result["benchmark"] for result in results["results"]] == ["load", "update", "display"]
+    assert all(result["size"] == 200 for result in results["results"])
+    assert results["repeat"] == 1
+    assert "python" in results["environment"]
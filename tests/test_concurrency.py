@@ -0,0 +1,47 @@
+import threading
+from read import load_data
+from store import ProductStore
+from write import export_database, record_transaction
+
+def run_threads(target, count):
+    threads = [threading.Thread(target=target) for _ in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+def test_threads_sharing_a_store_never_oversell():
+    products = ProductStore()
+    products.add("Vitamin C Serum", "Garnier", 100, 100000, "France")
+    sold = []
+
+    def sell():
+        for _ in range(50):
+            if products.reserve(0, 3):
+                sold.append(3)
+
+    run_threads(sell, 8)
+    assert sum(sold) == 99
+    assert products.stock[0] == 1
+    assert products.pending == {0: -99}
+
+def test_sessions_commit_only_the_stock_left(tmp_path):
+    database_name = str(tmp_path / "products.txt")
+    products = ProductStore()
+    products.add("Vitamin C Serum", "Garnier", 50, 100000, "France")
+    products.add("Aloe Vera Gel", "Himalaya", 10, 20000, "India")
+    export_database(products, database_name)
+    committed = []
+
+    # Every session works on its own store, as separate terminals do, and
+    # sells until it finds the first product sold out
+    def session():
+        products = load_data(database_name)
+        while products.reserve(0, 1):
+            products.adjust(1, 1)
+            if record_transaction(products, [(0, -1), (1, 1)], database_name, "sale"):
+                committed.append(1)
+
+    run_threads(session, 4)
+    assert len(committed) == 50
+    assert list(load_data(database_name).stock) == [0, 60]
@@ -0,0 +1,71 @@
+import time
+import instrumentation
+from instrumentation import Histogram, Instruments, SamplingProfiler
+
+def test_histogram_percentiles_within_a_bucket():
+    histogram = Histogram()
+    for microseconds in [3] * 90 + [100] * 9 + [5000]:
+        histogram.record(microseconds / 1e6)
+
+    summary = histogram.summary()
+    assert summary["count"] == 100
+    assert summary["p50"] == 4 / 1e6
+    assert summary["p90"] == 4 / 1e6
+    assert summary["p99"] == 128 / 1e6
+    # The top bucket is capped at the slowest call
+    assert histogram.percentile(1.0) == summary["max"] == 5000 / 1e6
+
+def test_off_by_default_costs_nothing(monkeypatch):
+    monkeypatch.setattr(instrumentation, "enabled", False)
+    monkeypatch.setattr(instrumentation, "instruments", Instruments())
+
+    def sell():
+        return "sold"
+    assert instrumentation.timed("sell")(sell) is sell
+    assert instrumentation.timing("sell") is instrumentation.NO_TIMER
+    instrumentation.count("sell.lines")
+    assert instrumentation.instruments.summary()["counters"] == {}
+
+def test_stages_and_counters_when_on(monkeypatch, capsys):
+    monkeypatch.setattr(instrumentation, "enabled", True)
+    monkeypatch.setattr(instrumentation, "instruments", Instruments())
+
+    @instrumentation.timed("sell")
+    def sell(quantity):
+        instrumentation.count("sell.lines", quantity)
+        return quantity * 2
+
+    assert sell(3) == 6
+    assert sell(4) == 8
+    with instrumentation.timing("persist.commit"):
+        pass
+
+    summary = instrumentation.instruments.summary()
+    assert summary["stages"]["sell"]["count"] == 2
+    assert summary["stages"]["persist.commit"]["count"] == 1
+    assert summary["counters"] == {"sell.lines": 7}
+
+    instrumentation.print_summary()
+    output = capsys.readouterr().out
+    assert "sell.lines: 7" in output
+    assert "persist.commit" in output
+    # Nothing new happened, so the summary is not shown twice
+    instrumentation.print_summary()
+    assert capsys.readouterr().out == ""
+
+def test_sampling_profiler_writes_collapsed_stacks(tmp_path):
+    def busy_loop():
+        end = time.perf_counter() + 0.2
+        while time.perf_counter() < end:
+            pass
+
+    profiler = SamplingProfiler(0.001)
+    profiler.start()
+    busy_loop()
+    profiler.stop(str(tmp_path / "samples.txt"))
+
+    lines = (tmp_path / "samples.txt").read_text().splitlines()
+    assert lines
+    assert any("busy_loop (test_instrumentation.py:" in line for line in lines)
+    stack, samples = lines[0].rsplit(" ", 1)
+    assert int(samples) > 0
@@ -0,0 +1,66 @@
+import datetime
+import pytest
+import invoices
+from invoices import InvoiceStore, parse_filters
+
+def invoice(kind, name, phone, date, text):
+    return {"kind": kind, "date": date, "name": name, "phone": phone, "total": 100, "text": text}
+
+def test_ids_follow_each_other_across_stores(tmp_path):
+    first = InvoiceStore(str(tmp_path))
+    second = InvoiceStore(str(tmp_path))
+
+    assert first.append([invoice("sale", "Asha", "98001", "2024-01-01 10:00:00", "one\n")]) == [1]
+    # The second store catches up on the index before taking ids
+    assert second.append([invoice("sale", "Bikash", "98002", "2024-01-02 10:00:00", "two\n"),
+                          invoice("purchase", "Nepal Traders", "", "2024-01-02 11:00:00", "three\n")]) == [2, 3]
+    assert first.read(3) == "three\n"
+    assert first.get(4) is None
+    assert InvoiceStore(str(tmp_path)).read(2) == "two\n"
+
+def test_find_combines_filters(tmp_path):
+    store = InvoiceStore(str(tmp_path))
+    store.append([
+        invoice("sale", "Asha", "98001", "2024-01-01 10:00:00", "one\n"),
+        invoice("sale", "Asha", "98009", "2024-01-02 10:00:00", "two\n"),
+        invoice("purchase", "Asha", "", "2024-01-02 12:00:00", "three\n"),
+        invoice("sale", "Bikash", "98002", "2024-01-03 09:00:00", "four\n"),
+    ])
+
+    assert store.find() == [1, 2, 3, 4]
+    assert store.find(customer=" ASHA ") == [1, 2]
+    assert store.find(vendor="asha") == [3]
+    assert store.find(customer="Asha", phone="98009") == [2]
+    assert store.find(start=datetime.date(2024, 1, 2)) == [2, 3, 4]
+    assert store.find(start=datetime.date(2024, 1, 2), end=datetime.date(2024, 1, 2)) == [2, 3]
+    assert store.find(customer="Asha", end=datetime.date(2024, 1, 1)) == [1]
+    assert store.find(customer="Chitra") == []
+
+def test_parse_filters():
+    assert parse_filters([("Customer", "Asha"), ("from", "01-02-2024"), ("to", "03-02-2024")]) == {
+        "customer": "Asha", "start": datetime.date(2024, 2, 1), "end": datetime.date(2024, 2, 3),
+    }
+    with pytest.raises(ValueError):
+        parse_filters([("total", "100")])
+    with pytest.raises(ValueError):
+        parse_filters([("from", "2024-02-01")])
+
+def test_segments_roll_over(tmp_path, monkeypatch):
+    monkeypatch.setattr(invoices, "SEGMENT_BYTES", 30)
+    store = InvoiceStore(str(tmp_path))
+    store.append([invoice("sale", f"Customer {i}", "98001", "2024-01-01 10:00:00", f"invoice text {i}\n")
+                  for i in range(5)])
+
+    assert [store.get(invoice_id)["segment"] for invoice_id in range(1, 6)] == [1, 1, 2, 2, 3]
+    assert [store.read(invoice_id) for invoice_id in range(1, 6)] == [f"invoice text {i}\n" for i in range(5)]
+
+def test_torn_index_line_is_dropped(tmp_path):
+    store = InvoiceStore(str(tmp_path))
+    store.append([invoice("sale", "Asha", "98001", "2024-01-01 10:00:00", "one\n")])
+    with open(store.index_name, "ab") as file:
+        file.write(b'{"id": 2, "kind": "sa')
+
+    reopened = InvoiceStore(str(tmp_path))
+    assert reopened.find() == [1]
+    assert reopened.append([invoice("sale", "Bikash", "98002", "2024-01-01 11:00:00", "two\n")]) == [2]
+    assert InvoiceStore(str(tmp_path)).read(2) == "two\n"
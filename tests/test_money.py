@@ -0,0 +1,38 @@
+import pytest
+from money import apply_rate, format_money, money_dot, parse_money, parse_rate, to_rupees
+
+def test_parse_money():
+    assert parse_money("1000") == 100000
+    assert parse_money("1000.0") == 100000
+    assert parse_money(" 99.95 ") == 9995
+    assert parse_money("0.5") == 50
+    assert parse_money("-12.34") == -1234
+    assert parse_money("+3.07") == 307
+    # Longer amounts are rounded half up to the paisa
+    assert parse_money("0.125") == 13
+    assert parse_money("0.124") == 12
+    assert parse_money("1e3") == 100000
+    for text in ("", "abc", "1,000", "nan", "inf", "1.2.3"):
+        with pytest.raises(ValueError):
+            parse_money(text)
+
+def test_format_money():
+    assert format_money(100000) == "1000.00"
+    assert format_money(9995) == "99.95"
+    assert format_money(7) == "0.07"
+    assert format_money(-1234) == "-12.34"
+    assert format_money(-5) == "-0.05"
+    assert all(parse_money(format_money(paisa)) == paisa for paisa in range(-1000, 1000, 7))
+
+def test_rates_are_exact():
+    assert parse_rate(1.1) * 3 == parse_rate("3.3")
+    assert apply_rate(100000, parse_rate(2)) == 200000
+    assert apply_rate(33333, parse_rate(1.5)) == 50000  # 49999.5 rounds up
+    assert apply_rate(10, parse_rate(0.15)) == 2  # 1.5 rounds up
+    assert apply_rate(10, parse_rate(0.14)) == 1
+
+def test_totals_and_json_amounts():
+    assert money_dot([3, 2, 1], [9995, 10, 1]) == 30006
+    assert money_dot([], []) == 0
+    assert to_rupees(9995) == 99.95
+    assert to_rupees(10) == 0.1
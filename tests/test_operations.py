@@ -0,0 +1,43 @@
+import operations
+from operations import display_products
+from store import ProductStore
+
+def make_store(size):
+    products = ProductStore()
+    for i in range(size):
+        products.add(f"Product {i}", "Garnier", 10, 10000, "France")
+    return products
+
+def shown_ids(output):
+    return [int(line.split()[0]) for line in output.splitlines() if line[:1].isdigit()]
+
+def test_display_shows_one_page(capsys):
+    products = make_store(45)
+
+    assert display_products(products, page=1, page_size=20) == 1
+    output = capsys.readouterr().out
+    assert shown_ids(output) == list(range(20, 40))
+    assert "Page 2 of 3 (45 products)" in output
+
+    # Pages past either end are clamped
+    assert display_products(products, page=7, page_size=20) == 2
+    assert shown_ids(capsys.readouterr().out) == list(range(40, 45))
+    assert display_products(products, [3, 9, 4], page=-1) == 0
+    output = capsys.readouterr().out
+    assert shown_ids(output) == [3, 9, 4]
+    assert "Page" not in output
+
+def test_rows_are_formatted_again_only_when_changed(capsys, monkeypatch):
+    products = make_store(3)
+    formatted = []
+    monkeypatch.setattr(operations, "count", formatted.append)
+
+    display_products(products)
+    display_products(products)
+    assert len(formatted) == 3
+
+    products.adjust(1, -4)
+    display_products(products)
+    assert len(formatted) == 4
+    assert "Product 1" in operations.format_product_row(products, 1)
+    assert " 6 " in operations.format_product_row(products, 1)
@@ -0,0 +1,100 @@
+import datetime
+import json
+import os
+import pytest
+import pricing
+from pricing import PriceTable, PricingEngine, parse_config
+from store import ProductStore
+
+def make_store():
+    products = ProductStore()
+    products.add("Vitamin C Serum", "Garnier", 10, 100000, "France")
+    products.add("Aloe Vera Gel", "Himalaya", 20, 20000, "India")
+    products.add("Micellar Water", "Garnier", 5, 33333, "France")
+    products.add("Face Wash", "Loreal", 5, 10000, "France")
+    return products
+
+def price_all(table, products, quantity):
+    return [table.price(product, quantity) for product in products]
+
+def test_default_rules_double_the_price_and_give_one_in_three():
+    products = make_store()
+    table = PriceTable(products, *parse_config(pricing.DEFAULT_RULES))
+
+    assert price_all(table, products, 2) == [(200000, 0), (40000, 0), (66666, 0), (20000, 0)]
+    assert table.price(products[0], 7) == (200000, 2)
+
+def test_most_specific_rule_wins():
+    products = make_store()
+    table = PriceTable(products, *parse_config({
+        "markup": 1.5,
+        "promotion": None,
+        "rules": [
+            {"country": "france", "markup": 1.2},
+            {"brand": "Garnier", "markup": 1.3, "promotion": {"buy": 2, "free": 1}},
+            {"brand": "garnier", "markup": 1.25},
+            {"product_id": 2, "markup": 3},
+        ],
+    }))
+
+    # Product, then brand (the later rule), then country, then the defaults
+    assert price_all(table, products, 2) == [(125000, 1), (30000, 0), (99999, 1), (12000, 0)]
+
+def test_discount_tiers_apply_from_their_quantity():
+    products = make_store()
+    table = PriceTable(products, *parse_config({
+        "markup": 2,
+        "promotion": None,
+        "discounts": [{"min_quantity": 10, "percent": 10}, {"min_quantity": 5, "percent": 5}],
+    }))
+
+    assert [table.price(products[2], quantity)[0] for quantity in (4, 5, 9, 10, 50)] == [
+        66666, 63333, 63333, 59999, 59999,
+    ]
+
+def test_rules_outside_their_days_are_ignored():
+    products = make_store()
+    today = datetime.date.today()
+    tomorrow = today + datetime.timedelta(days=1)
+    defaults, rules = parse_config({"rules": [
+        {"brand": "Himalaya", "markup": 3, "from": today.strftime("%d-%m-%Y"), "to": today.strftime("%d-%m-%Y")},
+        {"brand": "Loreal", "markup": 3, "from": tomorrow.strftime("%d-%m-%Y")},
+    ]})
+    table = PriceTable(products, defaults, rules)
+
+    assert table.price(products[1], 1)[0] == 60000
+    assert table.price(products[3], 1)[0] == 20000
+    # The table has to be compiled again when tomorrow starts
+    assert table.expires == datetime.datetime.combine(tomorrow, datetime.time()).timestamp()
+
+def test_malformed_rules_are_refused():
+    for config in (
+        {"markup": 0},
+        {"rules": [{"brand": "Garnier", "country": "France", "markup": 2}]},
+        {"rules": [{"product_id": "7", "markup": 2}]},
+        {"rules": [{"brand": "Garnier", "price": 2}]},
+        {"promotion": {"free": 1}},
+        {"discounts": [{"min_quantity": 5, "percent": 100}]},
+        {"rules": [{"brand": "Garnier", "from": "2024-01-01"}]},
+    ):
+        with pytest.raises(ValueError):
+            parse_config(config)
+
+def test_engine_reloads_a_changed_rules_file(tmp_path, monkeypatch, capsys):
+    monkeypatch.setattr(pricing, "RELOAD_INTERVAL", 0)
+    rules_file = tmp_path / "pricing.json"
+    rules_file.write_text(json.dumps({"markup": 3}))
+    products = make_store()
+    engine = PricingEngine(str(rules_file))
+    assert engine.table(products).price(products[1], 1) == (60000, 0)
+    assert engine.table(products) is engine.table(products)
+
+    rules_file.write_text(json.dumps({"markup": 4, "promotion": {"buy": 2}}))
+    os.utime(rules_file, ns=(0, 10 ** 9))
+    assert engine.table(products).price(products[1], 2) == (80000, 1)
+
+    # A file that stops parsing keeps the last good rules in force
+    rules_file.write_text("{")
+    os.utime(rules_file, ns=(0, 2 * 10 ** 9))
+    assert engine.table(products).price(products[1], 2) == (80000, 1)
+    assert "pricing rules not reloaded" in capsys.readouterr().out
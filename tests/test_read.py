@@ -0,0 +1,133 @@
+import os
+import pytest
+from read import (
+    CorruptSnapshotError, iter_product_chunks, load_binary_snapshot, load_csv_database, load_data, load_prefix,
+    parse_parallel, split_ranges,
+)
+from write import export_database, record_transaction
+from store import ProductStore
+
+def test_parse_cache_misses_damaged_body(tmp_path):
+    database_name = str(tmp_path / "products.txt")
+    products = ProductStore()
+    products.add("Vitamin C Serum", "Garnier", 10, 100000, "France")
+    products.add("Aloe Vera Gel", "Himalaya", 20, 20000, "India")
+    export_database(products, database_name)
+
+    # The first load parses the file and builds the cache
+    loaded, generation = load_csv_database(database_name)
+    assert list(loaded.stock) == [10, 20]
+    assert os.path.exists(database_name + ".cache")
+
+    # Flip one digit of the body, keeping the size and modification time
+    status = os.stat(database_name)
+    with open(database_name, "rb") as file:
+        data = file.read()
+    position = data.index(b",10,")
+    with open(database_name, "r+b") as file:
+        file.seek(position + 1)
+        file.write(b"9")
+    os.utime(database_name, ns=(status.st_atime_ns, status.st_mtime_ns))
+
+    with pytest.raises(CorruptSnapshotError):
+        load_csv_database(database_name)
+
+def test_product_chunks_are_bounded_and_skip_bad_lines(tmp_path):
+    database_name = str(tmp_path / "products.txt")
+    (tmp_path / "products.txt").write_text(
+        "Vitamin C Serum,Garnier,10,1000.0,France\n"
+        "Broken line\n"
+        "Aloe Vera Gel,Himalaya,20,200.0,India\n"
+        "\n"
+        "Micellar Water,Garnier,five,500.0,France\n"
+        "Face Wash,Himalaya,30,150.5,India\n"
+    )
+    errors = []
+    chunks = list(iter_product_chunks(database_name, chunk_size=2,
+                                      on_error=lambda offset, line, message: errors.append(line)))
+
+    assert [len(rows) for offset, rows in chunks] == [2, 1]
+    assert chunks[0][1][1] == (1, "Aloe Vera Gel", "Himalaya", 20, 20000, "India")
+    assert chunks[1][1][0][:2] == (2, "Face Wash")
+    assert errors == ["Broken line", "Micellar Water,Garnier,five,500.0,France"]
+
+    # A chunk's offset resumes the scan just after it
+    offset = chunks[0][0]
+    resumed = list(iter_product_chunks(database_name, on_error=lambda *error: None,
+                                       start_offset=offset, start_id=2))
+    assert [row[:2] for offset, rows in resumed for row in rows] == [(2, "Face Wash")]
+
+def test_load_prefix_replays_the_journal(tmp_path):
+    database_name = str(tmp_path / "products.txt")
+    products = ProductStore()
+    for i in range(5):
+        products.add(f"Product {i}", "Garnier", 10, 10000, "France")
+    export_database(products, database_name)
+    products = load_data(database_name)
+    assert products.reserve(1, 4)
+    assert products.reserve(3, 4)
+    assert record_transaction(products, [(1, -4), (3, -4)], database_name, "sale")
+
+    prefix = load_prefix(database_name, 2)
+    assert len(prefix) == 2
+    assert list(prefix.stock) == [10, 6]
+
+def test_binary_snapshot_round_trip(tmp_path):
+    database_name = str(tmp_path / "products.bin")
+    products = ProductStore()
+    products.add("Vitamin C Serum", "Garnier", 10, 100000, "France")
+    products.add("Aloe Vera Gel", "Himalaya", 20, 20000, "India")
+    export_database(products, database_name)
+
+    loaded, generation = load_binary_snapshot(database_name)
+    assert generation == 1
+    assert isinstance(loaded.stock, memoryview)
+    assert [product.to_dict() for product in loaded] == [product.to_dict() for product in products]
+
+    # Sales against a binary database go to the journal as for CSV
+    loaded = load_data(database_name)
+    assert loaded.reserve(1, 5)
+    assert record_transaction(loaded, [(1, -5)], database_name, "sale")
+    assert list(load_data(database_name).stock) == [10, 15]
+
+def test_binary_snapshot_rejects_damaged_body(tmp_path):
+    database_name = str(tmp_path / "products.bin")
+    products = ProductStore()
+    products.add("Vitamin C Serum", "Garnier", 10, 100000, "France")
+    export_database(products, database_name)
+
+    with open(database_name, "r+b") as file:
+        file.seek(-1, os.SEEK_END)
+        last = file.read(1)
+        file.seek(-1, os.SEEK_END)
+        file.write(bytes([last[0] ^ 1]))
+    with pytest.raises(CorruptSnapshotError):
+        load_binary_snapshot(database_name)
+
+    # Truncated snapshots are refused too, even unverified
+    with open(database_name, "r+b") as file:
+        file.truncate(os.path.getsize(database_name) - 20)
+    with pytest.raises(CorruptSnapshotError):
+        load_binary_snapshot(database_name, verify=False)
+
+def test_parallel_parse_matches_sequential(tmp_path):
+    database_name = str(tmp_path / "products.txt")
+    lines = [f"Product {i},Brand {i % 7},{i % 50},{i}.25,Country {i % 3}\n" for i in range(500)]
+    lines[123] = "Broken line\n"
+    (tmp_path / "products.txt").write_text("".join(lines))
+
+    errors = []
+    parallel = parse_parallel(database_name, workers=3,
+                              on_error=lambda offset, line, message: errors.append(line))
+    sequential = [row[1:] for offset, rows in iter_product_chunks(database_name, on_error=lambda *error: None)
+                  for row in rows]
+
+    assert errors == ["Broken line"]
+    assert len(parallel) == 499
+    assert [tuple(product[key] for key in ("name", "brand", "stock", "cost_price", "country"))
+            for product in parallel] == sequential
+
+    # The ranges cover the whole file, end to end
+    ranges = split_ranges(database_name, 3)
+    assert ranges[0][0] == 0 and ranges[-1][1] == os.path.getsize(database_name)
+    assert all(stop == start for (_, stop), (start, _) in zip(ranges, ranges[1:]))
@@ -0,0 +1,86 @@
+import math
+import time
+import pytest
+import sales
+from reorder import (
+    COVER_DAYS, LEAD_TIME_DAYS, SECONDS_PER_DAY, SalesVelocity, suggest_purchase_orders, write_purchase_order_file,
+)
+from sales import SalesLog
+from store import ProductStore
+
+def sale_line(product_id, quantity):
+    return {"product_id": product_id, "product_quantity": quantity, "free_items": 0,
+            "individual_item_price": 200, "cost_price": 100}
+
+def log_daily_sales(log, monkeypatch, days, lines):
+    now = time.time()
+    for day in range(days, 0, -1):
+        monkeypatch.setattr(sales.time, "time", lambda: now - (day - 1) * SECONDS_PER_DAY)
+        log.append(lines)
+    # sales.time is the time module itself, so put the clock back
+    monkeypatch.undo()
+
+def make_store():
+    products = ProductStore()
+    products.add("Vitamin C Serum", "Garnier", 20, 100000, "France")
+    products.add("Aloe Vera Gel", "Himalaya", 500, 20000, "India")
+    products.add("Micellar Water", "Garnier", 5, 50000, "France")
+    return products
+
+def test_steady_sales_converge_to_the_daily_rate(tmp_path, monkeypatch):
+    log = SalesLog(str(tmp_path / "sales"))
+    log_daily_sales(log, monkeypatch, 100, [sale_line(0, 10), sale_line(1, 2)])
+    velocity = SalesVelocity(log)
+
+    assert velocity.refresh(make_store()) == [0, 1]
+    assert velocity.rate(0) == pytest.approx(10, rel=0.05)
+    assert velocity.rate(1) == pytest.approx(2, rel=0.05)
+    assert velocity.rate(2) == 0.0
+
+def test_suggests_products_that_run_out_within_the_lead_time(tmp_path, monkeypatch):
+    log = SalesLog(str(tmp_path / "sales"))
+    log_daily_sales(log, monkeypatch, 100, [sale_line(0, 10), sale_line(1, 2)])
+    products = make_store()
+    velocity = SalesVelocity(log)
+
+    suggestions = velocity.suggestions(products)
+    assert [suggestion["product_id"] for suggestion in suggestions] == [0]
+    rate = suggestions[0]["daily_rate"]
+    assert suggestions[0]["days_left"] == pytest.approx(20 / rate)
+    assert suggestions[0]["quantity"] == math.ceil(rate * (LEAD_TIME_DAYS + COVER_DAYS)) - 20
+
+    # Restocking takes the product off the list
+    products.adjust(0, 500)
+    assert velocity.suggestions(products) == []
+
+def test_purchase_orders_group_by_brand_and_country(tmp_path, monkeypatch):
+    log = SalesLog(str(tmp_path / "sales"))
+    log_daily_sales(log, monkeypatch, 30, [sale_line(0, 10), sale_line(1, 100), sale_line(2, 1)])
+    products = make_store()
+    velocity = SalesVelocity(log)
+
+    orders = suggest_purchase_orders(products, velocity)
+    assert [(order["brand"], order["country"]) for order in orders] == [("Garnier", "France"), ("Himalaya", "India")]
+    assert [line["product_id"] for line in orders[0]["lines"]] == [0, 2]
+    assert orders[0]["total_cost"] == sum(
+        line["quantity"] * products[line["product_id"]]["cost_price"] for line in orders[0]["lines"]
+    )
+
+    orders_file = str(tmp_path / "purchases.txt")
+    write_purchase_order_file(orders, orders_file)
+    with open(orders_file) as file:
+        lines = [line.rstrip("\n") for line in file if not line.startswith("#")]
+    assert lines[0] == f"Garnier France,0,{orders[0]['lines'][0]['quantity']}"
+    assert len(lines) == 3
+
+def test_refresh_reads_only_new_sales(tmp_path):
+    log = SalesLog(str(tmp_path / "sales"))
+    products = make_store()
+    velocity = SalesVelocity(log)
+    log.append([sale_line(0, 1)])
+    assert velocity.refresh(products) == [0]
+    assert velocity.refresh(products) == []
+
+    log.append([sale_line(2, 3)])
+    assert velocity.refresh(products) == [2]
+    assert velocity.rate(2) > velocity.rate(0) > 0
@@ -0,0 +1,94 @@
+import sqlite3
+import pytest
+import repository
+from repository import open_repository
+from store import ProductStore
+
+def make_database(tmp_path):
+    database_name = str(tmp_path / "products.db")
+    products = ProductStore()
+    products.add("Vitamin C Serum", "Garnier", 10, 100000, "France")
+    products.add("Aloe Vera Gel", "Himalaya", 20, 20000, "India")
+    products.add("Micellar Water", "Garnier", 5, 50000, "France")
+    open_repository(database_name).import_products(products)
+    return database_name
+
+def transaction_count(database_name):
+    with sqlite3.connect(database_name) as connection:
+        return connection.execute("SELECT COUNT(*) FROM transactions").fetchone()[0]
+
+def test_commit_is_all_or_nothing(tmp_path):
+    database_name = make_database(tmp_path)
+    first = open_repository(database_name)
+    second = open_repository(database_name)
+    first_products = first.load()
+    second_products = second.load()
+
+    # Both sessions take stock out of the 5 left, the first commits first
+    assert second_products.reserve(0, 3)
+    assert second_products.reserve(2, 2)
+    assert first_products.reserve(2, 4)
+    assert first.commit(first_products, [(2, -4)], "sale")
+
+    # The second cart is rolled back as a whole
+    assert not second.commit(second_products, [(0, -3), (2, -2)], "sale")
+    assert not second_products.pending
+    assert [product["stock"] for product in second_products] == [10, 20, 1]
+    assert transaction_count(database_name) == 1
+
+def test_totals_follow_stock_changes(tmp_path):
+    database_name = make_database(tmp_path)
+    repo = open_repository(database_name)
+    products = repo.load()
+    assert products.total_stock() == 35
+    assert products.value_by_brand() == {"Garnier": 1250000, "Himalaya": 400000}
+
+    products.adjust(1, 5)
+    assert repo.commit(products, [(1, 5)], "restock")
+    assert products.total_stock() == 40
+    assert products.inventory_value() == 1750000
+    assert products.value_by_country()["India"] == 500000
+    assert products.low_stock() == [(2, 5)]
+
+def test_missing_totals_are_rebuilt_on_open(tmp_path):
+    database_name = make_database(tmp_path)
+    with sqlite3.connect(database_name) as connection:
+        connection.execute("DELETE FROM brand_totals")
+        connection.execute("DELETE FROM country_totals")
+
+    assert open_repository(database_name).load().value_by_brand() == {"Garnier": 1250000, "Himalaya": 400000}
+
+def test_failed_rebuild_releases_the_write_lock(tmp_path, monkeypatch):
+    database_name = make_database(tmp_path)
+    with sqlite3.connect(database_name) as connection:
+        connection.execute("DELETE FROM brand_totals")
+    monkeypatch.setattr(repository, "REBUILD_TOTALS", ("DELETE FROM no_such_table",))
+
+    with pytest.raises(sqlite3.OperationalError):
+        open_repository(database_name)
+    writer = sqlite3.connect(database_name, timeout=0.1, isolation_level=None)
+    writer.execute("BEGIN IMMEDIATE")
+    writer.execute("ROLLBACK")
+    writer.close()
+
+def test_open_does_not_wait_for_a_writer(tmp_path, monkeypatch):
+    database_name = make_database(tmp_path)
+    monkeypatch.setattr(repository, "SQLITE_TIMEOUT", 0.1)
+    writer = sqlite3.connect(database_name, isolation_level=None)
+    writer.execute("BEGIN IMMEDIATE")
+    try:
+        # The totals are there, so opening needs no write lock
+        assert len(open_repository(database_name).load()) == 3
+    finally:
+        writer.execute("ROLLBACK")
+        writer.close()
+
+def test_lookups_use_the_database(tmp_path):
+    database_name = make_database(tmp_path)
+    repo = open_repository(database_name)
+    index = repo.index(repo.load())
+
+    assert index.find("aloe vera gel", "HIMALAYA") == 1
+    assert index.with_brand("garnier") == [0, 2]
+    assert index.resolve("Mic") == [2]
+    assert index.resolve("100%") == []
@@ -0,0 +1,70 @@
+import datetime
+import pytest
+import analytics
+import sales
+from analytics import sales_summary
+from sales import SalesLog
+from store import ProductStore
+
+def sale_line(product_id, quantity, free_items, unit_price, cost_price):
+    return {"product_id": product_id, "product_quantity": quantity, "free_items": free_items,
+            "individual_item_price": unit_price, "cost_price": cost_price}
+
+def at_noon(day):
+    return datetime.datetime(2024, 1, day, 12).timestamp()
+
+def test_log_reads_a_range_of_days(tmp_path, monkeypatch):
+    log = SalesLog(str(tmp_path / "sales"))
+    for day in (1, 2, 2, 4):
+        monkeypatch.setattr(sales.time, "time", lambda: at_noon(day))
+        log.append([sale_line(day, 1, 0, 100, 50), sale_line(day, 2, 0, 100, 50)])
+
+    assert log.row_count() == 8
+    assert list(log.read()["product_id"]) == [1, 1, 2, 2, 2, 2, 4, 4]
+    assert list(log.read(start=datetime.date(2024, 1, 2))["product_id"]) == [2, 2, 2, 2, 4, 4]
+    assert list(log.read(end=datetime.date(2024, 1, 2))["product_id"]) == [1, 1, 2, 2, 2, 2]
+    assert list(log.read(datetime.date(2024, 1, 3), datetime.date(2024, 1, 3))["product_id"]) == []
+    assert list(log.read(datetime.date(2024, 1, 4))["quantity"]) == [1, 2]
+
+def test_log_drops_a_row_left_incomplete(tmp_path):
+    log = SalesLog(str(tmp_path / "sales"))
+    log.append([sale_line(0, 1, 0, 100, 50)])
+
+    # A crash after writing only some of the columns
+    with open(log.column_name("timestamp"), "ab") as file:
+        file.write(bytes(8))
+    assert log.row_count() == 1
+
+    log.append([sale_line(1, 3, 1, 200, 80)])
+    columns = log.read()
+    assert list(columns["product_id"]) == [0, 1]
+    assert list(columns["free_items"]) == [0, 1]
+
+@pytest.fixture(params=["numpy", "array"])
+def aggregation(request, monkeypatch):
+    if request.param == "numpy":
+        pytest.importorskip("numpy")
+    else:
+        monkeypatch.setattr(analytics, "numpy", None)
+
+def test_summary_totals_and_top_sellers(tmp_path, aggregation):
+    products = ProductStore()
+    products.add("Vitamin C Serum", "Garnier", 10, 50, "France")
+    products.add("Aloe Vera Gel", "Himalaya", 10, 20, "India")
+    products.add("Micellar Water", "Garnier", 10, 30, "France")
+    log = SalesLog(str(tmp_path / "sales"))
+    log.append([sale_line(0, 3, 1, 100, 50), sale_line(1, 2, 0, 40, 20)])
+    log.append([sale_line(2, 1, 0, 60, 30), sale_line(5, 1, 0, 10, 5)])
+
+    summary = sales_summary(log.read(), products, top=2)
+
+    assert summary["lines"] == 4
+    assert summary["items_sold"] == 7
+    assert summary["free_items"] == 1
+    assert summary["revenue"] == 300 + 80 + 60 + 10
+    assert summary["cost_of_sales"] == 150 + 40 + 30 + 5
+    assert summary["giveaway_cost"] == 50
+    assert summary["net_margin"] == 450 - 225 - 50
+    assert summary["top_products"] == [("Vitamin C Serum (Garnier)", 300), ("Aloe Vera Gel (Himalaya)", 80)]
+    assert summary["top_brands"] == [("Garnier", 360), ("Himalaya", 80)]
+    assert dict(summary["top_countries"]) == {"France": 360, "India": 80}
@@ -0,0 +1,51 @@
+from search import ProductIndex
+from store import ProductStore
+
+def make_store():
+    products = ProductStore()
+    products.add("Vitamin C Serum", "Garnier", 10, 100000, "France")
+    products.add("Aloe Vera Gel", "Himalaya", 20, 20000, "India")
+    products.add("Vitamin E Cream", "Himalaya", 5, 50000, "India")
+    products.add("Aloe Vera Gel", "Garnier", 8, 30000, "France")
+    return products
+
+def test_lookups_by_name_brand_and_country():
+    index = ProductIndex(make_store())
+
+    assert index.find(" aloe vera gel ", "GARNIER") == 3
+    assert index.find("Aloe Vera Gel", "Loreal") is None
+    assert index.with_name("Aloe Vera Gel") == [1, 3]
+    assert index.with_brand("himalaya") == [1, 2]
+    assert index.from_country("France") == [0, 3]
+    assert index.with_prefix("vit") == [0, 2]
+    assert index.containing("era") == [1, 3]
+    assert index.containing("ream") == [2]
+
+def test_resolve_tries_id_pair_name_then_part():
+    index = ProductIndex(make_store())
+
+    assert index.resolve("2") == [2]
+    assert index.resolve("9") == []
+    assert index.resolve("Aloe Vera Gel,Himalaya") == [1]
+    assert index.resolve("Aloe Vera Gel") == [1, 3]
+    assert index.resolve("Vitamin") == [0, 2]
+    assert index.resolve("C Ser") == [0]
+    assert index.resolve("Shampoo") == []
+
+def test_indexes_are_rebuilt_for_a_new_catalog():
+    products = make_store()
+    index = ProductIndex(products)
+    assert index.with_name("Shampoo") == []
+    assert index.containing("serum") == [0]
+
+    # Stock changes leave the indexes as they are
+    products.adjust(0, 5)
+    assert index.version == products.catalog_version
+
+    loaded = make_store()
+    loaded.add("Herbal Shampoo", "Himalaya", 12, 25000, "India")
+    products.replace_with(loaded)
+
+    assert index.with_name("herbal shampoo") == [4]
+    assert index.containing("shampoo") == [4]
+    assert index.version == products.catalog_version
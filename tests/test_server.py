@@ -0,0 +1,98 @@
+import asyncio
+import json
+import server
+import write
+from repository import open_repository
+
+CATALOG = (
+    "Vitamin C Serum,Garnier,10,1000.0,France\n"
+    "Aloe Vera Gel,Himalaya,10,200.0,India\n"
+)
+
+async def request(port, method, target, payload=None):
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    body = b"" if payload is None else json.dumps(payload).encode()
+    writer.write(
+        f"{method} {target} HTTP/1.1\r\nContent-Length: {len(body)}\r\nConnection: close\r\n\r\n".encode()
+        + body
+    )
+    await writer.drain()
+    response = await reader.read()
+    writer.close()
+    head, _, body = response.partition(b"\r\n\r\n")
+    return int(head.split()[1]), json.loads(body)
+
+def run_requests(tmp_path, monkeypatch, requests):
+    (tmp_path / "products.txt").write_text(CATALOG)
+    writer = write.InvoiceWriter(str(tmp_path / "invoices"))
+    monkeypatch.setattr(write, "invoice_writer", writer)
+    monkeypatch.setattr(server, "invoice_writer", writer)
+    repository = open_repository(str(tmp_path / "products.txt"))
+    inventory = server.InventoryServer(repository.load(), repository)
+
+    async def main():
+        listener = await asyncio.start_server(inventory.handle_connection, "127.0.0.1", 0)
+        port = listener.sockets[0].getsockname()[1]
+        async with listener:
+            responses = []
+            for method, target, payload in requests:
+                if target.startswith("/invoices"):
+                    writer.flush()
+                responses.append(await request(port, method, target, payload))
+            return responses
+
+    return asyncio.run(main())
+
+def test_sell_then_read_back(tmp_path, monkeypatch):
+    responses = run_requests(tmp_path, monkeypatch, [
+        ("POST", "/sell", {"customer_name": "Asha", "phone_number": "9800000001",
+                           "items": [{"product": "0", "quantity": 3}, {"product": "Aloe Vera Gel", "quantity": 1}]}),
+        ("GET", "/products/0", None),
+        ("GET", "/products?page=0&page_size=1", None),
+        ("GET", "/search?brand=himalaya", None),
+        ("GET", "/invoices?customer=asha", None),
+        ("GET", "/invoices/1", None),
+        ("GET", "/metrics", None),
+    ])
+    sale, product, page, search, invoices, invoice, metrics = responses
+
+    assert sale[0] == 200
+    assert sale[1]["grand_total"] == 6400.0
+    assert [item["total_quantity"] for item in sale[1]["items"]] == [4, 1]
+    assert product == (200, {"id": 0, "name": "Vitamin C Serum", "brand": "Garnier",
+                             "stock": 6, "cost_price": 1000.0, "country": "France"})
+    assert page[1]["total"] == 2 and len(page[1]["products"]) == 1
+    assert [found["id"] for found in search[1]["products"]] == [1]
+    assert invoices[1]["total"] == 1
+    assert invoice[1]["total"] == 6400.0
+    assert "Customer Name: Asha" in invoice[1]["text"]
+    assert metrics[1]["invoice_writer"]["written"] == 1
+
+def test_restock_commits(tmp_path, monkeypatch):
+    restock, product = run_requests(tmp_path, monkeypatch, [
+        ("POST", "/restock", {"vendor_name": "Nepal Traders", "items": [{"product": 1, "quantity": 5}]}),
+        ("GET", "/products/1", None),
+    ])
+    assert restock == (200, {"items": [{"name": "Aloe Vera Gel", "brand": "Himalaya", "product_quantity": 5,
+                                        "cost_price": 200.0, "total_item_cost": 1000.0}],
+                             "grand_total_cost": 1000.0})
+    assert product[1]["stock"] == 15
+    assert list(open_repository(str(tmp_path / "products.txt")).load().stock) == [10, 15]
+
+def test_bad_requests_are_refused(tmp_path, monkeypatch):
+    cart = {"customer_name": "Asha", "phone_number": "9800000001"}
+    responses = run_requests(tmp_path, monkeypatch, [
+        ("POST", "/sell", dict(cart, items=[{"product": 0, "quantity": True}])),
+        ("POST", "/sell", dict(cart, items=[{"product": 0, "quantity": "2"}])),
+        ("POST", "/sell", dict(cart, items=[{"product": "Face Wash", "quantity": 1}])),
+        ("POST", "/sell", dict(cart, items=[{"product": 1, "quantity": 2}, {"product": 0, "quantity": 9}])),
+        ("POST", "/sell", dict(cart, phone_number="none", items=[{"product": 0, "quantity": 1}])),
+        ("GET", "/sell", None),
+        ("GET", "/products/7", None),
+        ("GET", "/nowhere", None),
+        ("GET", "/products/1", None),
+    ])
+    assert [status for status, body in responses] == [400, 400, 404, 409, 400, 405, 404, 404, 200]
+
+    # The refused cart put back the stock its first line took
+    assert responses[-1][1]["stock"] == 10
@@ -0,0 +1,53 @@
+import os
+import subprocess
+import sys
+import read
+from read import load_data
+from search import ProductIndex
+from store import ProductStore
+from write import export_database, record_transaction, update_database
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def test_importing_main_loads_no_command_modules():
+    loaded = subprocess.run(
+        [sys.executable, "-c", "import sys, main; print(' '.join(sorted(sys.modules)))"],
+        cwd=ROOT, capture_output=True, text=True, check=True,
+    ).stdout.split()
+    heavy = {"read", "write", "store", "operations", "repository", "server", "pricing", "sqlite3", "asyncio"}
+    assert heavy.isdisjoint(loaded)
+
+def test_later_loads_come_from_the_parse_cache(tmp_path, monkeypatch):
+    database_name = str(tmp_path / "products.txt")
+    products = ProductStore()
+    products.add("Vitamin C Serum", "Garnier", 10, 100000, "France")
+    products.add("Aloe Vera Gel", "Himalaya", 20, 20000, "India")
+    export_database(products, database_name)
+    assert os.path.exists(database_name + ".cache")
+
+    def parse(*arguments):
+        raise AssertionError("the snapshot was parsed")
+    monkeypatch.setattr(read, "load_csv_snapshot", parse)
+
+    products = load_data(database_name)
+    assert list(products.stock) == [10, 20]
+
+    # A compaction writes the cache of the new snapshot along with it
+    assert products.reserve(0, 4)
+    assert record_transaction(products, [(0, -4)], database_name, "sale")
+    update_database(products, database_name)
+    products = load_data(database_name)
+    assert list(products.stock) == [6, 20]
+    assert products[1].to_dict()["name"] == "Aloe Vera Gel"
+
+def test_indexes_wait_for_the_first_lookup():
+    products = ProductStore()
+    products.add("Vitamin C Serum", "Garnier", 10, 100000, "France")
+    index = ProductIndex(products)
+    assert index.version is None
+
+    assert index.resolve("0") == [0]
+    assert index.version is None
+    assert index.resolve("Vitamin") == [0]
+    assert index.version == products.catalog_version
+    assert index.trigrams is None
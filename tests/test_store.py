@@ -0,0 +1,103 @@
+import pytest
+from store import ProductStore
+
+def make_store():
+    products = ProductStore()
+    products.add("Vitamin C Serum", "Garnier", 10, 100000, "France")
+    products.add("Aloe Vera Gel", "Himalaya", 20, 20000, "India")
+    products.add("Micellar Water", "Garnier", 5, 50000, "France")
+    return products
+
+def test_rows_read_and_write_the_columns():
+    products = make_store()
+
+    assert len(products) == 3
+    assert products[1].to_dict() == {
+        "id": 1, "name": "Aloe Vera Gel", "brand": "Himalaya",
+        "stock": 20, "cost_price": 20000, "country": "India",
+    }
+    assert products[-1]["name"] == "Micellar Water"
+    assert [product["id"] for product in products] == [0, 1, 2]
+
+    # Brands and countries are shared codes into small tables
+    assert products.brand_table == ["Garnier", "Himalaya"]
+    assert list(products.brand_codes) == [0, 1, 0]
+
+    products[2]["stock"] = 7
+    products[2]["brand"] = "Loreal"
+    assert products.stock[2] == 7
+    assert products[2]["brand"] == "Loreal"
+    assert products.brand_table == ["Garnier", "Himalaya", "Loreal"]
+
+    with pytest.raises(KeyError):
+        products[0]["price"]
+    with pytest.raises(IndexError):
+        products[3]
+
+def test_reserve_refuses_short_stock():
+    products = make_store()
+
+    assert products.reserve(0, 4)
+    assert not products.reserve(0, 7)
+    assert products.stock[0] == 6
+    assert products.pending == {0: -4}
+
+def test_settle_keeps_or_undoes_pending_changes():
+    products = make_store()
+    assert products.reserve(0, 4)
+    products.adjust(1, 5)
+    assert list(products.committed_stock()) == [10, 20, 5]
+
+    products.settle([(0, -4)], True)
+    products.settle([(1, 5)], False)
+
+    assert list(products.stock) == [6, 20, 5]
+    assert not products.pending
+    assert list(products.committed_stock()) == [6, 20, 5]
+
+def test_replace_with_keeps_uncommitted_changes():
+    products = make_store()
+    assert products.reserve(1, 2)
+    loaded = make_store()
+    loaded.stock[1] = 15
+    loaded.generation = 4
+
+    products.replace_with(loaded)
+
+    assert list(products.stock) == [10, 13, 5]
+    assert products.pending == {1: -2}
+    assert products.generation == 4
+    assert products.catalog_version == 1
+
+def test_aggregates_follow_stock_changes():
+    products = make_store()
+    assert products.total_stock() == 35
+    assert products.inventory_value() == 10 * 100000 + 20 * 20000 + 5 * 50000
+    assert products.low_stock() == [(2, 5)]
+    assert products.value_by_brand() == {"Garnier": 1250000, "Himalaya": 400000}
+
+    # Every change from here on updates the totals instead of a scan
+    assert products.reserve(0, 4)
+    products.adjust(2, 6)
+    products[1]["stock"] = 3
+    products.add("Face Wash", "Loreal", 0, 15000, "France")
+
+    assert products.total_stock() == 6 + 3 + 11
+    assert products.inventory_value() == 6 * 100000 + 3 * 20000 + 11 * 50000
+    assert products.low_stock() == [(3, 0), (1, 3), (0, 6)]
+    assert products.low_stock(2) == [(3, 0), (1, 3)]
+    assert products.low_stock_count() == 3
+    assert products.value_by_brand() == {"Garnier": 1150000, "Himalaya": 60000, "Loreal": 0}
+    assert products.value_by_country() == {"France": 1150000, "India": 60000}
+
+    # Matches a fresh scan
+    assert products.low_stock_ids(10) == [0, 1, 3]
+    products.aggregates = None
+    assert products.inventory_value() == 1210000
+    assert products.low_stock() == [(3, 0), (1, 3), (0, 6)]
+
+def test_changing_a_price_starts_the_totals_afresh():
+    products = make_store()
+    assert products.inventory_value() == 1650000
+    products[1]["cost_price"] = 10000
+    assert products.inventory_value() == 1450000
@@ -0,0 +1,184 @@
+import write
+from read import journal_name, load_data, read_generation, retained_generations
+from store import ProductStore
+from write import export_database, record_transaction, rollback_database, update_database
+
+def make_database(tmp_path, stock=(10, 20)):
+    database_name = str(tmp_path / "products.txt")
+    products = ProductStore()
+    for i, quantity in enumerate(stock):
+        products.add(f"Product {i}", "Garnier", quantity, 10000, "France")
+    export_database(products, database_name)
+    return database_name
+
+def test_commit_appends_one_journal_line(tmp_path):
+    database_name = make_database(tmp_path)
+    products = load_data(database_name)
+    with open(database_name, "rb") as file:
+        snapshot = file.read()
+
+    assert products.reserve(0, 3)
+    products.adjust(1, 5)
+    assert record_transaction(products, [(0, -3), (1, 5)], database_name, "sale")
+
+    # The snapshot is untouched; the transaction is a single journal line
+    with open(database_name, "rb") as file:
+        assert file.read() == snapshot
+    with open(journal_name(database_name, products.generation)) as file:
+        lines = file.readlines()
+    assert len(lines) == 1
+    assert lines[0].rstrip().endswith(",sale,0:-3 1:5")
+    assert not products.pending
+    assert list(load_data(database_name).stock) == [7, 25]
+
+def test_commit_cancelled_when_another_session_sold_the_stock(tmp_path):
+    database_name = make_database(tmp_path)
+    first = load_data(database_name)
+    second = load_data(database_name)
+
+    assert first.reserve(0, 8)
+    assert record_transaction(first, [(0, -8)], database_name, "sale")
+
+    # The second session still sees 10 items, but only 2 are left
+    assert second.reserve(0, 5)
+    assert not record_transaction(second, [(0, -5)], database_name, "sale")
+    assert second.stock[0] == 2
+    assert not second.pending
+    assert list(load_data(database_name).stock) == [2, 20]
+
+def test_torn_journal_entry_is_ignored_and_discarded(tmp_path):
+    database_name = make_database(tmp_path)
+    products = load_data(database_name)
+    with open(journal_name(database_name, products.generation), "ab") as file:
+        file.write(b"2024-01-01T00:00:00,sale,0:-1\n2024-01-01T00:00:01,sale,1:-")
+
+    # Only the complete entry is replayed
+    products = load_data(database_name)
+    assert list(products.stock) == [9, 20]
+
+    # The next commit cuts the torn entry off before appending
+    assert products.reserve(1, 4)
+    assert record_transaction(products, [(1, -4)], database_name, "sale")
+    with open(journal_name(database_name, products.generation), "rb") as file:
+        assert file.read().count(b"\n") == 2
+    assert list(load_data(database_name).stock) == [9, 16]
+
+def test_large_journal_is_compacted_into_a_snapshot(tmp_path, monkeypatch):
+    monkeypatch.setattr(write, "JOURNAL_COMPACT_BYTES", 1)
+    monkeypatch.setattr(write, "JOURNAL_COMPACT_RATIO", 1000)
+    database_name = make_database(tmp_path)
+    products = load_data(database_name)
+    generation = products.generation
+
+    assert products.reserve(0, 1)
+    assert record_transaction(products, [(0, -1)], database_name, "sale")
+
+    assert products.generation == generation + 1
+    assert products.journal_offset == 0
+    assert read_generation(database_name) == generation + 1
+    reloaded = load_data(database_name)
+    assert list(reloaded.stock) == [9, 20]
+    assert reloaded.journal_offset == 0
+
+def test_journal_small_next_to_the_snapshot_is_not_compacted(tmp_path, monkeypatch):
+    monkeypatch.setattr(write, "JOURNAL_COMPACT_BYTES", 1)
+    database_name = make_database(tmp_path, stock=range(1000))
+    products = load_data(database_name)
+    generation = products.generation
+
+    assert products.reserve(5, 1)
+    assert record_transaction(products, [(5, -1)], database_name, "sale")
+
+    assert products.generation == generation
+    assert products.journal_offset > 0
+    assert load_data(database_name).stock[5] == 4
+
+def make_invoice(name, total=100):
+    return {"kind": "sale", "date": "2024-01-01 10:00:00", "name": name, "phone": "9800000001",
+            "total": total, "text": f"INVOICE for {name}\n"}
+
+def test_invoice_writer_stores_everything_submitted(tmp_path):
+    writer = write.InvoiceWriter(str(tmp_path / "invoices"), max_pending_bytes=1)
+
+    # The queue holds one invoice at a time, so the producer has to wait
+    writer.submit_all([make_invoice(f"Customer {i}") for i in range(10)])
+    writer.submit(make_invoice("Customer 10"))
+    writer.flush()
+
+    metrics = writer.metrics()
+    assert metrics["submitted"] == metrics["written"] == 11
+    assert metrics["producer_waits"] > 0
+    assert metrics["queued"] == metrics["queued_bytes"] == 0
+    store = writer.invoices()
+    assert [store.get(invoice_id)["name"] for invoice_id in store.find()] == [f"Customer {i}" for i in range(11)]
+    assert store.read(11) == "INVOICE for Customer 10\n"
+
+def test_invoice_writer_survives_a_bad_record(tmp_path, capsys):
+    writer = write.InvoiceWriter(str(tmp_path / "invoices"))
+    bad = make_invoice("Asha")
+    del bad["phone"]
+
+    writer.submit(bad)
+    writer.flush()
+    writer.submit(make_invoice("Bikash"))
+    writer.flush()
+
+    metrics = writer.metrics()
+    assert metrics["errors"] == 1
+    assert metrics["written"] == 1
+    assert "Error saving invoices" in capsys.readouterr().out
+    assert writer.invoices().get(1)["name"] == "Bikash"
+
+def sell(database_name, product_id, quantity):
+    products = load_data(database_name)
+    assert products.reserve(product_id, quantity)
+    assert record_transaction(products, [(product_id, -quantity)], database_name, "sale")
+    return products
+
+def test_snapshots_are_retained_and_pruned(tmp_path):
+    database_name = make_database(tmp_path)
+    for generation in range(1, 6):
+        update_database(sell(database_name, 0, 1), database_name)
+
+    assert read_generation(database_name) == 6
+    assert retained_generations(database_name) == [3, 4, 5]
+    assert sorted(path.name for path in tmp_path.glob("products.txt.journal.*")) == [
+        "products.txt.journal.3", "products.txt.journal.4", "products.txt.journal.5",
+    ]
+    assert list(load_data(database_name).stock) == [5, 20]
+
+def test_rollback_restores_a_retained_snapshot(tmp_path):
+    database_name = make_database(tmp_path)
+    update_database(sell(database_name, 0, 4), database_name)
+    sell(database_name, 1, 5)
+
+    # Generation 1 is the catalog before any sale
+    generation = rollback_database(database_name, 1)
+    assert list(load_data(database_name).stock) == [10, 20]
+
+    # The state before the rollback was retained, so it can be undone
+    rollback_database(database_name, generation - 1)
+    assert list(load_data(database_name).stock) == [6, 15]
+
+def test_damaged_snapshot_is_recovered_from_retained_ones(tmp_path, capsys):
+    database_name = make_database(tmp_path)
+    update_database(sell(database_name, 0, 2), database_name)
+    sell(database_name, 1, 3)
+
+    # Flip a digit of the stock of product 1 in the current snapshot
+    with open(database_name, "rb") as file:
+        data = file.read()
+    with open(database_name, "wb") as file:
+        file.write(data.replace(b",20,", b",21,"))
+
+    products = load_data(database_name)
+    assert list(products.stock) == [8, 17]
+    assert products.recovered
+    assert "Recovered" in capsys.readouterr().out
+
+    # The next compaction rewrites the database and keeps the damaged file aside
+    update_database(products, database_name)
+    assert (tmp_path / "products.txt.damaged").read_bytes() == data.replace(b",20,", b",21,")
+    reloaded = load_data(database_name)
+    assert list(reloaded.stock) == [8, 17]
+    assert not reloaded.recovered
@@ -1,206 +1,831 @@
-import datetime
-
-def update_database(products, database_name):
-    """
-    Updates the product database file with current product information.
-
-    Args:
-        products (list): The current product list.
-        database_name (str): The name of the product database file.
-    """
-    try:
-        # Open file and write updated product information
-        with open(database_name, "w") as file:
-            for product in products:
-                # Format each product as CSV line
-                file.write(
-                    product["name"]
-                    + ","
-                    + product["brand"]
-                    + ","
-                    + str(product["stock"])
-                    + ","
-                    + str(product["cost_price"])
-                    + ","
-                    + product["country"]
-                )
-                file.write("\n")
-    except IOError as e:
-        # Handle file writing errors
-        print(f"Error updating database: {e}")
-    except Exception as e:
-        # Catch all other exceptions
-        print(f"An unexpected error occurred while updating database: {e}")
-
-def generate_invoice(customer_name, phone_number, item_selling, grand_total):
-    """
-    Generates and saves a customer invoice.
-
-    Args:
-        customer_name (str): The name of the customer.
-        phone_number (str): The phone number of the customer.
-        item_selling (list): List of items sold.
-        grand_total (float): The total amount.
-    """
-    try:
-        # Get current date and time for invoice
-        date = datetime.datetime.now()
-        today_date = date.strftime("%d-%m-%Y")
-        time_now = date.strftime("%H:%M")
-        
-        # Create unique filename for invoice
-        filename = f"invoice-{today_date}-{time_now.replace(':', '-')}-{customer_name}"
-        
-        # Define format strings for table alignment
-        header_format = "{:<5} {:<25} {:<25} {:<15} {:<15} {:<15}"
-        item_format = "{:<5} {:<25} {:<25} {:<15} {:<15.2f} {:<15.2f}"
-        
-        try:
-            # Write invoice to file
-            with open(filename, "w") as file:
-                # Write invoice header
-                file.write("INVOICE\n")
-                file.write("-" * 100 + "\n")
-                file.write(f"Customer Name: {customer_name}\n")
-                file.write(f"Phone Number: {phone_number}\n")
-                file.write(f"Date: {time_now}, {today_date}\n")
-                file.write("-" * 100 + "\n")
-                
-                # Write table header
-                file.write(header_format.format("S.N", "Name", "Brand Name", "Total quantity", "Rate", "Total per item"))
-                file.write("\n" + "-" * 100 + "\n")
-                
-                # Write each item with formatting
-                for i, item in enumerate(item_selling, 1):
-                    file.write(item_format.format(
-                        i,
-                        item["name"],
-                        item["brand"],
-                        item["total_quantity"],
-                        item["individual_item_price"],
-                        item["total_item_price"]
-                    ))
-                    file.write("\n")
-                    
-                # Write total amount
-                file.write("-" * 100 + "\n")
-                file.write(f"Grand Total: {grand_total:.2f}\n")
-        except IOError as e:
-            # Handle file writing errors
-            print(f"Error saving invoice to file: {e}")
-
-        # Display invoice on screen
-        print("\n" + "-" * 100)
-        print("INVOICE")
-        print("-" * 100)
-        print(f"Customer Name: {customer_name}")
-        print(f"Phone Number: {phone_number}")
-        print(f"Date: {time_now}, {today_date}")
-        print("-" * 100)
-        
-        print(header_format.format("S.N", "Name", "Brand Name", "Total quantity", "Rate", "Total per item"))
-        print("-" * 100)
-        
-        for i, item in enumerate(item_selling, 1):
-            print(item_format.format(
-                i,
-                item["name"],
-                item["brand"],
-                item["total_quantity"],
-                item["individual_item_price"],
-                item["total_item_price"]
-            ))
-        
-        print("-" * 100)
-        print(f"Grand Total: {grand_total:.2f}")
-        print("-" * 100)
-        print("\nPROCESS COMPLETE")
-        print("-" * 100)
-        print("\n")
-    except Exception as e:
-        # Catch all other exceptions
-        print(f"Error generating invoice: {e}")
-
-def generate_purchase_invoice(vendor_name, restock_items, grand_total_cost):
-    """
-    Generates and saves a vendor purchase invoice.
-
-    Args:
-        vendor_name (str): The name of the vendor.
-        restock_items (list): List of items purchased.
-        grand_total_cost (float): The total cost amount.
-    """
-    try:
-        # Get current date and time for invoice
-        date = datetime.datetime.now()
-        today_date = date.strftime("%d-%m-%Y")
-        time_now = date.strftime("%H:%M")
-        
-        # Create unique filename for invoice
-        filename = f"invoice-{today_date}-{time_now.replace(':', '-')}-{vendor_name}"
-        
-        # Define format strings for table alignment
-        header_format = "{:<5} {:<25} {:<25} {:<15} {:<15} {:<15}"
-        item_format = "{:<5} {:<25} {:<25} {:<15} {:<15.2f} {:<15.2f}"
-        
-        try:
-            # Write invoice to file
-            with open(filename, "w") as file:
-                # Write invoice header
-                file.write("INVOICE\n")
-                file.write("-" * 100 + "\n")
-                file.write(f"Vendor Name: {vendor_name}\n")
-                file.write(f"Date: {time_now}, {today_date}\n")
-                file.write("-" * 100 + "\n")
-                
-                # Write table header
-                file.write(header_format.format("S.N", "Name", "Brand Name", "Total quantity", "Rate", "Total per item"))
-                file.write("\n" + "-" * 100 + "\n")
-                
-                # Write each item with formatting
-                for i, item in enumerate(restock_items, 1):
-                    file.write(item_format.format(
-                        i,
-                        item["name"],
-                        item["brand"],
-                        item["product_quantity"],
-                        item["cost_price"],
-                        item["total_item_cost"]
-                    ))
-                    file.write("\n")
-                    
-                # Write total amount
-                file.write("-" * 100 + "\n")
-                file.write(f"Grand Total: {grand_total_cost:.2f}\n")
-        except IOError as e:
-            # Handle file writing errors
-            print(f"Error saving invoice to file: {e}")
-
-        # Display invoice on screen
-        print("-" * 100)
-        print("INVOICE")
-        print("-" * 100)
-        print(f"Vendor Name: {vendor_name}")
-        print(f"Date: {time_now}, {today_date}")
-        print("-" * 100)
-        
-        print(header_format.format("S.N", "Name", "Brand Name", "Total quantity", "Rate", "Total per item"))
-        print("-" * 100)
-        
-        for i, item in enumerate(restock_items, 1):
-            print(item_format.format(
-                i,
-                item["name"],
-                item["brand"],
-                item["product_quantity"],
-                item["cost_price"],
-                item["total_item_cost"]
-            ))
-        
-        print("-" * 100)
-        print(f"Grand Total: {grand_total_cost:.2f}")
-        print("-" * 100)
-        print("\n")
-    except Exception as e:
-        # Catch all other exceptions
-        print(f"Error generating purchase invoice: {e}")
+import atexit
+import collections
+import datetime
+import functools
+import os
+import shutil
+import sys
+import threading
+import time
+import zlib
+from instrumentation import count, timed, timing
+from invoices import INVOICE_DIRECTORY, InvoiceStore
+from locking import database_lock
+from money import format_money
+from read import (
+    BINARY_CHECKSUM,
+    BINARY_HEADER,
+    BINARY_LENGTH,
+    BINARY_MAGIC,
+    BINARY_VERSION,
+    CHUNK_SIZE,
+    is_binary_database,
+    journal_name,
+    load_snapshot,
+    read_database,
+    read_generation,
+    refresh_data,
+    retained_generations,
+    retained_snapshot_name,
+    save_parse_cache,
+)
+
+# Journal size at which record_transaction compacts it into a new snapshot
+JOURNAL_COMPACT_BYTES = 64 * 1024
+# The journal must also reach this fraction of the snapshot's size, so a
+# large catalog is not rewritten for every batch transaction
+JOURNAL_COMPACT_RATIO = 8
+# Earlier snapshots kept next to the database for recovery and rollback
+SNAPSHOTS_KEPT = 3
+# Suffix of the copy kept of a database found damaged
+DAMAGED_SUFFIX = ".damaged"
+
+def write_csv_snapshot(products, snapshot_name, generation):
+    """
+    Writes the committed products as CSV lines under a generation header.
+
+    The header also records the number of products and the CRC32 of
+    every line after it, so load_data can tell a damaged file from a
+    smaller catalog. This is also the export format; load_data reads it
+    back directly.
+
+    Args:
+        products (ProductStore): The current products.
+        snapshot_name (str): The name of the file to write.
+        generation (int): The generation recorded in the header.
+    """
+    stock = products.committed_stock()
+    header = f"#generation,{generation},count,{len(products)},checksum,"
+    checksum = 0
+    with open(snapshot_name, "wb") as file:
+        # The checksum always takes eight digits, so it can be filled in at the end
+        file.write(f"{header}{checksum:08x}\n".encode())
+
+        def write_lines(lines):
+            nonlocal checksum
+            data = "".join(lines).encode("utf-8")
+            checksum = zlib.crc32(data, checksum)
+            file.write(data)
+
+        # Cost prices repeat across the catalog, so each is formatted once
+        price_text = {price: format_money(price) for price in set(products.cost_price)}
+        brand_table, country_table = products.brand_table, products.country_table
+        for start in range(0, len(products), CHUNK_SIZE):
+            end = start + CHUNK_SIZE
+            # Format a chunk of CSV lines straight from the columns
+            write_lines([
+                f"{name},{brand_table[brand_code]},{quantity},{price_text[cost_price]},{country_table[country_code]}\n"
+                for name, brand_code, quantity, cost_price, country_code in zip(
+                    products.names[start:end],
+                    products.brand_codes[start:end],
+                    stock[start:end],
+                    products.cost_price[start:end],
+                    products.country_codes[start:end],
+                )
+            ])
+
+        file.seek(0)
+        file.write(f"{header}{checksum:08x}\n".encode())
+        file.flush()
+        os.fsync(file.fileno())
+
+def write_binary_snapshot(products, snapshot_name, generation, prefix=b"", sync=True):
+    """
+    Writes the committed products as a fixed-width binary snapshot.
+
+    The file holds a header, the CRC32 of the rest of the file, the
+    stock, cost price, brand code and country code columns in native
+    byte order, and three string tables (names, brands, countries)
+    joined by newlines.
+
+    Args:
+        products (ProductStore): The current products.
+        snapshot_name (str): The name of the file to write.
+        generation (int): The generation recorded in the header.
+        prefix (bytes): Bytes written before the snapshot, such as the
+            header of a parse cache.
+        sync (bool): Whether to force the file to disk.
+    """
+    byte_order = 0 if sys.byteorder == "little" else 1
+    checksum = 0
+    with open(snapshot_name, "wb") as file:
+        file.write(prefix)
+        file.write(BINARY_HEADER.pack(
+            BINARY_MAGIC,
+            BINARY_VERSION,
+            byte_order,
+            generation,
+            len(products),
+            len(products.brand_table),
+            len(products.country_table),
+        ))
+        # Filled in once the rest is written
+        file.write(BINARY_CHECKSUM.pack(checksum))
+
+        def write(data):
+            nonlocal checksum
+            checksum = zlib.crc32(data, checksum)
+            file.write(data)
+
+        # Numeric columns, copied straight from the store
+        write(products.committed_stock().tobytes())
+        write(products.cost_price.tobytes())
+        write(products.brand_codes.tobytes())
+        write(products.country_codes.tobytes())
+
+        # String tables
+        for table in (products.names, products.brand_table, products.country_table):
+            blob = "\n".join(table).encode("utf-8")
+            write(BINARY_LENGTH.pack(len(blob)))
+            write(blob)
+
+        file.seek(len(prefix) + BINARY_HEADER.size)
+        file.write(BINARY_CHECKSUM.pack(checksum))
+        if sync:
+            file.flush()
+            os.fsync(file.fileno())
+
+def sync_directory(file_name):
+    """
+    Forces the directory entry of a new or renamed file to disk.
+
+    Without this a crash right after os.replace can bring back the old
+    name. Platforms that cannot open directories, such as Windows, make
+    renames durable on their own and are skipped.
+
+    Args:
+        file_name (str): A file in the directory to sync.
+    """
+    try:
+        descriptor = os.open(os.path.dirname(os.path.abspath(file_name)), os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(descriptor)
+    except OSError:
+        pass
+    finally:
+        os.close(descriptor)
+
+def keep_copy(file_name, copy_name):
+    """
+    Keeps the current contents of a file under another name.
+
+    A hard link costs nothing and stays valid once the file is replaced;
+    the file is copied where links are not supported.
+
+    Args:
+        file_name (str): The file to keep.
+        copy_name (str): The name to keep it under; replaced if it exists.
+    """
+    try:
+        os.remove(copy_name)
+    except FileNotFoundError:
+        pass
+    try:
+        os.link(file_name, copy_name)
+    except OSError:
+        shutil.copyfile(file_name, copy_name)
+
+def prune_snapshots(database_name):
+    """
+    Removes the retained snapshots beyond the newest SNAPSHOTS_KEPT,
+    with the journals no kept snapshot needs.
+
+    Args:
+        database_name (str): The name of the product database file.
+    """
+    generations = retained_generations(database_name)
+    if len(generations) <= SNAPSHOTS_KEPT:
+        return
+    oldest_kept = generations[-SNAPSHOTS_KEPT]
+    for generation in generations[:-SNAPSHOTS_KEPT]:
+        for file_name in (retained_snapshot_name(database_name, generation), journal_name(database_name, generation)):
+            try:
+                os.remove(file_name)
+            except FileNotFoundError:
+                pass
+    # Journals of generations that were never retained, such as before an upgrade
+    directory, base_name = os.path.split(database_name)
+    prefix = base_name + ".journal."
+    for file_name in os.listdir(directory or "."):
+        suffix = file_name[len(prefix):]
+        if file_name.startswith(prefix) and suffix.isdigit() and int(suffix) < oldest_kept:
+            os.remove(os.path.join(directory, file_name))
+
+@timed("persist.snapshot")
+def write_snapshot(products, database_name, retain=True, keep_journal=True):
+    """
+    Writes the committed state of the products as the next snapshot.
+
+    The snapshot is written to a temporary file, forced to disk and
+    renamed over the database, and the rename itself is forced to disk,
+    so a crash leaves either the old or the new snapshot intact. Its
+    header carries the next generation number, which retires the
+    journal of the previous generation.
+
+    The previous snapshot is kept as a retained generation together with
+    that journal, so it can be rolled back to, and a damaged database can
+    be rebuilt from it; only the newest SNAPSHOTS_KEPT are kept. Databases
+    named with BINARY_SUFFIX get a binary snapshot, all others CSV along
+    with a fresh parse cache. Callers must hold the database lock.
+
+    Args:
+        products (ProductStore): The current products.
+        database_name (str): The name of the product database file.
+        retain (bool): Whether to keep the previous snapshot.
+        keep_journal (bool): Whether to keep the previous journal with it.
+            Without it recovery does not replay past the previous
+            snapshot, as when the new one is not built from it.
+
+    Returns:
+        int: The generation of the new snapshot.
+    """
+    generation = read_generation(database_name)
+    temp_name = database_name + ".tmp"
+
+    # Write updated product information to a temporary file
+    if is_binary_database(database_name):
+        write_binary_snapshot(products, temp_name, generation + 1)
+    else:
+        write_csv_snapshot(products, temp_name, generation + 1)
+
+    previous_journal = journal_name(database_name, generation)
+    retain = retain and SNAPSHOTS_KEPT > 0 and os.path.exists(database_name)
+    if retain:
+        keep_copy(database_name, retained_snapshot_name(database_name, generation))
+    if retain and keep_journal:
+        # An empty journal tells recovery the generation had no transactions
+        open(previous_journal, "ab").close()
+
+    # Swap in the new snapshot, then drop what it no longer needs
+    os.replace(temp_name, database_name)
+    sync_directory(database_name)
+    if not is_binary_database(database_name):
+        # The next session can load the new snapshot without parsing it
+        save_parse_cache(products, database_name, generation + 1)
+    if not (retain and keep_journal):
+        try:
+            os.remove(previous_journal)
+        except FileNotFoundError:
+            pass
+    prune_snapshots(database_name)
+    return generation + 1
+
+def compact_database(products, database_name):
+    """
+    Folds the journal into a new snapshot; the caller holds the lock and
+    has brought the products up to date.
+
+    Args:
+        products (ProductStore): The current products.
+        database_name (str): The name of the product database file.
+    """
+    try:
+        if products.recovered:
+            # Keep the damaged file for inspection rather than as a snapshot
+            keep_copy(database_name, database_name + DAMAGED_SUFFIX)
+        products.generation = write_snapshot(products, database_name, retain=not products.recovered)
+        products.journal_offset = 0
+        products.recovered = False
+    except IOError as e:
+        # Handle file writing errors
+        print(f"Error updating database: {e}")
+    except Exception as e:
+        # Catch all other exceptions
+        print(f"An unexpected error occurred while updating database: {e}")
+
+@timed("persist.save")
+def update_database(products, database_name):
+    """
+    Writes a full snapshot of the product list and starts a new journal.
+
+    Transactions committed by other sessions are applied first, so none
+    of them are lost from the snapshot.
+
+    Args:
+        products (ProductStore): The current products.
+        database_name (str): The name of the product database file.
+    """
+    try:
+        with database_lock(database_name):
+            refresh_data(products, database_name)
+            compact_database(products, database_name)
+    except Exception as e:
+        # Catch all other exceptions
+        print(f"An unexpected error occurred while updating database: {e}")
+
+def export_database(products, database_name):
+    """
+    Writes the products to another database file, e.g. to convert between
+    CSV and binary snapshots. The store keeps tracking its own database.
+
+    Args:
+        products (ProductStore): The current products.
+        database_name (str): The name of the file to export to.
+    """
+    try:
+        with database_lock(database_name):
+            write_snapshot(products, database_name)
+    except IOError as e:
+        # Handle file writing errors
+        print(f"Error exporting database: {e}")
+    except Exception as e:
+        # Catch all other exceptions
+        print(f"An unexpected error occurred while exporting database: {e}")
+
+def rollback_database(database_name, generation):
+    """
+    Restores a retained snapshot as the next generation of the database.
+
+    The current state, journal included, is snapshotted first and so
+    becomes a retained generation itself, which makes the rollback easy
+    to undo. Only stock and the catalog go back; the sales log and the
+    invoices keep their history. Running sessions pick up the restored
+    snapshot on their next commit, like any other compaction.
+
+    Args:
+        database_name (str): The name of the product database file.
+        generation (int): The retained generation to restore.
+
+    Returns:
+        int: The generation of the restored snapshot.
+
+    Raises:
+        FileNotFoundError: If the generation is not retained.
+        CorruptSnapshotError: If the retained snapshot is damaged.
+    """
+    with database_lock(database_name):
+        restored, _ = load_snapshot(
+            retained_snapshot_name(database_name, generation), is_binary_database(database_name)
+        )
+        current = read_database(database_name)
+        write_snapshot(current, database_name, retain=not current.recovered)
+        # Recovery must not replay the current journal onto the restored snapshot
+        return write_snapshot(restored, database_name, keep_journal=False)
+
+def discard_torn_entry(file):
+    """
+    Truncates a journal back to its last complete line.
+
+    A crash in the middle of an append leaves a line without a trailing
+    newline; new entries must not be glued onto it.
+
+    Args:
+        file (file): The journal opened in binary append-read mode.
+    """
+    size = file.seek(0, os.SEEK_END)
+    if size == 0:
+        return
+    file.seek(size - 1)
+    if file.read(1) == b"\n":
+        return
+
+    # Walk back to the end of the last complete entry
+    position = size
+    while position > 0:
+        step = min(4096, position)
+        file.seek(position - step)
+        block = file.read(step)
+        newline = block.rfind(b"\n")
+        if newline != -1:
+            position = position - step + newline + 1
+            break
+        position -= step
+    file.truncate(position)
+
+@timed("persist.commit")
+def record_transaction(products, changes, database_name, reason):
+    """
+    Commits the stock changes of one transaction to the journal.
+
+    Under the database lock, transactions committed by other sessions
+    are applied first, then the transaction is checked against the
+    committed stock: if any product would go below zero the whole
+    transaction is cancelled and its changes are taken back out of the
+    store. Otherwise it is written as a single line and fsync'd, so its
+    cost depends on the number of changes rather than the catalog size.
+    Once the journal grows past JOURNAL_COMPACT_BYTES and past
+    1/JOURNAL_COMPACT_RATIO of the snapshot it is compacted into a new
+    snapshot; until then replaying it costs less than rewriting the
+    snapshot would.
+
+    Args:
+        products (ProductStore): The current products, already updated
+            through reserve or adjust.
+        changes (list): (product_id, delta) pairs applied by the transaction.
+        database_name (str): The name of the product database file.
+        reason (str): A short label for the transaction, e.g. 'sale'.
+
+    Returns:
+        bool: True if the transaction was committed.
+    """
+    if not changes:
+        return True
+
+    committed = False
+    try:
+        with database_lock(database_name):
+            refresh_data(products, database_name)
+
+            # Check the committed stock each product would be left with
+            totals = {}
+            for product_id, delta in changes:
+                totals[product_id] = totals.get(product_id, 0) + delta
+            for product_id, delta in totals.items():
+                remaining = products.stock[product_id] - products.pending.get(product_id, 0) + delta
+                if remaining < 0:
+                    print(f"Error: Not enough stock left of '{products.names[product_id]}'; "
+                          "another session sold it first. Transaction cancelled.")
+                    return False
+
+            timestamp = datetime.datetime.now().strftime("%Y-%m-%dT%H:%M:%S")
+            deltas = " ".join(f"{product_id}:{delta}" for product_id, delta in changes)
+
+            # Append the transaction and force it to disk
+            with open(journal_name(database_name, products.generation), "ab+") as file:
+                discard_torn_entry(file)
+                created = file.tell() == 0
+                file.write(f"{timestamp},{reason},{deltas}\n".encode())
+                file.flush()
+                os.fsync(file.fileno())
+                products.journal_offset = file.tell()
+            if created:
+                # The first entry of a generation also needs the journal's directory entry on disk
+                sync_directory(database_name)
+            committed = True
+            products.settle(changes, committed=True)
+
+            # Fold the journal into a snapshot once it gets large next to the snapshot
+            if (products.journal_offset >= JOURNAL_COMPACT_BYTES
+                    and products.journal_offset * JOURNAL_COMPACT_RATIO >= os.path.getsize(database_name)):
+                compact_database(products, database_name)
+        return True
+    except IOError as e:
+        # Handle file writing errors
+        print(f"Error recording transaction: {e}")
+    except Exception as e:
+        # Catch all other exceptions
+        print(f"An unexpected error occurred while recording transaction: {e}")
+    finally:
+        if not committed:
+            products.settle(changes, committed=False)
+    return committed
+
+# Bytes of rendered invoices allowed to wait for the writer thread before
+# generate_invoice blocks
+INVOICE_QUEUE_BYTES = 8 * 1024 * 1024
+# Maximum number of invoices written per wake-up of the writer thread
+INVOICE_BATCH_SIZE = 256
+
+# Format strings for invoice table alignment
+INVOICE_HEADER_FORMAT = "{:<5} {:<25} {:<25} {:<15} {:<15} {:<15}"
+INVOICE_ITEM_FORMAT = "{:<5} {:<25} {:<25} {:<15} {:<15} {:<15}"
+# Parts that are the same on every invoice, formatted once
+INVOICE_RULE = "-" * 100
+INVOICE_HEADER = INVOICE_HEADER_FORMAT.format("S.N", "Name", "Brand Name", "Total quantity", "Rate", "Total per item")
+
+class InvoiceWriter:
+    """
+    Stores invoices on a background thread.
+
+    Invoices are queued already rendered, so a sale never waits for the
+    disk. The writer drains the queue in batches of up to
+    INVOICE_BATCH_SIZE, each appended to the InvoiceStore in one go.
+    Producers block once more than max_pending_bytes of invoices are
+    waiting, which bounds the memory the queue can use.
+    """
+
+    def __init__(self, directory=INVOICE_DIRECTORY, max_pending_bytes=INVOICE_QUEUE_BYTES):
+        self.directory = directory
+        self.store = None
+        self.max_pending_bytes = max_pending_bytes
+        self.condition = threading.Condition()
+        self.queue = collections.deque()
+        self.pending_bytes = 0  # Queued or being written
+        self.unwritten = 0  # Invoices queued or being written
+        self.thread = None
+        self.stats = {
+            "submitted": 0,
+            "written": 0,
+            "batches": 0,
+            "errors": 0,
+            "producer_waits": 0,
+            "max_lag": 0.0,
+            "total_lag": 0.0,
+        }
+
+    def invoices(self):
+        """
+        Opens the invoice store on first use.
+
+        The directory is resolved then, against the working directory of
+        the first invoice.
+
+        Returns:
+            InvoiceStore: The store the writer appends to.
+        """
+        with self.condition:
+            if self.store is None:
+                self.store = InvoiceStore(self.directory)
+            return self.store
+
+    def submit(self, invoice):
+        """
+        Queues an invoice for storing.
+
+        Args:
+            invoice (dict): The invoice as InvoiceStore.append takes it.
+        """
+        self.submit_all([invoice])
+
+    def submit_all(self, invoices):
+        """
+        Queues several invoices for storing, waking the writer once.
+
+        Args:
+            invoices (list): The invoices as InvoiceStore.append takes them.
+        """
+        self.invoices()
+        with self.condition:
+            if self.thread is None:
+                self.thread = threading.Thread(target=self.run, name="invoice-writer", daemon=True)
+                self.thread.start()
+            for invoice in invoices:
+                text = invoice["text"]
+                # Apply back-pressure once the queue holds too much
+                while self.unwritten and self.pending_bytes + len(text) > self.max_pending_bytes:
+                    self.stats["producer_waits"] += 1
+                    self.condition.notify_all()
+                    self.condition.wait()
+
+                self.queue.append((invoice, time.perf_counter()))
+                self.pending_bytes += len(text)
+                self.unwritten += 1
+                self.stats["submitted"] += 1
+            self.condition.notify_all()
+
+    def run(self):
+        """Writes queued invoices until the process exits."""
+        while True:
+            with self.condition:
+                while not self.queue:
+                    self.condition.wait()
+                batch = [self.queue.popleft() for _ in range(min(len(self.queue), INVOICE_BATCH_SIZE))]
+
+            errors = len(batch)
+            try:
+                with timing("invoice.write"):
+                    self.store.append([invoice for invoice, queued_at in batch])
+                count("invoice.written", len(batch))
+                errors = 0
+            except Exception as e:
+                # Report any failure, a bad record included, and keep the thread running
+                print(f"Error saving invoices: {type(e).__name__}: {e}")
+            finally:
+                # Settle the batch whatever happened, so flush never waits on it
+                written_at = time.perf_counter()
+                with self.condition:
+                    for invoice, queued_at in batch:
+                        lag = written_at - queued_at
+                        self.stats["total_lag"] += lag
+                        self.stats["max_lag"] = max(self.stats["max_lag"], lag)
+                        self.pending_bytes -= len(invoice["text"])
+                    self.unwritten -= len(batch)
+                    self.stats["written"] += len(batch) - errors
+                    self.stats["errors"] += errors
+                    self.stats["batches"] += 1
+                    self.condition.notify_all()
+
+    def flush(self):
+        """Waits until every queued invoice has been written."""
+        with self.condition:
+            while self.unwritten:
+                self.condition.wait()
+
+    def metrics(self):
+        """
+        Reports the writer's counters and lag.
+
+        Returns:
+            dict: Invoice counts, batches, current queue depth and bytes,
+                and the mean and maximum seconds from queueing to writing.
+        """
+        with self.condition:
+            metrics = dict(self.stats)
+            metrics["queued"] = self.unwritten
+            metrics["queued_bytes"] = self.pending_bytes
+        finished = metrics["written"] + metrics["errors"]
+        metrics["mean_lag"] = metrics.pop("total_lag") / finished if finished else 0.0
+        return metrics
+
+# Shared writer used by generate_invoice and generate_purchase_invoice
+invoice_writer = InvoiceWriter()
+atexit.register(invoice_writer.flush)
+
+def invoice_store():
+    """
+    Returns the invoice store shared with the invoice writer.
+
+    Returns:
+        InvoiceStore: The store of saved invoices.
+    """
+    return invoice_writer.invoices()
+
+def flush_invoices():
+    """
+    Waits for all pending invoices to reach disk.
+
+    Returns:
+        dict: The invoice writer's metrics after flushing.
+    """
+    invoice_writer.flush()
+    return invoice_writer.metrics()
+
+@functools.lru_cache(maxsize=1)
+def invoice_dates(date):
+    """
+    Formats the moment of an invoice for its text and its record.
+
+    The last moment is cached, as a batch gives all its invoices the same.
+
+    Args:
+        date (datetime): When the invoice was made.
+
+    Returns:
+        tuple: (the date line of the invoice text, the date of its record).
+    """
+    return f"Date: {date.strftime('%H:%M')}, {date.strftime('%d-%m-%Y')}", date.isoformat(" ", "seconds")
+
+@timed("invoice.render")
+def render_invoice(title_lines, items, grand_total):
+    """
+    Formats an invoice once, for both the file and the screen.
+
+    Args:
+        title_lines (list): The lines naming the customer or vendor and date.
+        items (list): (name, brand, quantity, rate, total) per line, with
+            the rate and total in paisa.
+        grand_total (int): The total amount in paisa.
+
+    Returns:
+        str: The invoice as written to its file.
+    """
+    lines = ["INVOICE", INVOICE_RULE]
+    lines.extend(title_lines)
+    lines.append(INVOICE_RULE)
+
+    # Table header and one row per item
+    lines.append(INVOICE_HEADER)
+    lines.append(INVOICE_RULE)
+    for i, (name, brand, quantity, rate, total) in enumerate(items, 1):
+        lines.append(INVOICE_ITEM_FORMAT.format(i, name, brand, quantity, format_money(rate), format_money(total)))
+
+    lines.append(INVOICE_RULE)
+    lines.append(f"Grand Total: {format_money(grand_total)}")
+    return "\n".join(lines) + "\n"
+
+def sale_invoice(customer_name, phone_number, item_selling, grand_total, date):
+    """
+    Renders a customer invoice as the record the invoice writer stores.
+
+    Args:
+        customer_name (str): The name of the customer.
+        phone_number (str): The phone number of the customer.
+        item_selling (list): List of items sold.
+        grand_total (int): The total amount in paisa.
+        date (datetime): When the sale was made.
+
+    Returns:
+        dict: The invoice as InvoiceStore.append takes it.
+    """
+    date_line, record_date = invoice_dates(date)
+    text = render_invoice(
+        [
+            f"Customer Name: {customer_name}",
+            f"Phone Number: {phone_number}",
+            date_line,
+        ],
+        [
+            (
+                item["name"],
+                item["brand"],
+                item["total_quantity"],
+                item["individual_item_price"],
+                item["total_item_price"],
+            )
+            for item in item_selling
+        ],
+        grand_total,
+    )
+    return {
+        "kind": "sale",
+        "date": record_date,
+        "name": customer_name,
+        "phone": phone_number,
+        "total": grand_total,
+        "text": text,
+    }
+
+def generate_invoice(customer_name, phone_number, item_selling, grand_total, display=True):
+    """
+    Generates a customer invoice and queues it for saving.
+
+    The invoice is rendered once; the same text is shown on screen and
+    handed to the background invoice writer, which gives it its id in
+    the invoice store.
+
+    Args:
+        customer_name (str): The name of the customer.
+        phone_number (str): The phone number of the customer.
+        item_selling (list): List of items sold.
+        grand_total (int): The total amount in paisa.
+        display (bool): Whether to also print the invoice on screen.
+    """
+    try:
+        # Get current date and time for invoice
+        invoice = sale_invoice(customer_name, phone_number, item_selling, grand_total, datetime.datetime.now())
+        text = invoice["text"]
+        invoice_writer.submit(invoice)
+
+        # Display invoice on screen
+        if not display:
+            return
+        print("\n" + "-" * 100)
+        print(text + "-" * 100)
+        print("\nPROCESS COMPLETE")
+        print("-" * 100)
+        print("\n")
+    except Exception as e:
+        # Catch all other exceptions
+        print(f"Error generating invoice: {e}")
+
+def generate_invoices(orders):
+    """
+    Generates the customer invoices of a batch and queues them together.
+
+    The invoices share one date and are handed to the writer in one go,
+    so it is woken once rather than for every order.
+
+    Args:
+        orders (list): (customer_name, phone_number, item_selling,
+            grand_total) per order.
+    """
+    try:
+        date = datetime.datetime.now()
+        invoice_writer.submit_all([
+            sale_invoice(customer_name, phone_number, item_selling, grand_total, date)
+            for customer_name, phone_number, item_selling, grand_total in orders
+        ])
+    except Exception as e:
+        # Catch all other exceptions
+        print(f"Error generating invoices: {e}")
+
+def generate_purchase_invoice(vendor_name, restock_items, grand_total_cost, display=True):
+    """
+    Generates a vendor purchase invoice and queues it for saving.
+
+    Args:
+        vendor_name (str): The name of the vendor.
+        restock_items (list): List of items purchased.
+        grand_total_cost (int): The total cost amount in paisa.
+        display (bool): Whether to also print the invoice on screen.
+    """
+    try:
+        # Get current date and time for invoice
+        date_line, record_date = invoice_dates(datetime.datetime.now())
+        text = render_invoice(
+            [
+                f"Vendor Name: {vendor_name}",
+                date_line,
+            ],
+            [
+                (
+                    item["name"],
+                    item["brand"],
+                    item["product_quantity"],
+                    item["cost_price"],
+                    item["total_item_cost"],
+                )
+                for item in restock_items
+            ],
+            grand_total_cost,
+        )
+        invoice_writer.submit({
+            "kind": "purchase",
+            "date": record_date,
+            "name": vendor_name,
+            "phone": "",
+            "total": grand_total_cost,
+            "text": text,
+        })
+
+        # Display invoice on screen
+        if not display:
+            return
+        print("-" * 100)
+        print(text + "-" * 100)
+        print("\n")
+    except Exception as e:
+        # Catch all other exceptions
+        print(f"Error generating purchase invoice: {e}")